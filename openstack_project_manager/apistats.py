@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import math
+import re
+import time
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import keystoneauth1.session
+
+# reconcile phase of the API calls made in the current context
+CURRENT_PHASE: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "phase", default="other"
+)
+
+# path segments that identify a single resource
+RE_RESOURCE_ID = re.compile(
+    r"^([0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9]+)$"
+)
+
+# HTTP methods that change resources
+MUTATING_METHODS = ["DELETE", "PATCH", "POST", "PUT"]
+
+# endpoints that do not change resources with these methods, a dry run still
+# issues a token
+READONLY_ENDPOINTS = ["/auth/tokens"]
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    token = CURRENT_PHASE.set(name)
+    try:
+        yield
+    finally:
+        CURRENT_PHASE.reset(token)
+
+
+def instrument(session: keystoneauth1.session.Session) -> ApiStats:
+    # the session is shared by chained commands, instrument it only once
+    api_stats = getattr(session.request, "api_stats", None)
+    if not isinstance(api_stats, ApiStats):
+        api_stats = ApiStats()
+        api_stats.instrument(session)
+
+    return api_stats
+
+
+def get_endpoint_template(url: str) -> str:
+    path = urlparse(url).path
+    return "/".join(
+        "{id}" if RE_RESOURCE_ID.match(segment) else segment
+        for segment in path.rstrip("/").split("/")
+    )
+
+
+def get_quantile(latencies: List[float], quantile: float) -> float:
+    latencies = sorted(latencies)
+    index = max(0, math.ceil(quantile * len(latencies)) - 1)
+    return latencies[index]
+
+
+class ApiStats:
+
+    def __init__(self):
+        # latencies in seconds by (service, method, endpoint, phase)
+        self.calls: Dict[Tuple[str, str, str, str], List[float]] = {}
+
+    def record(
+        self, service: str, method: str, url: str, phase: str, latency: float
+    ) -> None:
+        key = (service, method.upper(), get_endpoint_template(url), phase)
+        self.calls.setdefault(key, []).append(latency)
+
+    def instrument(self, session: keystoneauth1.session.Session) -> None:
+        request = session.request
+
+        # NOTE: All clients send their requests through the shared keystoneauth
+        #       session, the session is the single place to account for them.
+        @functools.wraps(request)
+        def instrumented_request(url, method, **kwargs):
+            endpoint_filter = kwargs.get("endpoint_filter") or {}
+            service = endpoint_filter.get("service_type")
+            if not service:
+                service = "identity" if "/auth/tokens" in url else "unknown"
+
+            start = time.perf_counter()
+            try:
+                return request(url, method, **kwargs)
+            finally:
+                self.record(
+                    service,
+                    method,
+                    url,
+                    CURRENT_PHASE.get(),
+                    time.perf_counter() - start,
+                )
+
+        instrumented_request.api_stats = self  # type: ignore[attr-defined]
+        session.request = instrumented_request  # type: ignore[method-assign,assignment]
+
+    def get_latencies(self, index: int) -> Dict[str, List[float]]:
+        result: Dict[str, List[float]] = {}
+        for key, latencies in self.calls.items():
+            result.setdefault(key[index], []).extend(latencies)
+
+        return result
+
+    def get_mutations(self) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for (_, method, endpoint, phase), latencies in self.calls.items():
+            if method in MUTATING_METHODS and not endpoint.endswith(
+                tuple(READONLY_ENDPOINTS)
+            ):
+                result[phase] = result.get(phase, 0) + len(latencies)
+
+        return result
+
+    def report(self) -> str:
+        from tabulate import tabulate
+
+        result = []
+        for (service, method, endpoint, phase), latencies in sorted(
+            self.calls.items(), key=lambda x: sum(x[1]), reverse=True
+        ):
+            result.append(
+                [
+                    service,
+                    method,
+                    endpoint,
+                    phase,
+                    len(latencies),
+                    f"{sum(latencies):.3f}",
+                    f"{get_quantile(latencies, 0.5) * 1000:.1f}",
+                    f"{get_quantile(latencies, 0.95) * 1000:.1f}",
+                    f"{max(latencies) * 1000:.1f}",
+                ]
+            )
+
+        for service, latencies in sorted(self.get_latencies(0).items()):
+            result.append(
+                [
+                    service,
+                    "",
+                    "",
+                    "total",
+                    len(latencies),
+                    f"{sum(latencies):.3f}",
+                    f"{get_quantile(latencies, 0.5) * 1000:.1f}",
+                    f"{get_quantile(latencies, 0.95) * 1000:.1f}",
+                    f"{max(latencies) * 1000:.1f}",
+                ]
+            )
+
+        return tabulate(
+            result,
+            headers=[
+                "service",
+                "method",
+                "endpoint",
+                "phase",
+                "calls",
+                "total s",
+                "p50 ms",
+                "p95 ms",
+                "max ms",
+            ],
+            tablefmt="psql",
+        )
@@ -0,0 +1,386 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import datetime
+import enum
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+import typer
+from typing_extensions import Annotated
+
+from openstack_project_manager import metrics
+from openstack_project_manager.fakecloud import FakeCloud, Faults, parse_latency
+from openstack_project_manager.generate_cloud import Profile, generate
+
+
+class Mode(str, enum.Enum):
+    # single project, largest domain and all domains
+    project = "project"
+    domain = "domain"
+    all = "all"
+
+
+class Variant(str, enum.Enum):
+    dry_run = "dry-run"
+    apply = "apply"
+
+
+# a drop of the throughput by more than this fraction is a regression
+MAX_REGRESSION = 0.2
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def parse_textfile(text: str) -> Dict[str, float]:
+    result: Dict[str, float] = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            result[key] = float(value)
+    return result
+
+
+def get_targets(state: dict) -> Tuple[str, str]:
+    # the largest domain and its first managed project
+    counts: Dict[str, int] = {}
+    for project in state["projects"].values():
+        if project["domain_id"] != "default":
+            counts[project["domain_id"]] = counts.get(project["domain_id"], 0) + 1
+    domain_id = max(sorted(counts), key=lambda x: counts[x])
+
+    project = min(
+        (
+            x["name"]
+            for x in state["projects"].values()
+            if x["domain_id"] == domain_id
+            and x.get("quotaclass") == "basic"
+            and "unmanaged" not in x
+        ),
+        default=f"{state['domains'][domain_id]['name']}-service",
+    )
+    return state["domains"][domain_id]["name"], project
+
+
+def run_case(
+    state_path: Path,
+    profile: str,
+    mode: str,
+    variant: str,
+    classes: Path,
+    endpoints: Path,
+    workdir: Path,
+    faults: Optional[Faults] = None,
+    seed: Optional[int] = None,
+    retries: int = 0,
+) -> dict:
+    import yaml
+
+    name = f"{profile}-{mode}-{variant}"
+    clouds = workdir / f"{name}.clouds.yml"
+    textfile = workdir / f"{name}.prom"
+    log = workdir / f"{name}.log"
+
+    # NOTE: Every case gets its own copy of the generated state and runs in its
+    #       own process, the apply cases do not see the changes of the previous
+    #       cases and the peak RSS is the one of the reconcile run alone.
+    with FakeCloud(FakeCloud.load_state(state_path), seed=seed, faults=faults) as cloud:
+        clouds.write_text(yaml.dump(cloud.get_clouds_yaml()))
+        domain_name, project_name = get_targets(cloud.state)
+
+        args = [
+            sys.executable,
+            "-m",
+            "openstack_project_manager.manage",
+            "--cloud=fakecloud",
+            f"--classes={classes}",
+            f"--endpoints={endpoints}",
+            f"--textfile={textfile}",
+            f"--retries={retries}",
+            "--manage-endpoints",
+            "--manage-homeprojects",
+            "--dry-run" if variant == "dry-run" else "--nodry-run",
+        ]
+        if mode in ["project", "domain"]:
+            args.append(f"--domain={domain_name}")
+        if mode == "project":
+            args.append(f"--name={project_name}")
+
+        with open(log, "w") as fp:
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                args,
+                env=dict(os.environ, OS_CLIENT_CONFIG_FILE=str(clouds)),
+                stdout=fp,
+                stderr=subprocess.STDOUT,
+            )
+            _, status, rusage = os.wait4(process.pid, 0)
+            wall = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+        injected = sum(cloud.injected.values())
+
+    if process.returncode != 0:
+        logger.error(f"{name} - failed with exit code {process.returncode}")
+        logger.error("\n".join(log.read_text().splitlines()[-20:]))
+
+    values = parse_textfile(textfile.read_text()) if textfile.exists() else {}
+    prefix = metrics.PREFIX
+    processed = int(
+        values.get(
+            f"{prefix}_projects{metrics.format_labels({'state': 'processed'})}", 0
+        )
+    )
+
+    return {
+        "profile": profile,
+        "mode": mode,
+        "variant": variant,
+        "exit_code": process.returncode,
+        "projects": processed,
+        "wall_seconds": round(wall, 3),
+        "projects_per_second": round(processed / wall, 3) if wall else 0.0,
+        "api_calls": int(
+            sum(
+                v
+                for k, v in values.items()
+                if k.startswith(f"{prefix}_api_latency_seconds_count")
+            )
+        ),
+        "mutations": int(
+            sum(v for k, v in values.items() if k.startswith(f"{prefix}_mutations{{"))
+        ),
+        "peak_rss_kb": rusage.ru_maxrss,
+        "injected_errors": injected,
+    }
+
+
+def compare(
+    previous: dict, current: dict, max_regression: float = MAX_REGRESSION
+) -> Tuple[List[list], int]:
+    cases = {(x["profile"], x["mode"], x["variant"]): x for x in previous["results"]}
+
+    rows = []
+    regressions = 0
+    for result in current["results"]:
+        old = cases.get((result["profile"], result["mode"], result["variant"]))
+        if not old:
+            continue
+
+        change = 0.0
+        if old["projects_per_second"]:
+            change = result["projects_per_second"] / old["projects_per_second"] - 1
+
+        # the API calls of a generated cloud do not depend on the timing, every
+        # additional call is a regression
+        regression = change < -max_regression or result["api_calls"] > old["api_calls"]
+        regressions += regression
+
+        rows.append(
+            [
+                result["profile"],
+                result["mode"],
+                result["variant"],
+                old["projects_per_second"],
+                result["projects_per_second"],
+                f"{change * 100:+.1f}%",
+                old["api_calls"],
+                result["api_calls"],
+                old["peak_rss_kb"],
+                result["peak_rss_kb"],
+                "REGRESSION" if regression else "",
+            ]
+        )
+
+    return rows, regressions
+
+
+def run(
+    sizes: Annotated[
+        List[Profile],
+        typer.Option(
+            "--size",
+            help="Size profile of the generated cloud, may be specified multiple times",
+        ),
+    ] = [Profile.tiny, Profile.small],
+    modes: Annotated[
+        List[Mode],
+        typer.Option(
+            "--mode",
+            help="Mode of the run, may be specified multiple times",
+        ),
+    ] = list(Mode),
+    variants: Annotated[
+        List[Variant],
+        typer.Option(
+            "--variant",
+            help="Variant of the run, may be specified multiple times",
+        ),
+    ] = list(Variant),
+    seed: Annotated[
+        int, typer.Option("--seed", help="Seed of the generated clouds")
+    ] = 0,
+    classes: Annotated[
+        Path, typer.Option("--classes", help="Path to the classes.yml file")
+    ] = Path("etc/classes.yml"),
+    endpoints: Annotated[
+        Path, typer.Option("--endpoints", help="Path to the endpoints.yml file")
+    ] = Path("etc/endpoints.yml"),
+    output: Annotated[
+        Optional[Path],
+        typer.Option("--output", help="Write the results to this JSON file"),
+    ] = None,
+    previous: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--compare", help="Compare the results with the results of a previous run"
+        ),
+    ] = None,
+    latency: Annotated[
+        List[str],
+        typer.Option(
+            "--latency",
+            help="Latency of a service of the fake cloud as SERVICE=MEAN[:STDDEV] in milliseconds, * for all services, may be specified multiple times",
+        ),
+    ] = [],
+    throttle_rate: Annotated[
+        float,
+        typer.Option(
+            "--throttle-rate",
+            help="Fraction of the requests the fake cloud answers with 429 or 503 and a Retry-After header",
+        ),
+    ] = 0.0,
+    retry_after: Annotated[
+        int,
+        typer.Option("--retry-after", help="Seconds of the Retry-After header"),
+    ] = 1,
+    retries: Annotated[
+        int,
+        typer.Option(
+            "--retries", help="Retries of throttled requests passed to the manage runs"
+        ),
+    ] = 3,
+    conflict_rate: Annotated[
+        float,
+        typer.Option(
+            "--conflict-rate",
+            help="Fraction of the requests changing a resource the fake cloud answers with 409, conflicts are not retried",
+        ),
+    ] = 0.0,
+    max_regression: Annotated[
+        float,
+        typer.Option(
+            "--max-regression",
+            help="Fraction of the projects per second a case may lose before it is a regression",
+        ),
+    ] = MAX_REGRESSION,
+) -> None:
+    from tabulate import tabulate
+
+    results: List[dict] = []
+    report = {
+        "commit": get_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "seed": seed,
+        "faults": {
+            "latency": latency,
+            "throttle_rate": throttle_rate,
+            "retry_after": retry_after,
+            "conflict_rate": conflict_rate,
+            "retries": retries,
+        },
+        "results": results,
+    }
+    faults = Faults(parse_latency(latency), throttle_rate, retry_after, conflict_rate)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(tmpdir)
+        for size in [x.value for x in sizes]:
+            state_path = workdir / f"{size}.json"
+            generate(FakeCloud(seed=seed), size, seed).save(state_path)
+
+            for mode in [x.value for x in modes]:
+                for variant in [x.value for x in variants]:
+                    result = run_case(
+                        state_path,
+                        size,
+                        mode,
+                        variant,
+                        classes.absolute(),
+                        endpoints.absolute(),
+                        workdir,
+                        faults,
+                        seed,
+                        retries,
+                    )
+                    logger.info(
+                        f"{size}-{mode}-{variant} - {result['projects']} projects in {result['wall_seconds']}s"
+                    )
+                    results.append(result)
+
+    print(
+        tabulate(
+            [list(x.values()) for x in results],
+            headers=list(results[0].keys()) if results else [],
+            tablefmt="psql",
+        )
+    )
+
+    if output:
+        output.write_text(json.dumps(report, indent=2) + "\n")
+
+    failed = any(x["exit_code"] != 0 for x in results)
+
+    regressions = 0
+    if previous:
+        rows, regressions = compare(
+            json.loads(previous.read_text()), report, max_regression
+        )
+        print(
+            tabulate(
+                rows,
+                headers=[
+                    "profile",
+                    "mode",
+                    "variant",
+                    "old projects/s",
+                    "projects/s",
+                    "change",
+                    "old api calls",
+                    "api calls",
+                    "old peak rss kb",
+                    "peak rss kb",
+                    "",
+                ],
+                tablefmt="psql",
+            )
+        )
+
+    if failed or regressions:
+        raise typer.Exit(1)
+
+
+def main() -> None:
+    typer.run(run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import collections
+import datetime
+import gzip
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Deque, Dict, Tuple
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from openstack_project_manager import clients
+
+VERSION = 1
+
+REDACTED = "REDACTED"
+
+# headers and JSON keys whose values never end up in a cassette
+SECRET_HEADERS = [
+    "authorization",
+    "cookie",
+    "set-cookie",
+    "x-auth-token",
+    "x-service-token",
+    "x-subject-token",
+]
+SECRET_KEYS = ["application_credential_secret", "password", "secret"]
+
+
+def redact(value: Any, parent: str = "") -> Any:
+    if isinstance(value, dict):
+        result = {}
+        for k, v in value.items():
+            # the id of a token used to authenticate is a secret as well
+            if isinstance(v, str) and (
+                k in SECRET_KEYS or (parent == "token" and k == "id")
+            ):
+                result[k] = REDACTED
+            else:
+                result[k] = redact(v, k)
+        return result
+    elif isinstance(value, list):
+        return [redact(x, parent) for x in value]
+    return value
+
+
+def redact_headers(headers: Any) -> Dict[str, str]:
+    return {
+        k: REDACTED if k.lower() in SECRET_HEADERS else str(v)
+        for k, v in headers.items()
+    }
+
+
+def redact_body(body: Any) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    try:
+        return json.dumps(redact(json.loads(body)))
+    except ValueError:
+        return body
+
+
+class Recorder(BaseAdapter):
+
+    def __init__(self, path: Path, pool_size: int, retries: int = 0):
+        from keystoneauth1.session import TCPKeepAliveAdapter
+
+        super().__init__()
+        self.adapter = TCPKeepAliveAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=clients.get_retry(retries),
+        )
+        self.lock = threading.Lock()
+        self.fp = gzip.open(path, "wt")
+        self.fp.write(
+            json.dumps(
+                {
+                    "version": VERSION,
+                    "recorded_at": datetime.datetime.now(
+                        datetime.timezone.utc
+                    ).isoformat(),
+                }
+            )
+            + "\n"
+        )
+
+    def send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ) -> requests.Response:
+        start = time.perf_counter()
+        response = self.adapter.send(request, stream, timeout, verify, cert, proxies)
+        # reading the content here keeps it for the caller as well
+        content = response.content
+        elapsed = time.perf_counter() - start
+
+        interaction = {
+            "method": request.method,
+            "url": request.url,
+            "request": {
+                "headers": redact_headers(request.headers),
+                "body": redact_body(request.body),
+            },
+            "response": {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": redact_headers(response.headers),
+                "body": redact_body(content),
+            },
+            "elapsed": round(elapsed, 6),
+        }
+
+        with self.lock:
+            # a chained command may have closed the cassette already
+            if not self.fp.closed:
+                self.fp.write(json.dumps(interaction) + "\n")
+
+        return response
+
+    def close(self) -> None:
+        self.adapter.close()
+        with self.lock:
+            self.fp.close()
+
+
+def refresh_token(body: str) -> str:
+    # NOTE: keystoneauth authenticates again before almost every request once
+    #       the recorded token expired, a replayed token is issued now and is
+    #       valid as long as the recorded one was.
+    try:
+        data = json.loads(body)
+        token = data["token"]
+        issued_at = parse_timestamp(token["issued_at"])
+        expires_at = parse_timestamp(token["expires_at"])
+    except (ValueError, KeyError, TypeError):
+        return body
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    token["issued_at"] = format_timestamp(now)
+    token["expires_at"] = format_timestamp(now + (expires_at - issued_at))
+    return json.dumps(data)
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    # keystone uses a Z suffix that fromisoformat only knows from python 3.11 on
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def format_timestamp(value: datetime.datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class Player(BaseAdapter):
+
+    def __init__(self, path: Path, latency: bool = True):
+        super().__init__()
+        self.latency = latency
+        self.lock = threading.Lock()
+
+        # recorded interactions by method and URL in the order of the recording
+        self.interactions: Dict[Tuple[str, str], Deque[dict]] = {}
+
+        with gzip.open(path, "rt") as fp:
+            header = json.loads(fp.readline())
+            if header.get("version") != VERSION:
+                raise ValueError(f"cassette {path} has unsupported version")
+            for line in fp:
+                interaction = json.loads(line)
+                self.interactions.setdefault(
+                    (interaction["method"], interaction["url"]), collections.deque()
+                ).append(interaction)
+
+    def send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ) -> requests.Response:
+        # NOTE: A run against the same state sends the same requests in the same
+        #       order, repeated requests get the recorded responses in turn. The
+        #       last response is repeated if a run sends a request more often.
+        with self.lock:
+            queue = self.interactions.get((request.method, request.url))
+            if not queue:
+                raise requests.exceptions.ConnectionError(
+                    f"no recorded response for {request.method} {request.url}",
+                    request=request,
+                )
+            interaction = queue.popleft() if len(queue) > 1 else queue[0]
+
+        if self.latency:
+            time.sleep(interaction["elapsed"])
+
+        recorded = interaction["response"]
+        response = requests.Response()
+        response.status_code = recorded["status"]
+        response.reason = recorded["reason"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        # the recorded body is already decoded
+        response.headers.pop("Content-Encoding", None)
+        body = recorded["body"]
+        if request.url.rstrip("/").endswith("/auth/tokens"):
+            body = refresh_token(body)
+        response._content = body.encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = datetime.timedelta(seconds=interaction["elapsed"])
+        return response
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,99 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Set
+
+from loguru import logger
+
+VERSION = 1
+
+
+def get_config_hash(options: dict, files: List[Path]) -> str:
+    # the content of the configuration files is part of the configuration, a run
+    # with changed classes must not skip the projects completed before
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode())
+    for path in files:
+        digest.update(str(path).encode())
+        if path.is_file():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class Checkpoint:
+
+    def __init__(self, path: Path, config_hash: str, resume: bool = False):
+        self.path = path
+        self.config_hash = config_hash
+        self.domains: Set[str] = set()
+        self.projects: Set[str] = set()
+
+        if resume:
+            self.load()
+
+        # NOTE: Completed domains and projects are appended as JSON lines, the
+        #       checkpoint is only written again when a run is resumed, this also
+        #       drops an incomplete last line of the interrupted run.
+        entries = [{"version": VERSION, "config_hash": config_hash}]
+        entries += [{"domain": x} for x in sorted(self.domains)]
+        entries += [{"project": x} for x in sorted(self.projects)]
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text("".join(json.dumps(x) + "\n" for x in entries))
+        os.replace(tmp, path)
+        self.fp = open(path, "a")
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as fp:
+                header = json.loads(fp.readline())
+                if header.get("version") != VERSION:
+                    logger.warning(f"checkpoint {self.path} has an unsupported version")
+                    return
+                if header.get("config_hash") != self.config_hash:
+                    logger.warning(
+                        f"checkpoint {self.path} was written with another configuration, starting from the beginning"
+                    )
+                    return
+                for line in fp:
+                    # the last line of an interrupted run may be incomplete
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if "domain" in entry:
+                        self.domains.add(entry["domain"])
+                    elif "project" in entry:
+                        self.projects.add(entry["project"])
+        except FileNotFoundError:
+            logger.warning(
+                f"checkpoint {self.path} not found, starting from the beginning"
+            )
+            return
+        except ValueError as e:
+            logger.warning(f"checkpoint {self.path} is not usable: {e}")
+            return
+
+        logger.info(
+            f"resuming from checkpoint {self.path} with {len(self.domains)} completed domains and {len(self.projects)} completed projects"
+        )
+
+    def write(self, entry: dict) -> None:
+        self.fp.write(json.dumps(entry) + "\n")
+        self.fp.flush()
+
+    def complete_domain(self, domain_id: str) -> None:
+        self.domains.add(domain_id)
+        self.write({"domain": domain_id})
+
+    def complete_project(self, project_id: str) -> None:
+        self.projects.add(project_id)
+        self.write({"project": project_id})
+
+    def close(self) -> None:
+        self.fp.close()
+
+    def remove(self) -> None:
+        self.fp.close()
+        self.path.unlink(missing_ok=True)
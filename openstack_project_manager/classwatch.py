@@ -0,0 +1,95 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from loguru import logger
+
+from openstack_project_manager import manage
+
+# seconds between two checks of the classes files for changes
+DEFAULT_INTERVAL = 10.0
+
+
+def get_mtimes(classes: list[Path]) -> Dict[Path, Optional[Tuple[int, int]]]:
+    # a file that is created or removed changes the classes as well
+    mtimes: Dict[Path, Optional[Tuple[int, int]]] = {}
+    for path in classes:
+        try:
+            stat = path.stat()
+            mtimes[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            mtimes[path] = None
+    return mtimes
+
+
+def resolve_classes(classes: list[Path]) -> Dict[str, Optional[dict]]:
+    # the classes with their parent merged, a changed parent changes its children
+    return {
+        name: manage.get_quotaclass(classes, name)
+        for name in manage.read_quotaclasses(classes)
+    }
+
+
+def get_changed_classes(
+    old: Dict[str, Optional[dict]], new: Dict[str, Optional[dict]]
+) -> Set[str]:
+    return {x for x in set(old) | set(new) if old.get(x) != new.get(x)}
+
+
+def get_effective_class(project: dict) -> Optional[str]:
+    # NOTE: The class check_quota uses for the projects process_project and
+    #       handle_unmanaged_project reconcile, None for projects without quotas.
+    if (
+        project.get("domain_id") == "default"
+        and project["name"] in manage.UNMANAGED_PROJECTS
+    ):
+        return project["name"]
+    if "unmanaged" in project or "quotaclass" not in project:
+        return None
+    if project["name"] in manage.UNMANAGED_PROJECTS:
+        return project["name"]
+    return project["quotaclass"]
+
+
+def get_class_index(projects: Iterable[dict]) -> Dict[str, Set[str]]:
+    index: Dict[str, Set[str]] = {}
+    for project in projects:
+        quotaclass = get_effective_class(project)
+        if quotaclass:
+            index.setdefault(quotaclass, set()).add(project["id"])
+    return index
+
+
+class ClassWatcher:
+
+    def __init__(self, classes: list[Path], interval: float = DEFAULT_INTERVAL):
+        self.classes = classes
+        self.interval = interval
+        self.checked = time.monotonic()
+        self.mtimes = get_mtimes(classes)
+        self.resolved = resolve_classes(classes)
+
+    def check(self) -> Set[str]:
+        # the names of the classes that changed since the last check
+        if time.monotonic() - self.checked < self.interval:
+            return set()
+        self.checked = time.monotonic()
+
+        mtimes = get_mtimes(self.classes)
+        if mtimes == self.mtimes:
+            return set()
+        self.mtimes = mtimes
+
+        # NOTE: A file may be read while it is written, the last valid classes are
+        #       kept and the file is read again with its next change.
+        try:
+            resolved = resolve_classes(self.classes)
+        except Exception as e:
+            logger.error(f"{self.classes} - could not reload the classes: {e}")
+            return set()
+
+        changed = get_changed_classes(self.resolved, resolved)
+        self.resolved = resolved
+        return changed
@@ -0,0 +1,276 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    import openstack
+    from requests.adapters import BaseAdapter
+
+    from openstack_project_manager.inventory import Inventory
+
+# size of the connection pool per host, the default of requests
+DEFAULT_POOL_SIZE = 10
+
+# status codes of throttled requests that are retried after the Retry-After delay
+RETRIABLE_STATUS_CODES = [429, 503]
+
+# do not use a cached token that expires within the next minutes
+TOKEN_CACHE_STALE_DURATION = 300
+
+# auth arguments that must never end up in the name of the token cache file
+SECRET_AUTH_ARGS = ["password", "token", "application_credential_secret"]
+
+
+class Runtime:
+
+    def __init__(self):
+        # connections by cloud name
+        self.connections: dict = {}
+
+        # roles by connection
+        self.roles: dict = {}
+
+
+# NOTE: Chained commands of opm run in one process and share one runtime, so
+#       that they authenticate only once. The standalone tools do not use it.
+RUNTIME: Optional[Runtime] = None
+
+
+def connect(
+    cloud_name: str,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    token_cache: bool = False,
+    adapter: Optional[BaseAdapter] = None,
+    retries: int = 0,
+) -> openstack.connection.Connection:
+    from keystoneauth1.session import TCPKeepAliveAdapter
+    import openstack
+
+    if RUNTIME and cloud_name in RUNTIME.connections:
+        return RUNTIME.connections[cloud_name]
+
+    os_cloud = openstack.connect(cloud=cloud_name)
+
+    # NOTE: All clients share the keystoneauth session of the connection, the
+    #       connection pool of the session has to be large enough for all of them.
+    #       A given adapter, e.g. to record or replay a run, replaces the pool.
+    for prefix in ["https://", "http://"]:
+        os_cloud.session.session.mount(
+            prefix,
+            adapter
+            or TCPKeepAliveAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=get_retry(retries),
+            ),
+        )
+
+    if token_cache:
+        path = get_token_cache_path(os_cloud, cloud_name)
+        load_token_cache(os_cloud, path)
+        atexit.register(save_token_cache, os_cloud, path)
+
+    if RUNTIME:
+        RUNTIME.connections[cloud_name] = os_cloud
+
+    return os_cloud
+
+
+def get_retry(retries: int):
+    from urllib3.util.retry import Retry
+
+    class ThrottleRetry(Retry):
+        def is_retry(self, method, status_code, has_retry_after=False):
+            # a throttled request was not processed and is safe to send again
+            if status_code == 429:
+                return bool(self.total)
+            return super().is_retry(method, status_code, has_retry_after)
+
+    # NOTE: Throttled requests are retried below the clients, so that the
+    #       requests of openstacksdk, keystoneclient and neutronclient are all
+    #       retried. Failed connections are retried by keystoneauth, a request
+    #       that failed while reading the response is never sent again. A 503
+    #       may come after the request was processed, only idempotent requests
+    #       are retried then, e.g. a POST would create a second network.
+    return ThrottleRetry(
+        total=retries,
+        connect=0,
+        read=False,
+        redirect=False,
+        status_forcelist=RETRIABLE_STATUS_CODES,
+        backoff_factor=0.5,
+        raise_on_status=False,
+    )
+
+
+def get_roles(os_cloud: openstack.connection.Connection) -> dict:
+    if RUNTIME and id(os_cloud) in RUNTIME.roles:
+        return RUNTIME.roles[id(os_cloud)]
+
+    roles = {}
+    for role in os_cloud.identity.roles():
+        roles[role.name] = role
+
+    if RUNTIME:
+        RUNTIME.roles[id(os_cloud)] = roles
+
+    return roles
+
+
+def list_projects(
+    os_cloud: openstack.connection.Connection,
+    domain_id: str,
+    inventory: Optional[Inventory] = None,
+) -> list:
+    from openstack.identity.v3.project import Project
+
+    if not inventory:
+        return list(os_cloud.identity.projects(domain_id=domain_id))
+    return inventory.resources(
+        "projects",
+        domain_id,
+        Project,
+        lambda: os_cloud.identity.projects(domain_id=domain_id),
+        os_cloud,
+    )
+
+
+def find_project(
+    os_cloud: openstack.connection.Connection,
+    name: str,
+    domain_id: str,
+    inventory: Optional[Inventory] = None,
+) -> Optional[openstack.identity.v3.project.Project]:
+    if not inventory:
+        return os_cloud.identity.find_project(name, domain_id=domain_id)
+    return next(
+        (x for x in list_projects(os_cloud, domain_id, inventory) if x.name == name),
+        None,
+    )
+
+
+def find_user(
+    os_cloud: openstack.connection.Connection,
+    name: str,
+    domain_id: str,
+    inventory: Optional[Inventory] = None,
+) -> Optional[openstack.identity.v3.user.User]:
+    from openstack.identity.v3.user import User
+
+    if not inventory:
+        return os_cloud.identity.find_user(name, domain_id=domain_id)
+    users = inventory.resources(
+        "users",
+        domain_id,
+        User,
+        lambda: os_cloud.identity.users(domain_id=domain_id),
+        os_cloud,
+    )
+    return next((x for x in users if x.name == name), None)
+
+
+def get_token_cache_path(
+    os_cloud: openstack.connection.Connection, cloud_name: str
+) -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+
+    # NOTE: The cache is bound to the identity the token is issued for, a changed
+    #       clouds.yml must not reuse the token of another user or project.
+    auth_args = {
+        k: v
+        for k, v in os_cloud.config.get_auth_args().items()
+        if k not in SECRET_AUTH_ARGS
+    }
+    digest = hashlib.sha256(
+        json.dumps(auth_args, sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+
+    return (
+        Path(cache_home) / "openstack-project-manager" / f"{cloud_name}-{digest}.json"
+    )
+
+
+def load_token_cache(os_cloud: openstack.connection.Connection, path: Path) -> bool:
+    from keystoneauth1 import access
+
+    try:
+        data = json.loads(path.read_text())
+        auth_state = json.loads(data["auth"])
+        auth_ref = access.create(
+            body=auth_state["body"], auth_token=auth_state["auth_token"]
+        )
+    except FileNotFoundError:
+        return False
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"token cache {path} is not usable: {e}")
+        return False
+
+    if auth_ref.will_expire_soon(TOKEN_CACHE_STALE_DURATION):
+        logger.debug(f"token cache {path} is expired")
+        return False
+
+    session = os_cloud.session
+    if not session.auth:
+        return False
+
+    session.auth.set_auth_state(data["auth"])
+
+    logger.debug(f"using token cache {path}")
+    return True
+
+
+def save_token_cache(os_cloud: openstack.connection.Connection, path: Path) -> None:
+    session = os_cloud.session
+    if not session.auth:
+        return
+
+    auth_state = session.auth.get_auth_state()
+    if not auth_state:
+        return
+
+    # NOTE: Only the token is cached, keystoneauth has no public interface to
+    #       seed its discovery cache and the versions are discovered again.
+    data = json.dumps({"auth": auth_state})
+
+    # the cache contains a valid token, it must only be readable by the owner
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as fp:
+        fp.write(data)
+    os.replace(tmp, path)
+
+
+def make_client(os_cloud: openstack.connection.Connection, service_key: str):
+    # NOTE: This replaces os_client_config.make_client, which authenticates
+    #       again and opens a connection pool for every client.
+    from keystoneclient.v3 import client as keystone_client
+    from neutronclient.v2_0 import client as neutron_client
+
+    constructor_kwargs = dict(
+        session=os_cloud.session,
+        service_type=os_cloud.config.get_service_type(service_key),
+        region_name=os_cloud.config.get_region_name(service_key),
+        endpoint_override=os_cloud.config.get_endpoint(service_key),
+    )
+
+    if service_key == "identity":
+        return keystone_client.Client(
+            interface=os_cloud.config.get_interface(service_key), **constructor_kwargs
+        )
+    elif service_key == "network":
+        return neutron_client.Client(
+            endpoint_type=os_cloud.config.get_interface(service_key),
+            **constructor_kwargs,
+        )
+
+    raise ValueError(f"client for service {service_key} is not supported")
@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+from __future__ import annotations
+
 import random
 import string
 import sys
@@ -7,10 +9,12 @@ import sys
 from loguru import logger
 import typer
 from typing_extensions import Annotated
-import os_client_config
-import openstack
-from tabulate import tabulate
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import openstack
+
+from openstack_project_manager import clients
 
 # Default roles to be assigned to a new user for a project
 DEFAULT_ROLES = ["member", "load-balancer_member"]
@@ -147,6 +151,13 @@ def run(
         str, typer.Option("--admin-domain", help="Admin domain")
     ] = "default",
     cloud_name: Annotated[str, typer.Option("--cloud", help="Managed cloud")] = "admin",
+    token_cache: Annotated[
+        bool,
+        typer.Option(
+            "--token-cache/--notoken-cache",
+            help="Cache token, service catalog and API versions on disk until the token expires",
+        ),
+    ] = False,
     domain_name: Annotated[str, typer.Option("--domain", help="Domain")] = "default",
     internal_id: Annotated[
         Optional[str], typer.Option("--internal-id", help="Internal ID")
@@ -174,12 +185,10 @@ def run(
 ) -> None:
 
     # Connect to the OpenStack environment
-    os_cloud = openstack.connect(cloud=cloud_name)
+    os_cloud = clients.connect(cloud_name, token_cache=token_cache)
 
     # cache roles
-    CACHE_ROLES = {}
-    for role in os_cloud.identity.roles():
-        CACHE_ROLES[role.name] = role
+    CACHE_ROLES = clients.get_roles(os_cloud)
 
     # Generate a random name in the form abcd-0123
     if use_random:
@@ -248,7 +257,7 @@ def run(
             logger.info(f"Assigned domain admin group to project: {name}")
 
         # FIXME(berendt): use openstacksdk
-        keystone = os_client_config.make_client("identity", cloud=cloud_name)
+        keystone = clients.make_client(os_cloud, "identity")
 
         # Set the quota parameters of the project
         keystone.projects.update(project=project.id, quotaclass=quota_class)
@@ -375,6 +384,8 @@ def run(
                     user_cloud_config["cacert"] = os_cloud.config.cacert
 
                 # Create connection as the user
+                import openstack
+
                 user_connection = openstack.connect(**user_cloud_config)
 
                 # Create Application Credential using user's connection
@@ -461,6 +472,8 @@ def run(
             result.append(["application_credential_id", app_cred.id, ""])
             result.append(["application_credential_secret", app_cred_secret, ""])
 
+    from tabulate import tabulate
+
     print(tabulate(result, headers=["name", "value", "id"], tablefmt="psql"))
 
 
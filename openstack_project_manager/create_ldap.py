@@ -4,19 +4,20 @@ from pathlib import Path
 import subprocess
 import sys
 
-from dynaconf import Dynaconf
-import ldap
 from loguru import logger
-import openstack
 import typer
 from typing_extensions import Annotated
 from typing import Optional
 
+from openstack_project_manager import clients
+
 # Default roles to be assigned to a new user for a project
 DEFAULT_ROLES = ["member", "load-balancer_member"]
 
 
 def get_settings(domain_name: str):
+    from dynaconf import Dynaconf
+
     # NOTE: This toxdir thing is super hacky, but works that way for us for now.
     toxdir = Path(__file__).parents[1]
     settings = Dynaconf(
@@ -36,6 +37,20 @@ def run(
     cloud_name: Annotated[
         str, typer.Option("--cloud", help="Cloud name in clouds.yml")
     ] = "admin",
+    token_cache: Annotated[
+        bool,
+        typer.Option(
+            "--token-cache/--notoken-cache",
+            help="Cache token, service catalog and API versions on disk until the token expires",
+        ),
+    ] = False,
+    inventory_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--inventory",
+            help="Look up the users and projects of the domain in a local SQLite inventory",
+        ),
+    ] = None,
     domain_name: Annotated[
         str, typer.Option("--domain", help="Domain to be managed")
     ] = "default",
@@ -123,6 +138,10 @@ def run(
         f"--quota-multiplier={parameters['quotamultiplier']}",
     ]
 
+    # every call of create can reuse the token of the previous one
+    if token_cache:
+        params.append("--token-cache")
+
     if parameters["has_public_network"]:
         params.append("--has-public-network")
     else:
@@ -155,6 +174,8 @@ def run(
 
     # get ldap information
 
+    import ldap
+
     conn = ldap.initialize(ldap_server)
     conn.simple_bind_s(ldap_username, ldap_password)
 
@@ -165,13 +186,17 @@ def run(
 
     # check openstack projects
 
-    os_cloud = openstack.connect(cloud=cloud_name)
+    os_cloud = clients.connect(cloud_name, token_cache=token_cache)
     domain = os_cloud.identity.find_domain(domain_name)
 
+    inventory = None
+    if inventory_file:
+        from openstack_project_manager.inventory import Inventory
+
+        inventory = Inventory(inventory_file)
+
     # cache roles
-    CACHE_ROLES = {}
-    for role in os_cloud.identity.roles():
-        CACHE_ROLES[role.name] = role
+    CACHE_ROLES = clients.get_roles(os_cloud)
 
     for a, b in result:
 
@@ -182,13 +207,13 @@ def run(
             username = x.decode("utf-8")
 
             logger.debug(f"Checking user {username}")
-            user = os_cloud.identity.find_user(username, domain_id=domain.id)
+            user = clients.find_user(os_cloud, username, domain.id, inventory)
 
             if not user:
                 continue
 
-            project = os_cloud.identity.find_project(
-                f"{domain.name}-{username}", domain_id=domain.id
+            project = clients.find_project(
+                os_cloud, f"{domain.name}-{username}", domain.id, inventory
             )
 
             if project:
@@ -203,6 +228,10 @@ def run(
             project = os_cloud.identity.find_project(
                 f"{domain.name}-{username}", domain_id=domain.id
             )
+            if inventory and project:
+                from openstack_project_manager.inventory import to_item
+
+                inventory.add("projects", domain.id, to_item(project))
 
             for role_name in DEFAULT_ROLES:
                 try:
@@ -215,6 +244,9 @@ def run(
 
     conn.unbind_s()
 
+    if inventory:
+        inventory.close()
+
 
 def main() -> None:
     typer.run(run)
@@ -5,10 +5,10 @@ import string
 
 import typer
 from typing_extensions import Annotated
-import openstack
-from tabulate import tabulate
 from typing import Optional
 
+from openstack_project_manager import clients
+
 # Default roles to be assigned to a new user for a project
 DEFAULT_ROLES = ["member", "load-balancer_member"]
 
@@ -42,13 +42,13 @@ def run(
     ] = None,
 ) -> None:
 
+    from tabulate import tabulate
+
     # Connect to the OpenStack environment
-    os_cloud = openstack.connect(cloud=cloud_name)
+    os_cloud = clients.connect(cloud_name)
 
     # cache roles
-    CACHE_ROLES = {}
-    for role in os_cloud.identity.roles():
-        CACHE_ROLES[role.name] = role
+    CACHE_ROLES = clients.get_roles(os_cloud)
 
     # Generate a random password from all ASCII characters + digits
     if not password:
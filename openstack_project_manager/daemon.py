@@ -0,0 +1,507 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import enum
+import json
+import queue
+import signal
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from loguru import logger
+import typer
+from typing_extensions import Annotated
+
+from openstack_project_manager import classwatch, clients, manage, workqueue
+
+# notifications of keystone for projects that have to be reconciled
+EVENT_TYPES = ["identity.project.created", "identity.project.updated"]
+
+
+class Source(str, enum.Enum):
+    file = "file"
+    messaging = "messaging"
+
+
+def parse_notification(message: dict) -> Optional[str]:
+    # NOTE: Notifications on the message bus are wrapped in an envelope with the
+    #       serialized notification, both forms are accepted from all sources.
+    if "oslo.message" in message:
+        message = json.loads(message["oslo.message"])
+
+    if message.get("event_type") not in EVENT_TYPES:
+        return None
+
+    # basic and CADF notifications both have the project ID in resource_info
+    return (message.get("payload") or {}).get("resource_info")
+
+
+class QueueSource:
+
+    def __init__(self, max_size: int = 0):
+        # notifications in the order they were received, None stops the source
+        self.queue: queue.Queue = queue.Queue(max_size)
+
+    def put(self, message: Optional[dict]) -> None:
+        self.queue.put(message)
+
+    def __iter__(self) -> Iterator[dict]:
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            yield message
+
+    def stop(self) -> None:
+        self.queue.put(None)
+
+
+class FileSource:
+
+    def __init__(self, path: Path, follow: bool = False, interval: float = 1.0):
+        self.path = path
+        self.follow = follow
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def __iter__(self) -> Iterator[dict]:
+        # one notification per line, a file that is followed is read like tail -f
+        with open(self.path) as fp:
+            buffer = ""
+            while not self.stopped.is_set():
+                line = fp.readline()
+                if not line:
+                    if not self.follow:
+                        break
+                    self.stopped.wait(self.interval)
+                    continue
+
+                buffer += line
+                if not buffer.endswith("\n") and self.follow:
+                    continue
+                line, buffer = buffer, ""
+
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"{self.path} - skipping invalid notification")
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+class MessagingSource(QueueSource):
+
+    def __init__(
+        self,
+        transport_url: str,
+        topic: str,
+        pool: str,
+        max_size: int = workqueue.DEFAULT_MAX_SIZE,
+    ):
+        from oslo_config import cfg
+        import oslo_messaging
+
+        # NOTE: A full queue blocks the listener in info, the notifications
+        #       are acknowledged once they are queued and stay on the bus until
+        #       the daemon catches up.
+        super().__init__(max_size)
+        transport = oslo_messaging.get_notification_transport(
+            cfg.CONF, url=transport_url
+        )
+        self.listener = oslo_messaging.get_notification_listener(
+            transport,
+            [oslo_messaging.Target(topic=topic)],
+            [self],
+            executor="threading",
+            pool=pool,
+        )
+        self.listener.start()
+
+    def info(
+        self,
+        ctxt: Any,
+        publisher_id: str,
+        event_type: str,
+        payload: dict,
+        metadata: Any,
+    ) -> None:
+        self.put({"event_type": event_type, "payload": payload})
+
+    def stop(self) -> None:
+        self.listener.stop()
+        self.listener.wait()
+        super().stop()
+
+
+class Daemon:
+
+    def __init__(
+        self,
+        configuration: manage.Configuration,
+        classes: list[Path],
+        manage_endpoints: bool,
+        manage_homeprojects: bool,
+        manage_privatevolumetypes: bool,
+        manage_defaultvolumetype: bool,
+        manage_privateflavors: bool,
+        work_queue: Optional[workqueue.WorkQueue] = None,
+        textfile: Optional[Path] = None,
+        watcher: Optional[classwatch.ClassWatcher] = None,
+    ):
+        self.configuration = configuration
+        self.classes = classes
+        self.manage_endpoints = manage_endpoints
+        self.manage_homeprojects = manage_homeprojects
+        self.manage_privatevolumetypes = manage_privatevolumetypes
+        self.manage_defaultvolumetype = manage_defaultvolumetype
+        self.manage_privateflavors = manage_privateflavors
+        self.work_queue = work_queue or workqueue.WorkQueue()
+        self.textfile = textfile
+        self.watcher = watcher
+
+    def reconcile(self, project_id: str) -> None:
+        import openstack
+
+        configuration = self.configuration
+        try:
+            project = configuration.os_cloud.identity.get_project(project_id)
+        except openstack.exceptions.NotFoundException:
+            logger.warning(f"project {project_id} not found, skipping")
+            return
+
+        self.update_inventory(project)
+
+        if project.domain_id == "default" and project.name in manage.UNMANAGED_PROJECTS:
+            manage.handle_unmanaged_project(configuration, project, self.classes)
+        else:
+            manage.process_project(
+                configuration,
+                project,
+                self.classes,
+                self.manage_endpoints,
+                self.manage_homeprojects,
+                self.manage_privatevolumetypes,
+                self.manage_defaultvolumetype,
+                self.manage_privateflavors,
+            )
+
+    def update_inventory(self, project: Any) -> None:
+        from openstack_project_manager.inventory import to_item
+
+        # NOTE: The class index of reload is built from the projects of the
+        #       inventory, a project moved to another class is indexed under
+        #       its new class once it was reconciled.
+        inventory = self.configuration.inventory
+        if not inventory:
+            return
+
+        item = to_item(project)
+        for scope in [project.domain_id, "all"]:
+            inventory.update(
+                "projects",
+                scope,
+                lambda items: [x for x in items if x["id"] != item["id"]] + [item],
+            )
+
+    def receive(self, source: Any) -> None:
+        try:
+            for message in source:
+                project_id = parse_notification(message)
+                if not project_id:
+                    continue
+
+                logger.debug(f"project {project_id} - {message.get('event_type')}")
+                self.work_queue.put(project_id)
+        except Exception:
+            logger.exception("receiving notifications failed")
+        finally:
+            # the pending projects are still reconciled when the source ends
+            self.work_queue.close()
+
+    def get_projects(self) -> Iterable[dict]:
+        from openstack_project_manager.inventory import to_item
+
+        # the projects of the last inventory, a list of all projects without one
+        # or with an inventory that does not contain any projects yet
+        if self.configuration.inventory:
+            projects = list(self.configuration.inventory.items("projects"))
+            if projects:
+                return projects
+        return [to_item(x) for x in manage.list_projects(self.configuration)]
+
+    def reload(self) -> None:
+        if not self.watcher:
+            return
+        changed = self.watcher.check()
+        if not changed:
+            return
+
+        index = classwatch.get_class_index(self.get_projects())
+        projects = set().union(*[index.get(x, set()) for x in changed])
+        logger.info(
+            f"classes {', '.join(sorted(changed))} changed, reconciling {len(projects)} projects"
+        )
+        for project_id in sorted(projects):
+            self.work_queue.put(project_id, block=False)
+
+    def write_textfile(self) -> None:
+        if self.textfile:
+            self.configuration.metrics.write_textfile(
+                self.textfile, work_queue=self.work_queue
+            )
+
+    def serve(self, source: Any, interval: float = 1.0) -> None:
+        # NOTE: The notifications are received in a thread and coalesced in the
+        #       work queue, a burst of notifications for the same project costs
+        #       one reconcile. The connection, the cached roles and quota classes
+        #       and the inventory are kept between the reconciles.
+        receiver = threading.Thread(
+            target=self.receive, args=(source,), name="receiver", daemon=True
+        )
+        receiver.start()
+
+        while not self.work_queue.done:
+            project_id = self.work_queue.get(timeout=interval)
+            if project_id:
+                logger.info(f"project {project_id} - reconciling")
+                try:
+                    with self.configuration.metrics.reconcile():
+                        self.reconcile(project_id)
+                except Exception:
+                    # a failed project must not stop the daemon
+                    logger.exception(f"project {project_id} - reconcile failed")
+
+                if self.configuration.inventory:
+                    self.configuration.inventory.commit()
+
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("reloading the classes failed")
+
+            self.write_textfile()
+
+        receiver.join()
+        self.write_textfile()
+
+
+def run(
+    source_name: Annotated[
+        Source,
+        typer.Option(
+            "--source",
+            help="Source of the keystone notifications",
+        ),
+    ] = Source.messaging,
+    notification_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--file", help="File with one notification per line for the file source"
+        ),
+    ] = None,
+    follow: Annotated[
+        bool,
+        typer.Option(
+            "--follow/--nofollow",
+            help="Wait for new notifications at the end of the file of the file source",
+        ),
+    ] = True,
+    transport_url: Annotated[
+        Optional[str],
+        typer.Option(
+            "--transport-url", help="Transport URL of the message bus, e.g. rabbit://"
+        ),
+    ] = None,
+    topic: Annotated[
+        str, typer.Option("--topic", help="Topic of the keystone notifications")
+    ] = "notifications",
+    pool: Annotated[
+        str,
+        typer.Option(
+            "--pool",
+            help="Listener pool on the message bus, daemons in the same pool share the notifications",
+        ),
+    ] = "openstack-project-manager",
+    assign_admin_user: Annotated[
+        bool,
+        typer.Option(
+            "--assign-admin-user/--noassign-admin-user", help="Assign admin user"
+        ),
+    ] = False,
+    dry_run: Annotated[
+        bool, typer.Option("--dry-run/--nodry-run", help="Do not really do anything")
+    ] = False,
+    manage_endpoints: Annotated[
+        bool,
+        typer.Option(
+            "--manage-endpoints/--nomanage-endpoints", help="Manage endpoints"
+        ),
+    ] = False,
+    manage_homeprojects: Annotated[
+        bool,
+        typer.Option(
+            "--manage-homeprojects/--nomanage-homeprojects", help="Manage home projects"
+        ),
+    ] = False,
+    manage_privatevolumetypes: Annotated[
+        bool,
+        typer.Option(
+            "--manage-privatevolumetypes/--nomanage-privatevolumetypes",
+            help="Manage private volume types",
+        ),
+    ] = True,
+    manage_defaultvolumetype: Annotated[
+        bool,
+        typer.Option(
+            "--manage-defaultvolumetype/--nomanage-defaultvolumetype",
+            help="Manage default volume type",
+        ),
+    ] = True,
+    manage_privateflavors: Annotated[
+        bool,
+        typer.Option(
+            "--manage-privateflavors/--nomanage-privateflavors",
+            help="Manage private flavors",
+        ),
+    ] = True,
+    admin_domain: Annotated[
+        str, typer.Option("--admin-domain", help="Admin domain")
+    ] = "default",
+    classes: Annotated[
+        list[Path],
+        typer.Option(
+            "--classes",
+            help=(
+                "Path to a classes.yml file. May be specified multiple times, in which case YAML files will be merged with the latter ones taking precedence "
+                "over previous ones. Non-existent files will be skipped"
+            ),
+        ),
+    ] = [
+        Path("etc/classes.yml"),
+        Path("/opt/configuration/environments/openstack/project-manager/classes.yml"),
+    ],
+    endpoints: Annotated[
+        str, typer.Option("--endpoints", help="Path to the endpoints.yml file")
+    ] = "etc/endpoints.yml",
+    cloud_name: Annotated[
+        str, typer.Option("--cloud", help="Cloud name in clouds.yaml")
+    ] = "admin",
+    pool_size: Annotated[
+        int,
+        typer.Option(
+            "--pool-size", help="Size of the HTTP connection pool shared by all clients"
+        ),
+    ] = clients.DEFAULT_POOL_SIZE,
+    inventory_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--inventory",
+            help="Look up domains, projects, flavors, volume types, access lists, RBAC and QoS policies and endpoint groups in a local SQLite inventory",
+        ),
+    ] = None,
+    debounce: Annotated[
+        float,
+        typer.Option(
+            "--debounce",
+            help="Seconds a project waits for further notifications before it is reconciled",
+        ),
+    ] = workqueue.DEFAULT_DEBOUNCE,
+    max_delay: Annotated[
+        float,
+        typer.Option(
+            "--max-delay",
+            help="Seconds a project with a steady stream of notifications waits at most",
+        ),
+    ] = workqueue.DEFAULT_MAX_DELAY,
+    max_queue_size: Annotated[
+        int,
+        typer.Option(
+            "--max-queue-size",
+            help="Pending projects and queued notifications before receiving notifications is paused",
+        ),
+    ] = workqueue.DEFAULT_MAX_SIZE,
+    textfile: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--textfile",
+            help="Write the metrics of the work queue to a textfile of the node_exporter textfile collector",
+        ),
+    ] = None,
+    watch_classes: Annotated[
+        bool,
+        typer.Option(
+            "--watch-classes/--nowatch-classes",
+            help="Reconcile the projects of the classes that changed in the classes files",
+        ),
+    ] = False,
+    watch_interval: Annotated[
+        float,
+        typer.Option(
+            "--watch-interval",
+            help="Seconds between two checks of the classes files for changes",
+        ),
+    ] = classwatch.DEFAULT_INTERVAL,
+) -> None:
+    source: Any
+    if source_name == Source.file:
+        if not notification_file:
+            logger.error("--file is required for the file source")
+            sys.exit(1)
+        source = FileSource(notification_file, follow)
+    else:
+        if not transport_url:
+            logger.error("--transport-url is required for the messaging source")
+            sys.exit(1)
+        source = MessagingSource(transport_url, topic, pool, max_queue_size)
+
+    configuration = manage.Configuration(
+        dry_run,
+        cloud_name,
+        endpoints,
+        assign_admin_user,
+        admin_domain,
+        pool_size=pool_size,
+        inventory_file=inventory_file,
+    )
+
+    daemon = Daemon(
+        configuration,
+        classes,
+        manage_endpoints,
+        manage_homeprojects,
+        manage_privatevolumetypes,
+        manage_defaultvolumetype,
+        manage_privateflavors,
+        workqueue.WorkQueue(debounce, max_delay, max_queue_size),
+        textfile,
+        classwatch.ClassWatcher(classes, watch_interval) if watch_classes else None,
+    )
+
+    def stop(signum: int, frame: Any) -> None:
+        logger.info(f"received signal {signum}, stopping")
+        # NOTE: Stopping the source waits for notifications blocked on its full
+        #       queue, the queue is only drained while the main thread serves.
+        threading.Thread(target=source.stop, name="stop").start()
+
+    handlers = {x: signal.signal(x, stop) for x in [signal.SIGTERM, signal.SIGINT]}
+
+    logger.info(f"waiting for notifications from the {source_name.value} source")
+    try:
+        daemon.serve(source)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        if configuration.inventory:
+            configuration.inventory.close()
+
+
+def main() -> None:
+    typer.run(run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1482 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import copy
+import datetime
+import functools
+import ipaddress
+import json
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from loguru import logger
+import typer
+from typing_extensions import Annotated
+
+# NOTE: The fake cloud implements the subset of the Keystone, Nova, Neutron, Cinder
+#       and Glance APIs used by the tools, with just enough behaviour to let the real
+#       openstacksdk, keystoneclient and neutronclient code paths run against it.
+
+REGION = "RegionOne"
+
+# catalog entries, path prefix and versions of the services
+SERVICES = {
+    "identity": {"name": "keystone", "prefix": "identity"},
+    "compute": {"name": "nova", "prefix": "compute"},
+    "network": {"name": "neutron", "prefix": "network"},
+    "block-storage": {"name": "cinder", "prefix": "volume"},
+    "image": {"name": "glance", "prefix": "image"},
+}
+
+# versions of the services: path, version, maximum and minimum microversion
+VERSIONS = {
+    "identity": [("v3", "v3.14", "", "")],
+    "compute": [("v2.1", "v2.1", "2.95", "2.1")],
+    "network": [("v2.0", "v2.0", "", "")],
+    "block-storage": [("v3", "v3.0", "3.70", "3.0")],
+    "image": [("v2", "v2.16", "", "")],
+}
+
+DEFAULT_ROLES = ["admin", "member", "reader", "load-balancer_member"]
+
+DEFAULT_QUOTAS = {
+    "compute": {
+        "cores": 20,
+        "injected_file_content_bytes": 10240,
+        "injected_file_path_bytes": 255,
+        "injected_files": 5,
+        "instances": 10,
+        "key_pairs": 100,
+        "metadata_items": 128,
+        "ram": 51200,
+        "server_group_members": 10,
+        "server_groups": 10,
+    },
+    "network": {
+        "floatingip": 50,
+        "network": 100,
+        "port": 500,
+        "rbac_policy": 10,
+        "router": 10,
+        "security_group": 10,
+        "security_group_rule": 100,
+        "subnet": 100,
+        "subnetpool": -1,
+    },
+    "volume": {
+        "backup_gigabytes": 1000,
+        "backups": 10,
+        "gigabytes": 1000,
+        "per_volume_gigabytes": -1,
+        "snapshots": 10,
+        "volumes": 10,
+    },
+}
+
+# neutron extensions the clients check before using a feature
+NETWORK_EXTENSIONS = [
+    "external-net",
+    "network_availability_zone",
+    "qos",
+    "qos-default",
+    "quotas",
+    "rbac-policies",
+    "router",
+    "router_availability_zone",
+]
+
+# query parameters that are no filters
+IGNORED_QUERY = ["fields", "limit", "marker", "sort_key", "sort_dir", "usage"]
+
+# subnets of projects are allocated from the default subnet pool
+DEFAULT_SUBNET_POOL = "10.0.0.0/8"
+
+# HTTP methods that change resources and may conflict with a concurrent change
+MUTATING_METHODS = ["DELETE", "PATCH", "POST", "PUT"]
+
+
+class HttpError(Exception):
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def new_state() -> dict:
+    return {
+        "domains": {},
+        "projects": {},
+        "users": {},
+        "roles": {},
+        "role_assignments": [],
+        "endpoint_groups": {},
+        "project_endpoint_groups": [],
+        "flavors": {},
+        "flavor_access": [],
+        "networks": {},
+        "subnets": {},
+        "routers": {},
+        "rbac_policies": {},
+        "qos_policies": {},
+        "qos_bandwidth_limit_rules": {},
+        "volume_types": {},
+        "volume_type_access": [],
+        "default_volume_types": {},
+        "volumes": {},
+        "images": {},
+        "image_members": [],
+        "quotas": {"compute": {}, "network": {}, "volume": {}},
+    }
+
+
+def matches(item: dict, query: Dict[str, str]) -> bool:
+    for key, value in query.items():
+        if key in IGNORED_QUERY:
+            continue
+        if key not in item:
+            return False
+        if str(item[key]) != value and str(item[key]).lower() != value.lower():
+            return False
+    return True
+
+
+class Faults:
+
+    def __init__(
+        self,
+        latency: Optional[Dict[str, Tuple[float, float]]] = None,
+        throttle_rate: float = 0.0,
+        retry_after: int = 1,
+        conflict_rate: float = 0.0,
+    ):
+        # mean and standard deviation of the latency in seconds by service type,
+        # the entry * applies to all services without an entry of their own
+        self.latency = latency or {}
+
+        # probability of a 429 or 503 response with a Retry-After header
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+        # probability of a 409 response to a request that changes a resource
+        self.conflict_rate = conflict_rate
+
+
+def parse_latency(values: List[str]) -> Dict[str, Tuple[float, float]]:
+    # SERVICE=MEAN[:STDDEV] in milliseconds, e.g. compute=50:10 or *=20
+    result = {}
+    for value in values:
+        service, _, distribution = value.partition("=")
+        mean, _, stddev = distribution.partition(":")
+        result[service] = (float(mean) / 1000, float(stddev or 0) / 1000)
+    return result
+
+
+class Request:
+
+    def __init__(self, method: str, path: str, query: Dict[str, str], body: Any):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+
+
+Response = Tuple[int, Any, Dict[str, str]]
+
+
+class FakeCloud:
+
+    def __init__(
+        self,
+        state: Optional[dict] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+        faults: Optional[Faults] = None,
+    ):
+        self.state = state or new_state()
+        self.lock = threading.RLock()
+        self.access_log = False
+        self.host = host
+        self.port = port
+
+        # resources get the same IDs on every run with the same seed
+        self.random = random.Random(seed)
+
+        # injected latency and errors, with a generator of their own to keep the
+        # IDs of the resources independent of the injected faults
+        self.faults = faults or Faults()
+        self.faults_random = random.Random(seed)
+        self.injected: Dict[str, int] = {}
+
+        # requests served, by method and path
+        self.requests: List[Tuple[str, str]] = []
+
+        # items by collection, key and lowercase value, dropped on every change
+        self.indexes: Dict[Tuple[str, str], Dict[str, List[dict]]] = {}
+
+        # the server is bound on first use, a generated state does not need one
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+        self.routes: List[Tuple[str, re.Pattern, Callable[..., Response]]] = []
+        self.add_routes()
+
+        if not self.state["domains"]:
+            self.bootstrap()
+
+    def bind(self) -> ThreadingHTTPServer:
+        if not self.server:
+            self.server = ThreadingHTTPServer((self.host, self.port), FakeCloudHandler)
+            self.server.daemon_threads = True
+            self.server.cloud = self  # type: ignore[attr-defined]
+        return self.server
+
+    @property
+    def url(self) -> str:
+        host, port = self.bind().server_address[:2]
+        return f"http://{str(host)}:{port}"
+
+    def endpoint(self, service_type: str) -> str:
+        return f"{self.url}/{SERVICES[service_type]['prefix']}"
+
+    def start(self) -> "FakeCloud":
+        self.thread = threading.Thread(
+            target=self.bind().serve_forever, name="fakecloud", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self) -> "FakeCloud":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    # state
+
+    def new_id(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def store(self, collection: str, item: dict) -> dict:
+        self.state[collection][item["id"]] = item
+        self.indexes.clear()
+        return item
+
+    def lookup(self, collection: str, query: Dict[str, str]) -> List[dict]:
+        # NOTE: The clients look up projects, users and networks by name or owner
+        #       for every project, an index keeps this cheap with 100k projects.
+        for key in ["id", "name", "domain_id", "project_id"]:
+            if key in query:
+                index = self.indexes.get((collection, key))
+                if index is None:
+                    index = {}
+                    for item in self.state[collection].values():
+                        if key in item:
+                            index.setdefault(str(item[key]).lower(), []).append(item)
+                    self.indexes[(collection, key)] = index
+                candidates = index.get(query[key].lower(), [])
+                break
+        else:
+            candidates = list(self.state[collection].values())
+
+        return [x for x in candidates if matches(x, query)]
+
+    def save(self, path: Path) -> None:
+        with self.lock:
+            path.write_text(json.dumps(self.state, indent=2, sort_keys=True))
+
+    @staticmethod
+    def load_state(path: Path) -> dict:
+        return json.loads(path.read_text())
+
+    def get_clouds_yaml(self, cloud_name: str = "fakecloud") -> dict:
+        return {
+            "clouds": {
+                cloud_name: {
+                    "auth": {
+                        "auth_url": f"{self.endpoint('identity')}/v3",
+                        "username": "admin",
+                        "password": "password",
+                        "user_domain_name": "Default",
+                        "project_name": "admin",
+                        "project_domain_name": "Default",
+                    },
+                    "identity_api_version": 3,
+                    "region_name": REGION,
+                    "interface": "public",
+                }
+            }
+        }
+
+    def bootstrap(self) -> None:
+        self.add_domain("Default", id="default")
+        for name in DEFAULT_ROLES:
+            self.add_role(name)
+        admin = self.add_project("admin", "default")
+        self.add_project("service", "default")
+        user = self.add_user("admin", "default")
+        self.state["role_assignments"].append(
+            {
+                "user_id": user["id"],
+                "project_id": admin["id"],
+                "role_id": self.find("roles", "admin")["id"],
+            }
+        )
+
+    def find(self, collection: str, name_or_id: str, **filters: str) -> dict:
+        items = self.state[collection]
+        if name_or_id in items:
+            return items[name_or_id]
+        for item in items.values():
+            if item.get("name") == name_or_id and matches(item, filters):
+                return item
+        raise KeyError(name_or_id)
+
+    def add_domain(self, name: str, **attributes: Any) -> dict:
+        domain = {
+            "id": self.new_id().replace("-", ""),
+            "name": name,
+            "description": "",
+            "enabled": True,
+            "options": {},
+            "tags": [],
+        }
+        domain.update(attributes)
+        return self.store("domains", domain)
+
+    def add_project(self, name: str, domain_id: str, **properties: Any) -> dict:
+        project = {
+            "id": self.new_id().replace("-", ""),
+            "name": name,
+            "domain_id": domain_id,
+            "parent_id": domain_id,
+            "description": "",
+            "enabled": True,
+            "is_domain": False,
+            "options": {},
+            "tags": [],
+        }
+        project.update(properties)
+        return self.store("projects", project)
+
+    def add_user(self, name: str, domain_id: str, **attributes: Any) -> dict:
+        user = {
+            "id": self.new_id().replace("-", ""),
+            "name": name,
+            "domain_id": domain_id,
+            "enabled": True,
+            "options": {},
+            "password_expires_at": None,
+        }
+        user.update(attributes)
+        return self.store("users", user)
+
+    def add_role(self, name: str) -> dict:
+        role = {"id": self.new_id().replace("-", ""), "name": name, "domain_id": None}
+        return self.store("roles", role)
+
+    def add_endpoint_group(self, name: str, **filters: str) -> dict:
+        endpoint_group = {
+            "id": self.new_id().replace("-", ""),
+            "name": name,
+            "description": "",
+            "filters": filters,
+        }
+        return self.store("endpoint_groups", endpoint_group)
+
+    def add_flavor(self, name: str, is_public: bool = True, **attributes: Any) -> dict:
+        flavor = {
+            "id": self.new_id(),
+            "name": name,
+            "vcpus": 1,
+            "ram": 1024,
+            "disk": 10,
+            "OS-FLV-EXT-DATA:ephemeral": 0,
+            "OS-FLV-DISABLED:disabled": False,
+            "swap": 0,
+            "rxtx_factor": 1.0,
+            "os-flavor-access:is_public": is_public,
+            "description": None,
+            "extra_specs": {},
+        }
+        flavor.update(attributes)
+        return self.store("flavors", flavor)
+
+    def add_network(
+        self, name: str, project_id: str, external: bool = False, **attributes: Any
+    ) -> dict:
+        network = {
+            "id": self.new_id(),
+            "name": name,
+            "project_id": project_id,
+            "tenant_id": project_id,
+            "status": "ACTIVE",
+            "admin_state_up": True,
+            "shared": False,
+            "router:external": external,
+            "availability_zone_hints": [],
+            "availability_zones": ["nova"],
+            "subnets": [],
+            "mtu": 1500,
+            "tags": [],
+        }
+        network.update(attributes)
+        return self.store("networks", network)
+
+    def add_volume_type(
+        self, name: str, is_public: bool = True, **attributes: Any
+    ) -> dict:
+        volume_type: dict = {
+            "id": self.new_id(),
+            "name": name,
+            "description": None,
+            "is_public": is_public,
+            "os-volume-type-access:is_public": is_public,
+            "extra_specs": {},
+            "qos_specs_id": None,
+        }
+        volume_type.update(attributes)
+        return self.store("volume_types", volume_type)
+
+    def add_image(self, name: str, owner: str, **attributes: Any) -> dict:
+        now = get_timestamp()
+        image = {
+            "id": self.new_id(),
+            "name": name,
+            "owner": owner,
+            "status": "active",
+            "visibility": "shared",
+            "disk_format": "qcow2",
+            "container_format": "bare",
+            "size": 1073741824,
+            "virtual_size": None,
+            "min_disk": 0,
+            "min_ram": 0,
+            "protected": False,
+            "tags": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        image.update(attributes)
+        return self.store("images", image)
+
+    def get_quota(self, kind: str, project_id: str) -> dict:
+        self.state["projects"][project_id]
+        return self.state["quotas"][kind].get(project_id, DEFAULT_QUOTAS[kind])
+
+    # http
+
+    def inject(self, method: str, path: str) -> Optional[Response]:
+        prefix, _, rest = path.lstrip("/").partition("/")
+        service_type = next(
+            (k for k, v in SERVICES.items() if v["prefix"] == prefix), ""
+        )
+
+        with self.lock:
+            mean, stddev = self.faults.latency.get(
+                service_type, self.faults.latency.get("*", (0.0, 0.0))
+            )
+            latency = max(0.0, self.faults_random.gauss(mean, stddev))
+            fault = self.faults_random.random()
+
+        # NOTE: The latency is spent outside of the lock, concurrent requests
+        #       overlap as they do with a real control plane. Version discovery
+        #       and authentication never fail, the clients would not get far.
+        if latency:
+            time.sleep(latency)
+        if "/" not in rest or rest.endswith("auth/tokens"):
+            return None
+
+        # NOTE: A 503 is only retried for idempotent requests, throttled POST
+        #       and PATCH requests are answered with 429 so that a run completes.
+        status = 0
+        if fault < self.faults.throttle_rate:
+            if method in ["PATCH", "POST"] or fault < self.faults.throttle_rate / 2:
+                status = 429
+            else:
+                status = 503
+        elif (
+            method in MUTATING_METHODS
+            and fault < self.faults.throttle_rate + self.faults.conflict_rate
+        ):
+            status = 409
+        if not status:
+            return None
+
+        with self.lock:
+            self.injected[str(status)] = self.injected.get(str(status), 0) + 1
+
+        headers = {}
+        if status in [429, 503]:
+            headers["Retry-After"] = str(self.faults.retry_after)
+        return status, error_body(status, "injected by the fake cloud"), headers
+
+    def handle(
+        self, method: str, url: str, body: Any
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        parsed = urlparse(url)
+        path = parsed.path.rstrip("/") or "/"
+        query = dict(parse_qsl(parsed.query))
+        request = Request(method, path, query, body)
+
+        fault = self.inject(method, path)
+        if fault:
+            return fault
+
+        with self.lock:
+            self.requests.append((method, path))
+            if method not in ["GET", "HEAD"]:
+                self.indexes.clear()
+
+            for route_method, pattern, handler in self.routes:
+                match = pattern.fullmatch(path)
+                if match and route_method == method:
+                    try:
+                        return handler(request, **match.groupdict())
+                    except HttpError as e:
+                        return e.status, error_body(e.status, e.message), {}
+                    except KeyError as e:
+                        return 404, error_body(404, f"{e} not found"), {}
+
+        logger.debug(f"fakecloud - no route for {method} {path}")
+        return 404, error_body(404, f"no route for {method} {path}"), {}
+
+    def route(self, method: str, pattern: str) -> Callable:
+        def decorator(handler: Callable[..., Response]) -> Callable[..., Response]:
+            self.routes.append((method, re.compile(pattern), handler))
+            return handler
+
+        return decorator
+
+    def add_routes(self) -> None:
+        self.add_discovery_routes()
+        self.add_identity_routes()
+        self.add_compute_routes()
+        self.add_network_routes()
+        self.add_volume_routes()
+        self.add_image_routes()
+
+    def add_discovery_routes(self) -> None:
+        for service_type, versions in VERSIONS.items():
+            prefix = SERVICES[service_type]["prefix"]
+            self.route("GET", f"/{prefix}")(
+                functools.partial(self.list_versions, service_type)
+            )
+            for version in versions:
+                self.route("GET", f"/{prefix}/{version[0]}")(
+                    functools.partial(self.show_version, service_type, version)
+                )
+
+    def get_version_document(self, service_type: str, version: tuple) -> dict:
+        path, version_id, current, minimum = version
+        document: Dict[str, Any] = {
+            "id": version_id,
+            "status": "stable" if service_type == "identity" else "CURRENT",
+            "links": [
+                {"rel": "self", "href": f"{self.endpoint(service_type)}/{path}/"}
+            ],
+            "updated": "2024-01-01T00:00:00Z",
+        }
+        if current:
+            document["version"] = current
+            document["min_version"] = minimum
+        if service_type == "identity":
+            document["media-types"] = [
+                {
+                    "base": "application/json",
+                    "type": "application/vnd.openstack.identity-v3+json",
+                }
+            ]
+        return document
+
+    def list_versions(self, service_type: str, request: Request) -> Response:
+        documents = [
+            self.get_version_document(service_type, x) for x in VERSIONS[service_type]
+        ]
+        if service_type == "identity":
+            return 300, {"versions": {"values": documents}}, {}
+        return 300, {"versions": documents}, {}
+
+    def show_version(
+        self, service_type: str, version: tuple, request: Request
+    ) -> Response:
+        document = self.get_version_document(service_type, version)
+        if service_type == "image":
+            return 200, {"versions": [document]}, {}
+        return 200, {"version": document}, {}
+
+    # identity
+
+    def add_identity_routes(self) -> None:
+        route = self.route
+        prefix = "/identity/v3"
+
+        @route("POST", f"{prefix}/auth/tokens")
+        def issue_token(request: Request) -> Response:
+            auth = request.body["auth"]
+            password = auth["identity"]["password"]["user"]
+            user_domain = password.get("domain", {})
+            user = self.find(
+                "users",
+                password.get("id") or password["name"],
+                **self.domain_filter(user_domain),
+            )
+
+            scope = auth.get("scope", {}).get("project", {})
+            project = self.find(
+                "projects",
+                scope.get("id") or scope["name"],
+                **self.domain_filter(scope.get("domain", {})),
+            )
+
+            expires_at = datetime.datetime.now(
+                datetime.timezone.utc
+            ) + datetime.timedelta(hours=1)
+            token = {
+                "methods": ["password"],
+                "expires_at": expires_at.strftime("%Y-%m-%dT%H:%M:%S.000000Z"),
+                "issued_at": get_timestamp(),
+                "user": {
+                    "id": user["id"],
+                    "name": user["name"],
+                    "domain": {"id": user["domain_id"], "name": user["domain_id"]},
+                },
+                "project": {
+                    "id": project["id"],
+                    "name": project["name"],
+                    "domain": {
+                        "id": project["domain_id"],
+                        "name": self.state["domains"][project["domain_id"]]["name"],
+                    },
+                },
+                "roles": [
+                    {"id": x["id"], "name": x["name"]}
+                    for x in self.state["roles"].values()
+                ],
+                "catalog": self.get_catalog(),
+            }
+            return 201, {"token": token}, {"X-Subject-Token": uuid.uuid4().hex}
+
+        @route("GET", f"{prefix}/auth/tokens")
+        def validate_token(request: Request) -> Response:
+            raise HttpError(404, "token validation is not supported")
+
+        self.add_collection_routes(prefix, "domains", "domain", "domains")
+        self.add_collection_routes(prefix, "projects", "project", "projects")
+        self.add_collection_routes(prefix, "users", "user", "users")
+        self.add_collection_routes(prefix, "roles", "role", "roles")
+
+        @route(
+            "PUT",
+            f"{prefix}/projects/(?P<project_id>[^/]+)/users/(?P<user_id>[^/]+)/roles/(?P<role_id>[^/]+)",
+        )
+        def assign_role(
+            request: Request, project_id: str, user_id: str, role_id: str
+        ) -> Response:
+            for collection, key in [
+                ("projects", project_id),
+                ("users", user_id),
+                ("roles", role_id),
+            ]:
+                self.state[collection][key]
+
+            assignment = {
+                "user_id": user_id,
+                "project_id": project_id,
+                "role_id": role_id,
+            }
+            if assignment not in self.state["role_assignments"]:
+                self.state["role_assignments"].append(assignment)
+            return 204, None, {}
+
+        @route(
+            "HEAD",
+            f"{prefix}/projects/(?P<project_id>[^/]+)/users/(?P<user_id>[^/]+)/roles/(?P<role_id>[^/]+)",
+        )
+        def check_role(
+            request: Request, project_id: str, user_id: str, role_id: str
+        ) -> Response:
+            assignment = {
+                "user_id": user_id,
+                "project_id": project_id,
+                "role_id": role_id,
+            }
+            if assignment not in self.state["role_assignments"]:
+                raise HttpError(404, "role assignment not found")
+            return 204, None, {}
+
+        @route("GET", f"{prefix}/role_assignments")
+        def list_role_assignments(request: Request) -> Response:
+            query = {
+                k.split(".")[0] + "_id": v
+                for k, v in request.query.items()
+                if k in ["user.id", "scope.project.id", "role.id"]
+            }
+            query = {k.replace("scope_id", "project_id"): v for k, v in query.items()}
+            result = []
+            for assignment in self.state["role_assignments"]:
+                if not matches(assignment, query):
+                    continue
+                result.append(
+                    {
+                        "user": {"id": assignment["user_id"]},
+                        "role": {"id": assignment["role_id"]},
+                        "scope": {"project": {"id": assignment["project_id"]}},
+                    }
+                )
+            return 200, {"role_assignments": result, "links": {"next": None}}, {}
+
+        self.add_collection_routes(
+            f"{prefix}/OS-EP-FILTER",
+            "endpoint_groups",
+            "endpoint_group",
+            "endpoint_groups",
+        )
+
+        @route(
+            "GET",
+            f"{prefix}/OS-EP-FILTER/projects/(?P<project_id>[^/]+)/endpoint_groups",
+        )
+        def list_project_endpoint_groups(request: Request, project_id: str) -> Response:
+            self.state["projects"][project_id]
+            endpoint_groups = [
+                self.state["endpoint_groups"][x["endpoint_group_id"]]
+                for x in self.state["project_endpoint_groups"]
+                if x["project_id"] == project_id
+            ]
+            return 200, {"endpoint_groups": endpoint_groups, "links": {}}, {}
+
+        @route(
+            "PUT",
+            f"{prefix}/OS-EP-FILTER/endpoint_groups/(?P<endpoint_group_id>[^/]+)/projects/(?P<project_id>[^/]+)",
+        )
+        def add_project_endpoint_group(
+            request: Request, endpoint_group_id: str, project_id: str
+        ) -> Response:
+            self.state["endpoint_groups"][endpoint_group_id]
+            self.state["projects"][project_id]
+            association = {
+                "endpoint_group_id": endpoint_group_id,
+                "project_id": project_id,
+            }
+            if association not in self.state["project_endpoint_groups"]:
+                self.state["project_endpoint_groups"].append(association)
+            return 204, None, {}
+
+    def domain_filter(self, domain: dict) -> Dict[str, str]:
+        if "id" in domain:
+            return {"domain_id": domain["id"]}
+        elif "name" in domain:
+            return {"domain_id": self.find("domains", domain["name"])["id"]}
+        return {}
+
+    def get_catalog(self) -> list:
+        catalog = []
+        for service_type, service in SERVICES.items():
+            url = self.endpoint(service_type)
+            if service_type == "block-storage":
+                url += "/v3"
+            catalog.append(
+                {
+                    "id": uuid.uuid4().hex,
+                    "type": service_type,
+                    "name": service["name"],
+                    "endpoints": [
+                        {
+                            "id": uuid.uuid4().hex,
+                            "interface": interface,
+                            "region": REGION,
+                            "region_id": REGION,
+                            "url": url,
+                        }
+                        for interface in ["public", "internal", "admin"]
+                    ],
+                }
+            )
+        return catalog
+
+    def add_collection_routes(
+        self,
+        prefix: str,
+        collection: str,
+        singular: str,
+        plural: str,
+        item_path: Optional[str] = None,
+    ) -> None:
+        route = self.route
+        item_path = item_path or plural
+
+        @route("GET", f"{prefix}/{item_path}")
+        def list_items(request: Request) -> Response:
+            items = self.lookup(collection, request.query)
+            return 200, {plural: select_fields(items, request.query), "links": {}}, {}
+
+        @route("GET", f"{prefix}/{item_path}/(?P<item_id>[^/]+)")
+        def get_item(request: Request, item_id: str) -> Response:
+            return 200, {singular: self.state[collection][item_id]}, {}
+
+        @route("POST", f"{prefix}/{item_path}")
+        def create_item(request: Request) -> Response:
+            item = request.body[singular]
+            item.setdefault("id", self.new_id())
+            self.state[collection][item["id"]] = item
+            return 201, {singular: item}, {}
+
+        @route("PATCH", f"{prefix}/{item_path}/(?P<item_id>[^/]+)")
+        @route("PUT", f"{prefix}/{item_path}/(?P<item_id>[^/]+)")
+        def update_item(request: Request, item_id: str) -> Response:
+            item = self.state[collection][item_id]
+            item.update(request.body[singular])
+            return 200, {singular: item}, {}
+
+        @route("DELETE", f"{prefix}/{item_path}/(?P<item_id>[^/]+)")
+        def delete_item(request: Request, item_id: str) -> Response:
+            del self.state[collection][item_id]
+            return 204, None, {}
+
+    # compute
+
+    def add_compute_routes(self) -> None:
+        route = self.route
+        prefix = "/compute/v2.1"
+
+        @route("GET", f"{prefix}/flavors/detail")
+        @route("GET", f"{prefix}/flavors")
+        def list_flavors(request: Request) -> Response:
+            is_public = request.query.get("is_public", "true").lower()
+            flavors = []
+            for flavor in self.state["flavors"].values():
+                if (
+                    is_public == "none"
+                    or str(flavor["os-flavor-access:is_public"]).lower()
+                    == str(is_public in ["true", "1", "yes"]).lower()
+                ):
+                    flavors.append(dict(flavor, links=[]))
+            return 200, {"flavors": flavors}, {}
+
+        @route("GET", f"{prefix}/flavors/(?P<flavor_id>[^/]+)")
+        def get_flavor(request: Request, flavor_id: str) -> Response:
+            return 200, {"flavor": self.state["flavors"][flavor_id]}, {}
+
+        @route("GET", f"{prefix}/flavors/(?P<flavor_id>[^/]+)/os-flavor-access")
+        def list_flavor_access(request: Request, flavor_id: str) -> Response:
+            self.state["flavors"][flavor_id]
+            flavor_access = [
+                x for x in self.state["flavor_access"] if x["flavor_id"] == flavor_id
+            ]
+            return 200, {"flavor_access": flavor_access}, {}
+
+        @route("POST", f"{prefix}/flavors/(?P<flavor_id>[^/]+)/action")
+        def flavor_action(request: Request, flavor_id: str) -> Response:
+            flavor = self.state["flavors"][flavor_id]
+            if "addTenantAccess" not in request.body:
+                raise HttpError(400, "unsupported flavor action")
+            if flavor["os-flavor-access:is_public"]:
+                raise HttpError(409, "can not add access to a public flavor")
+
+            access = {
+                "flavor_id": flavor_id,
+                "tenant_id": request.body["addTenantAccess"]["tenant"],
+            }
+            if access in self.state["flavor_access"]:
+                raise HttpError(409, "flavor access already exists")
+            self.state["flavor_access"].append(access)
+
+            flavor_access = [
+                x for x in self.state["flavor_access"] if x["flavor_id"] == flavor_id
+            ]
+            return 200, {"flavor_access": flavor_access}, {}
+
+        self.add_quota_routes(prefix, "compute", "os-quota-sets", "quota_set")
+
+    def add_quota_routes(
+        self, prefix: str, kind: str, path: str, singular: str
+    ) -> None:
+        route = self.route
+
+        @route("GET", f"{prefix}/{path}/(?P<project_id>[^/]+)")
+        def get_quota(request: Request, project_id: str) -> Response:
+            quota = dict(self.get_quota(kind, project_id), id=project_id)
+            return 200, {singular: quota}, {}
+
+        @route("PUT", f"{prefix}/{path}/(?P<project_id>[^/]+)")
+        def update_quota(request: Request, project_id: str) -> Response:
+            quota = copy.deepcopy(self.get_quota(kind, project_id))
+            self.state["quotas"][kind][project_id] = quota
+            for key, value in request.body[singular].items():
+                if key in DEFAULT_QUOTAS[kind]:
+                    quota[key] = int(value)
+            return 200, {singular: dict(quota)}, {}
+
+    # network
+
+    def add_network_routes(self) -> None:
+        route = self.route
+        prefix = "/network/v2.0"
+
+        @route("GET", f"{prefix}/extensions")
+        def list_extensions(request: Request) -> Response:
+            extensions = [
+                {"alias": x, "name": x, "description": x, "links": [], "updated": ""}
+                for x in NETWORK_EXTENSIONS
+            ]
+            return 200, {"extensions": extensions}, {}
+
+        @route("POST", f"{prefix}/networks")
+        def create_network(request: Request) -> Response:
+            body = request.body["network"]
+            network = self.add_network(
+                body.pop("name", ""),
+                body.pop("project_id", None) or body.pop("tenant_id", ""),
+                **body,
+            )
+            return 201, {"network": network}, {}
+
+        @route("POST", f"{prefix}/subnets")
+        def create_subnet(request: Request) -> Response:
+            body = request.body["subnet"]
+            network = self.state["networks"][body["network_id"]]
+            project_id = body.pop("project_id", None) or body.pop("tenant_id", "")
+            if body.pop("use_default_subnetpool", False) and "cidr" not in body:
+                body["cidr"] = self.allocate_cidr()
+
+            subnet = {
+                "id": self.new_id(),
+                "name": "",
+                "project_id": project_id,
+                "tenant_id": project_id,
+                "ip_version": 4,
+                "enable_dhcp": True,
+                "gateway_ip": str(next(ipaddress.ip_network(body["cidr"]).hosts())),
+                "allocation_pools": [],
+                "dns_nameservers": [],
+                "host_routes": [],
+                "tags": [],
+            }
+            subnet.update(body)
+            self.state["subnets"][subnet["id"]] = subnet
+            network["subnets"].append(subnet["id"])
+            return 201, {"subnet": subnet}, {}
+
+        @route("POST", f"{prefix}/routers")
+        def create_router(request: Request) -> Response:
+            body = request.body["router"]
+            project_id = body.pop("project_id", None) or body.pop("tenant_id", "")
+            gateway = body.get("external_gateway_info")
+            if gateway:
+                self.state["networks"][gateway["network_id"]]
+
+            router = {
+                "id": self.new_id(),
+                "name": "",
+                "project_id": project_id,
+                "tenant_id": project_id,
+                "status": "ACTIVE",
+                "admin_state_up": True,
+                "external_gateway_info": None,
+                "availability_zone_hints": [],
+                "availability_zones": ["nova"],
+                "interfaces": [],
+                "routes": [],
+                "tags": [],
+            }
+            router.update(body)
+            self.state["routers"][router["id"]] = router
+            return 201, {"router": router}, {}
+
+        @route("PUT", f"{prefix}/routers/(?P<router_id>[^/]+)/add_router_interface")
+        def add_router_interface(request: Request, router_id: str) -> Response:
+            router = self.state["routers"][router_id]
+            subnet = self.state["subnets"][request.body["subnet_id"]]
+            if subnet["id"] in router["interfaces"]:
+                raise HttpError(400, "router already has a port on the subnet")
+            router["interfaces"].append(subnet["id"])
+            return (
+                200,
+                {
+                    "id": router_id,
+                    "subnet_id": subnet["id"],
+                    "subnet_ids": [subnet["id"]],
+                    "network_id": subnet["network_id"],
+                    "port_id": self.new_id(),
+                    "tenant_id": router["project_id"],
+                    "project_id": router["project_id"],
+                },
+                {},
+            )
+
+        @route("POST", f"{prefix}/rbac-policies")
+        def create_rbac_policy(request: Request) -> Response:
+            body = request.body["rbac_policy"]
+            self.state["networks"][body["object_id"]]
+            for policy in self.state["rbac_policies"].values():
+                if all(
+                    policy[x] == body[x]
+                    for x in ["target_tenant", "action", "object_type", "object_id"]
+                ):
+                    raise HttpError(409, "rbac policy already exists")
+
+            project_id = self.state["networks"][body["object_id"]]["project_id"]
+            policy = {
+                "id": self.new_id(),
+                "project_id": project_id,
+                "tenant_id": project_id,
+            }
+            policy.update(body)
+            self.state["rbac_policies"][policy["id"]] = policy
+            return 201, {"rbac_policy": policy}, {}
+
+        @route("POST", f"{prefix}/qos/policies")
+        def create_qos_policy(request: Request) -> Response:
+            body = request.body["policy"]
+            project_id = body.pop("project_id", None) or body.pop("tenant_id", "")
+            policy = {
+                "id": self.new_id(),
+                "name": "",
+                "description": "",
+                "project_id": project_id,
+                "tenant_id": project_id,
+                "shared": False,
+                "is_default": False,
+                "rules": [],
+                "tags": [],
+            }
+            if "default" in body:
+                body["is_default"] = body.pop("default")
+            policy.update(body)
+            self.state["qos_policies"][policy["id"]] = policy
+            return 201, {"policy": policy}, {}
+
+        @route("DELETE", f"{prefix}/qos/policies/(?P<policy_id>[^/]+)")
+        def delete_qos_policy(request: Request, policy_id: str) -> Response:
+            del self.state["qos_policies"][policy_id]
+            rules = self.state["qos_bandwidth_limit_rules"]
+            for rule_id in [x for x, y in rules.items() if y["policy_id"] == policy_id]:
+                del rules[rule_id]
+            return 204, None, {}
+
+        rules_path = f"{prefix}/qos/policies/(?P<policy_id>[^/]+)/bandwidth_limit_rules"
+
+        @route("GET", rules_path)
+        def list_bandwidth_limit_rules(request: Request, policy_id: str) -> Response:
+            self.state["qos_policies"][policy_id]
+            rules = [
+                x
+                for x in self.state["qos_bandwidth_limit_rules"].values()
+                if x["policy_id"] == policy_id and matches(x, request.query)
+            ]
+            return 200, {"bandwidth_limit_rules": rules}, {}
+
+        @route("POST", rules_path)
+        def create_bandwidth_limit_rule(request: Request, policy_id: str) -> Response:
+            policy = self.state["qos_policies"][policy_id]
+            body = request.body["bandwidth_limit_rule"]
+            direction = body.get("direction", "egress")
+            for rule in self.state["qos_bandwidth_limit_rules"].values():
+                if rule["policy_id"] == policy_id and rule["direction"] == direction:
+                    raise HttpError(409, "bandwidth limit rule already exists")
+
+            rule = {
+                "id": self.new_id(),
+                "policy_id": policy_id,
+                "max_kbps": 0,
+                "max_burst_kbps": 0,
+                "direction": direction,
+            }
+            rule.update(body)
+            self.state["qos_bandwidth_limit_rules"][rule["id"]] = rule
+            policy["rules"].append(dict(rule, type="bandwidth_limit"))
+            return 201, {"bandwidth_limit_rule": rule}, {}
+
+        @route("PUT", f"{rules_path}/(?P<rule_id>[^/]+)")
+        def update_bandwidth_limit_rule(
+            request: Request, policy_id: str, rule_id: str
+        ) -> Response:
+            rule = self.state["qos_bandwidth_limit_rules"][rule_id]
+            rule.update(request.body["bandwidth_limit_rule"])
+            return 200, {"bandwidth_limit_rule": rule}, {}
+
+        @route("DELETE", f"{rules_path}/(?P<rule_id>[^/]+)")
+        def delete_bandwidth_limit_rule(
+            request: Request, policy_id: str, rule_id: str
+        ) -> Response:
+            del self.state["qos_bandwidth_limit_rules"][rule_id]
+            policy = self.state["qos_policies"][policy_id]
+            policy["rules"] = [x for x in policy["rules"] if x["id"] != rule_id]
+            return 204, None, {}
+
+        # the first matching route wins, the generic routes come last
+        self.add_collection_routes(prefix, "networks", "network", "networks")
+        self.add_collection_routes(prefix, "subnets", "subnet", "subnets")
+        self.add_collection_routes(prefix, "routers", "router", "routers")
+        self.add_collection_routes(
+            prefix, "rbac_policies", "rbac_policy", "rbac_policies", "rbac-policies"
+        )
+        self.add_collection_routes(
+            prefix, "qos_policies", "policy", "policies", "qos/policies"
+        )
+        self.add_quota_routes(prefix, "network", "quotas", "quota")
+
+    def allocate_cidr(self) -> str:
+        used = {
+            ipaddress.ip_network(x["cidr"])
+            for x in self.state["subnets"].values()
+            if x.get("cidr")
+        }
+        for cidr in ipaddress.ip_network(DEFAULT_SUBNET_POOL).subnets(new_prefix=24):
+            if not any(cidr.overlaps(x) for x in used):
+                return str(cidr)
+        raise HttpError(409, "default subnet pool is exhausted")
+
+    # block storage
+
+    def add_volume_routes(self) -> None:
+        route = self.route
+        prefix = "/volume/v3"
+
+        @route("GET", f"{prefix}/types")
+        def list_volume_types(request: Request) -> Response:
+            is_public = request.query.pop("is_public", "true").lower()
+            volume_types = [
+                x
+                for x in self.state["volume_types"].values()
+                if matches(x, request.query)
+                and (is_public == "none" or str(x["is_public"]).lower() == is_public)
+            ]
+            return 200, {"volume_types": volume_types}, {}
+
+        @route("GET", f"{prefix}/types/(?P<type_id>[^/]+)/os-volume-type-access")
+        def list_volume_type_access(request: Request, type_id: str) -> Response:
+            self.state["volume_types"][type_id]
+            volume_type_access = [
+                x
+                for x in self.state["volume_type_access"]
+                if x["volume_type_id"] == type_id
+            ]
+            return 200, {"volume_type_access": volume_type_access}, {}
+
+        @route("POST", f"{prefix}/types/(?P<type_id>[^/]+)/action")
+        def volume_type_action(request: Request, type_id: str) -> Response:
+            volume_type = self.state["volume_types"][type_id]
+            if "addProjectAccess" not in request.body:
+                raise HttpError(400, "unsupported volume type action")
+            if volume_type["is_public"]:
+                raise HttpError(409, "can not add access to a public volume type")
+
+            access = {
+                "volume_type_id": type_id,
+                "project_id": request.body["addProjectAccess"]["project"],
+            }
+            if access in self.state["volume_type_access"]:
+                raise HttpError(409, "volume type access already exists")
+            self.state["volume_type_access"].append(access)
+            return 202, None, {}
+
+        @route("GET", f"{prefix}/default-types/(?P<project_id>[^/]+)")
+        def get_default_type(request: Request, project_id: str) -> Response:
+            if project_id not in self.state["default_volume_types"]:
+                raise HttpError(404, "default volume type not found")
+            default_type = {
+                "project_id": project_id,
+                "volume_type_id": self.state["default_volume_types"][project_id],
+            }
+            return 200, {"default_type": default_type}, {}
+
+        @route("PUT", f"{prefix}/default-types/(?P<project_id>[^/]+)")
+        def set_default_type(request: Request, project_id: str) -> Response:
+            name_or_id = request.body["default_type"]["volume_type"]
+            volume_type = self.find("volume_types", name_or_id)
+            self.state["default_volume_types"][project_id] = volume_type["id"]
+            default_type = {
+                "project_id": project_id,
+                "volume_type_id": volume_type["id"],
+            }
+            return 200, {"default_type": default_type}, {}
+
+        @route("DELETE", f"{prefix}/default-types/(?P<project_id>[^/]+)")
+        def unset_default_type(request: Request, project_id: str) -> Response:
+            del self.state["default_volume_types"][project_id]
+            return 204, None, {}
+
+        @route("GET", f"{prefix}/volumes/detail")
+        @route("GET", f"{prefix}/volumes")
+        def list_volumes(request: Request) -> Response:
+            query = dict(request.query)
+            query.pop("all_tenants", None)
+            if "project_id" in query:
+                query["os-vol-tenant-attr:tenant_id"] = query.pop("project_id")
+            volumes = [x for x in self.state["volumes"].values() if matches(x, query)]
+            return 200, {"volumes": volumes}, {}
+
+        @route("POST", f"{prefix}/volumes")
+        def create_volume(request: Request) -> Response:
+            body = request.body["volume"]
+            now = get_timestamp()
+            volume = {
+                "id": self.new_id(),
+                "name": "",
+                "size": 1,
+                "status": "available",
+                "volume_type": None,
+                "bootable": "false",
+                "os-vol-tenant-attr:tenant_id": body.pop("project_id", ""),
+                "created_at": now,
+                "updated_at": now,
+                "metadata": {},
+                "attachments": [],
+            }
+            if "imageRef" in body:
+                volume["volume_image_metadata"] = {"image_id": body["imageRef"]}
+                volume["bootable"] = "true"
+            volume.update(body)
+            self.state["volumes"][volume["id"]] = volume
+            return 202, {"volume": volume}, {}
+
+        @route("GET", f"{prefix}/volumes/(?P<volume_id>[^/]+)")
+        def get_volume(request: Request, volume_id: str) -> Response:
+            return 200, {"volume": self.state["volumes"][volume_id]}, {}
+
+        @route("DELETE", f"{prefix}/volumes/(?P<volume_id>[^/]+)")
+        def delete_volume(request: Request, volume_id: str) -> Response:
+            del self.state["volumes"][volume_id]
+            return 202, None, {}
+
+        self.add_collection_routes(
+            prefix, "volume_types", "volume_type", "volume_types", "types"
+        )
+        self.add_quota_routes(prefix, "volume", "os-quota-sets", "quota_set")
+
+    # image
+
+    def add_image_routes(self) -> None:
+        route = self.route
+        prefix = "/image/v2"
+
+        @route("GET", f"{prefix}/images")
+        def list_images(request: Request) -> Response:
+            query = dict(request.query)
+            member_status = query.pop("member_status", None)
+            images = []
+            for image in self.state["images"].values():
+                if not matches(image, query):
+                    continue
+                if member_status and member_status != "all":
+                    continue
+                images.append(dict(image, schema="/v2/schemas/image"))
+            return 200, {"images": images, "schema": "/v2/schemas/images"}, {}
+
+        @route("GET", f"{prefix}/images/(?P<image_id>[^/]+)")
+        def get_image(request: Request, image_id: str) -> Response:
+            return 200, self.state["images"][image_id], {}
+
+        @route("GET", f"{prefix}/images/(?P<image_id>[^/]+)/members")
+        def list_image_members(request: Request, image_id: str) -> Response:
+            self.state["images"][image_id]
+            members = [
+                x for x in self.state["image_members"] if x["image_id"] == image_id
+            ]
+            return 200, {"members": members, "schema": "/v2/schemas/members"}, {}
+
+        @route(
+            "GET", f"{prefix}/images/(?P<image_id>[^/]+)/members/(?P<member_id>[^/]+)"
+        )
+        def get_image_member(
+            request: Request, image_id: str, member_id: str
+        ) -> Response:
+            return 200, self.get_image_member(image_id, member_id), {}
+
+        @route("POST", f"{prefix}/images/(?P<image_id>[^/]+)/members")
+        def add_image_member(request: Request, image_id: str) -> Response:
+            image = self.state["images"][image_id]
+            if image["visibility"] != "shared":
+                raise HttpError(403, "only shared images can have members")
+
+            member_id = request.body["member"]
+            for member in self.state["image_members"]:
+                if member["image_id"] == image_id and member["member_id"] == member_id:
+                    raise HttpError(409, "member already exists")
+
+            now = get_timestamp()
+            member = {
+                "image_id": image_id,
+                "member_id": member_id,
+                "status": "pending",
+                "created_at": now,
+                "updated_at": now,
+                "schema": "/v2/schemas/member",
+            }
+            self.state["image_members"].append(member)
+            return 200, member, {}
+
+        @route(
+            "PUT", f"{prefix}/images/(?P<image_id>[^/]+)/members/(?P<member_id>[^/]+)"
+        )
+        def update_image_member(
+            request: Request, image_id: str, member_id: str
+        ) -> Response:
+            member = self.get_image_member(image_id, member_id)
+            member["status"] = request.body["status"]
+            member["updated_at"] = get_timestamp()
+            return 200, member, {}
+
+    def get_image_member(self, image_id: str, member_id: str) -> dict:
+        self.state["images"][image_id]
+        for member in self.state["image_members"]:
+            if member["image_id"] == image_id and member["member_id"] == member_id:
+                return member
+        raise HttpError(404, f"member {member_id} not found")
+
+
+def get_timestamp() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def error_body(status: int, message: str) -> dict:
+    return {
+        "error": {"code": status, "message": message},
+        "NeutronError": {"message": message, "type": "Error"},
+    }
+
+
+def select_fields(items: List[dict], query: Dict[str, str]) -> List[dict]:
+    if "fields" not in query:
+        return items
+    fields = query["fields"].split(",")
+    return [{k: v for k, v in x.items() if k in fields} for x in items]
+
+
+class FakeCloudHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    # headers and body are written separately, do not wait for the delayed ack
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.cloud.access_log:  # type: ignore[attr-defined]
+            logger.debug(f"fakecloud - {format % args}")
+
+    def handle_request(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else None
+
+        status, result, headers = self.server.cloud.handle(  # type: ignore[attr-defined]
+            self.command, self.path, body
+        )
+
+        data = json.dumps(result).encode() if result is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = handle_request
+
+
+def run(
+    host: Annotated[
+        str, typer.Option("--host", help="Address to listen on")
+    ] = "127.0.0.1",
+    port: Annotated[int, typer.Option("--port", help="Port to listen on")] = 8080,
+    state: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--state",
+            help="Load the state from this file and save it there when stopped",
+        ),
+    ] = None,
+    clouds: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--clouds", help="Write a clouds.yml with an entry for the fake cloud"
+        ),
+    ] = None,
+    cloud_name: Annotated[
+        str, typer.Option("--cloud", help="Cloud name of the entry in the clouds.yml")
+    ] = "fakecloud",
+    latency: Annotated[
+        List[str],
+        typer.Option(
+            "--latency",
+            help="Latency of a service as SERVICE=MEAN[:STDDEV] in milliseconds, * for all services, may be specified multiple times",
+        ),
+    ] = [],
+    throttle_rate: Annotated[
+        float,
+        typer.Option(
+            "--throttle-rate",
+            help="Fraction of the requests answered with 429 or 503 and a Retry-After header",
+        ),
+    ] = 0.0,
+    retry_after: Annotated[
+        int,
+        typer.Option("--retry-after", help="Seconds of the Retry-After header"),
+    ] = 1,
+    conflict_rate: Annotated[
+        float,
+        typer.Option(
+            "--conflict-rate",
+            help="Fraction of the requests changing a resource answered with 409",
+        ),
+    ] = 0.0,
+    seed: Annotated[
+        Optional[int],
+        typer.Option("--seed", help="Seed of the resource IDs and injected faults"),
+    ] = None,
+) -> None:
+    import yaml
+
+    initial_state = None
+    if state and state.exists():
+        initial_state = FakeCloud.load_state(state)
+
+    faults = Faults(parse_latency(latency), throttle_rate, retry_after, conflict_rate)
+    cloud = FakeCloud(initial_state, host, port, seed, faults)
+    server = cloud.bind()
+    cloud.access_log = True
+
+    if clouds:
+        with open(clouds, "w") as fp:
+            yaml.dump(cloud.get_clouds_yaml(cloud_name), fp)
+
+    # save the state when stopped by a service manager as well
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+
+    logger.info(f"fake cloud listening on {cloud.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if state:
+            cloud.save(state)
+
+
+def main() -> None:
+    typer.run(run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict
+
+from loguru import logger
+
+# bump to invalidate all stored fingerprints when the reconcile logic changes
+VERSION = 2
+
+# every project gets a full verification at least once a week
+DEFAULT_VERIFICATION_INTERVAL = 7 * 24 * 3600
+
+
+def get_fingerprint(desired_state: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            {"version": VERSION, "desired_state": desired_state},
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+class FingerprintStore:
+
+    def __init__(
+        self,
+        path: Path,
+        verification_interval: int = DEFAULT_VERIFICATION_INTERVAL,
+        force: bool = False,
+    ):
+        self.path = path
+        self.verification_interval = verification_interval
+
+        # every project is verified, the fingerprints are still updated
+        self.force = force
+
+        # fingerprint and time of the last full verification by project ID
+        self.projects: Dict[str, dict] = {}
+
+        try:
+            data = json.loads(path.read_text())
+            if data.get("version") == VERSION:
+                self.projects = data["projects"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"fingerprint file {path} is not usable: {e}")
+
+    def is_unchanged(self, project_id: str, fingerprint: str) -> bool:
+        entry = self.projects.get(project_id)
+        return (
+            not self.force
+            and entry is not None
+            and entry["fingerprint"] == fingerprint
+            and time.time() - entry["verified_at"] < self.verification_interval
+        )
+
+    def update(self, project_id: str, fingerprint: str) -> None:
+        self.projects[project_id] = {
+            "fingerprint": fingerprint,
+            "verified_at": time.time(),
+        }
+
+    def save(self) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(
+            json.dumps({"version": VERSION, "projects": self.projects}, indent=2)
+        )
+        os.replace(tmp, self.path)
@@ -0,0 +1,232 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import enum
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+import typer
+from typing_extensions import Annotated
+
+from openstack_project_manager.fakecloud import FakeCloud
+
+# number of domains and projects by size profile
+PROFILES = {
+    "tiny": {"domains": 2, "projects": 20},
+    "small": {"domains": 10, "projects": 1000},
+    "medium": {"domains": 50, "projects": 10000},
+    "large": {"domains": 200, "projects": 50000},
+    "xlarge": {"domains": 500, "projects": 100000},
+}
+
+
+class Profile(str, enum.Enum):
+    tiny = "tiny"
+    small = "small"
+    medium = "medium"
+    large = "large"
+    xlarge = "xlarge"
+
+
+# NOTE: The weights follow the inventory of a production cloud: most projects
+#       are small basic projects, a few are not managed at all or have no
+#       quotaclass because they were not created by the project manager.
+QUOTACLASSES: List[Tuple[Optional[str], int]] = [
+    ("basic", 55),
+    ("testbed", 15),
+    ("okeanos", 10),
+    ("default", 10),
+    ("unlimited", 5),
+    (None, 5),
+]
+
+QUOTAMULTIPLIERS: List[Tuple[Optional[str], int]] = [
+    (None, 70),
+    ("2", 15),
+    ("4", 10),
+    ("8", 5),
+]
+
+# probability of the per service multipliers and of the boolean properties
+SERVICE_QUOTAMULTIPLIER = 0.05
+PROPERTIES = {
+    "has_public_network": 0.6,
+    "has_service_network": 0.1,
+    "has_shared_images": 0.5,
+    "managed_network_resources": 0.4,
+}
+UNMANAGED = 0.01
+HOMEPROJECT = 0.3
+
+# probability of a domain whose name starts with ok, these use the okeanos class
+OKEANOS_DOMAIN = 0.1
+
+# flavors and volume types of the classes, access is granted by the project manager
+FLAVORS = [
+    "SCS-1V-2",
+    "SCS-2V-4",
+    "SCS-2V-8",
+    "SCS-4V-8",
+    "SCS-4V-16",
+    "SCS-8V-32",
+    "SCS-16V-64",
+]
+VOLUME_TYPES = ["hdd", "ssd"]
+IMAGES = ["Debian 12", "Rocky 9", "Ubuntu 22.04", "Ubuntu 24.04", "Windows 2022"]
+ENDPOINTS = [
+    "barbican",
+    "cinderv3",
+    "designate",
+    "glance",
+    "heat",
+    "keystone",
+    "neutron",
+    "nova",
+    "octavia",
+    "placement",
+    "swift",
+]
+
+# timestamp of all generated images, a generated state does not depend on the time
+TIMESTAMP = "2024-01-01T00:00:00Z"
+
+
+def choose(rng: random.Random, choices: Sequence[Tuple[Any, int]]) -> Any:
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def get_project_counts(rng: random.Random, domains: int, projects: int) -> List[int]:
+    # every domain has at least one project, the rest follows a long tail
+    # distribution with a few large domains and many small ones
+    weights = [rng.paretovariate(1.2) for _ in range(domains)]
+    counts = [1] * domains
+    for index in rng.choices(range(domains), weights, k=max(0, projects - domains)):
+        counts[index] += 1
+    return counts
+
+
+def get_properties(rng: random.Random) -> Dict[str, str]:
+    properties: Dict[str, str] = {}
+
+    quotaclass = choose(rng, QUOTACLASSES)
+    if quotaclass:
+        properties["quotaclass"] = quotaclass
+
+    quotamultiplier = choose(rng, QUOTAMULTIPLIERS)
+    if quotamultiplier:
+        properties["quotamultiplier"] = quotamultiplier
+    for service in ["compute", "network", "storage"]:
+        if rng.random() < SERVICE_QUOTAMULTIPLIER:
+            properties[f"quotamultiplier_{service}"] = rng.choice(["2", "4"])
+
+    for name, probability in PROPERTIES.items():
+        if rng.random() < probability:
+            properties[name] = "True"
+
+    if rng.random() < UNMANAGED:
+        properties["unmanaged"] = "True"
+
+    return properties
+
+
+def generate_domain(
+    cloud: FakeCloud,
+    rng: random.Random,
+    index: int,
+    name: str,
+    projects: int,
+    admin_domain_id: str,
+) -> None:
+    domain = cloud.add_domain(name)
+    cloud.add_user(f"{name}-admin", admin_domain_id)
+
+    # the service network of a domain exists before its projects are managed
+    service = cloud.add_project(
+        f"{name}-service",
+        domain["id"],
+        quotaclass="service",
+        is_service_project="True",
+        has_service_network="True",
+        service_network_cidr=f"172.{16 + index // 256}.{index % 256}.0/24",
+    )
+    cloud.add_network(f"{name}-service", service["id"])
+
+    images = cloud.add_project(f"{name}-images", domain["id"], quotaclass="images")
+    for image in rng.sample(IMAGES, rng.randint(1, len(IMAGES))):
+        cloud.add_image(
+            image,
+            images["id"],
+            size=rng.randint(1, 20) * 1073741824,
+            created_at=TIMESTAMP,
+            updated_at=TIMESTAMP,
+        )
+
+    for number in range(rng.randint(0, 3)):
+        cloud.add_flavor(f"{name}-gpu{number}", is_public=False)
+    for number in range(rng.randint(0, 2)):
+        cloud.add_volume_type(f"{name}-ssd{number}", is_public=False)
+
+    for number in range(projects):
+        properties = get_properties(rng)
+        if rng.random() < HOMEPROJECT:
+            username = f"u{number:06d}"
+            cloud.add_user(username, domain["id"])
+            project_name = f"{name}-{username}"
+        else:
+            project_name = f"{name}-p{number:06d}"
+        cloud.add_project(project_name, domain["id"], **properties)
+
+
+def generate(cloud: FakeCloud, profile: str = "small", seed: int = 0) -> FakeCloud:
+    rng = random.Random(seed)
+    size = PROFILES[profile]
+
+    admin = cloud.find("projects", "admin")
+    cloud.add_network("public", admin["id"], external=True)
+
+    for flavor in FLAVORS:
+        vcpus, ram = [int(x) for x in flavor[4:].split("V-")]
+        cloud.add_flavor(flavor, is_public=False, vcpus=vcpus, ram=ram * 1024)
+    cloud.add_volume_type("__DEFAULT__")
+    for volume_type in VOLUME_TYPES:
+        cloud.add_volume_type(volume_type, is_public=False)
+    for endpoint in ENDPOINTS:
+        for interface in ["public", "internal"]:
+            cloud.add_endpoint_group(f"{endpoint}-{interface}")
+
+    counts = get_project_counts(rng, size["domains"], size["projects"])
+    for index, projects in enumerate(counts):
+        prefix = "ok" if rng.random() < OKEANOS_DOMAIN else "domain"
+        generate_domain(
+            cloud, rng, index, f"{prefix}{index:03d}", projects, admin["domain_id"]
+        )
+
+    return cloud
+
+
+def run(
+    output: Annotated[
+        Path, typer.Option("--output", help="Write the generated state to this file")
+    ],
+    profile: Annotated[
+        Profile,
+        typer.Option("--profile", help="Size profile"),
+    ] = Profile.small,
+    seed: Annotated[int, typer.Option("--seed", help="Seed of the generator")] = 0,
+) -> None:
+    cloud = generate(FakeCloud(seed=seed), profile.value, seed)
+    cloud.save(output)
+
+    logger.info(
+        f"generated {len(cloud.state['domains'])} domains and {len(cloud.state['projects'])} projects in {output}"
+    )
+
+
+def main() -> None:
+    typer.run(run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from loguru import logger
+
+# bump to discard all stored resources when the stored format changes
+VERSION = 1
+
+# NOTE: Seconds a stored list of resources is used before it is fetched again.
+#       Resources the project manager changes itself are updated in place, the
+#       TTL only bounds how long changes made by others stay unnoticed.
+DEFAULT_TTLS = {
+    "domains": 3600,
+    "projects": 300,
+    "users": 300,
+    "flavors": 3600,
+    "flavor_access": 3600,
+    "volume_types": 3600,
+    "volume_type_access": 3600,
+    "rbac_policies": 900,
+    "qos_policies": 900,
+    "endpoint_groups": 3600,
+    "project_endpoint_groups": 3600,
+}
+
+
+def parse_ttls(values: List[str]) -> Dict[str, int]:
+    ttls = {}
+    for value in values:
+        kind, seconds = value.split("=", 1)
+        if kind not in DEFAULT_TTLS:
+            raise ValueError(
+                f"unknown resource type {kind}, use one of {', '.join(DEFAULT_TTLS)}"
+            )
+        ttls[kind] = int(seconds)
+    return ttls
+
+
+def to_item(resource: Any) -> dict:
+    return {
+        k: v for k, v in resource.to_dict().items() if k not in ["links", "location"]
+    }
+
+
+class Inventory:
+
+    def __init__(
+        self,
+        path: Path,
+        ttls: Optional[Dict[str, int]] = None,
+        readonly: bool = False,
+    ):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.hits = 0
+        self.misses = 0
+
+        # a snapshot of another run is read without ever modifying it
+        if readonly:
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            if self.db.execute("PRAGMA user_version").fetchone()[0] != VERSION:
+                self.db.close()
+                raise ValueError(f"inventory {path} has an unsupported version")
+            return
+
+        self.db = sqlite3.connect(path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != VERSION:
+            self.db.execute("DROP TABLE IF EXISTS resources")
+            self.db.execute(f"PRAGMA user_version = {VERSION}")
+
+        # every list of resources is stored and refreshed on its own, e.g. the
+        # access list of a flavor with the ID of the flavor as scope
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS resources ("
+            "kind TEXT NOT NULL, scope TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "items TEXT NOT NULL, PRIMARY KEY (kind, scope))"
+        )
+        self.db.commit()
+
+    def load(self, kind: str, scope: str) -> Optional[List[dict]]:
+        row = self.db.execute(
+            "SELECT fetched_at, items FROM resources WHERE kind = ? AND scope = ?",
+            (kind, scope),
+        ).fetchone()
+        if not row or time.time() - row[0] >= self.ttls[kind]:
+            return None
+        return json.loads(row[1])
+
+    def store(self, kind: str, scope: str, items: List[dict]) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?)",
+            (kind, scope, time.time(), json.dumps(items, default=str)),
+        )
+
+    def get(
+        self, kind: str, scope: str, fetch: Callable[[], Iterable[dict]]
+    ) -> List[dict]:
+        items = self.load(kind, scope)
+        if items is not None:
+            self.hits += 1
+            return items
+
+        self.misses += 1
+        items = [dict(x) for x in fetch()]
+        self.store(kind, scope, items)
+        return items
+
+    def resources(
+        self,
+        kind: str,
+        scope: str,
+        resource_type: Any,
+        fetch: Callable[[], Iterable[Any]],
+        connection: Any = None,
+    ) -> List[Any]:
+        # NOTE: The resources of the SDK are stored as dicts and rebuilt on every
+        #       call, the location is computed from the connection again.
+        items = self.get(kind, scope, lambda: [to_item(x) for x in fetch()])
+        return [resource_type.existing(connection=connection, **x) for x in items]
+
+    def items(self, kind: str) -> Iterator[dict]:
+        # all stored resources of a kind in all scopes, regardless of their age
+        for (items,) in self.db.execute(
+            "SELECT items FROM resources WHERE kind = ?", (kind,)
+        ):
+            yield from json.loads(items)
+
+    def update(
+        self, kind: str, scope: str, change: Callable[[List[dict]], List[dict]]
+    ) -> None:
+        # a list that is not stored or expired is fetched with the change anyway
+        row = self.db.execute(
+            "SELECT fetched_at, items FROM resources WHERE kind = ? AND scope = ?",
+            (kind, scope),
+        ).fetchone()
+        if not row:
+            return
+        self.db.execute(
+            "UPDATE resources SET items = ? WHERE kind = ? AND scope = ?",
+            (json.dumps(change(json.loads(row[1])), default=str), kind, scope),
+        )
+
+    def add(self, kind: str, scope: str, item: dict) -> None:
+        self.update(kind, scope, lambda items: items + [item])
+
+    def remove(self, kind: str, scope: str, key: str, value: Any) -> None:
+        self.update(kind, scope, lambda items: [x for x in items if x[key] != value])
+
+    def invalidate(self, kind: str, scope: Optional[str] = None) -> None:
+        if scope is None:
+            self.db.execute("DELETE FROM resources WHERE kind = ?", (kind,))
+        else:
+            self.db.execute(
+                "DELETE FROM resources WHERE kind = ? AND scope = ?", (kind, scope)
+            )
+
+    def commit(self) -> None:
+        # NOTE: Changes are written in one transaction, an interrupted run loses
+        #       them and fetches the resources again the next time.
+        self.db.commit()
+
+    def close(self) -> None:
+        logger.debug(f"inventory {self.path} - {self.hits} hits, {self.misses} misses")
+        self.commit()
+        self.db.close()
@@ -1,24 +1,54 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+from __future__ import annotations
+
+import collections
+import contextlib
+import copy
+import enum
+import functools
 import math
 import re
 import sys
 
-from deepmerge import always_merger
 from loguru import logger
-import neutronclient
-import openstack
-import os_client_config
-import yaml
 import typer
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 from typing_extensions import Annotated
 from pathlib import Path
 
+if TYPE_CHECKING:
+    import openstack
+    from requests.adapters import BaseAdapter
+
+    from openstack_project_manager.inventory import Inventory
+
+from openstack_project_manager import (
+    apistats,
+    checkpoint,
+    clients,
+    fingerprint,
+    metrics,
+    profiler,
+    shard,
+    tracing,
+)
+
 DEFAULT_ROLES = ["member", "load-balancer_member"]
 
 UNMANAGED_PROJECTS = ["admin", "service"]
 
+# projects given by ID are looked up one by one up to this number, above it
+# with one list call of the projects of all domains
+PROJECT_LOOKUP_LIMIT = 50
+
+
+# policies to rank images when the image cache does not fit into the quota
+class ImageCachePolicy(str, enum.Enum):
+    recent = "recent"
+    size = "size"
+
+
 # all known quotas
 QUOTAS = {
     "compute": [
@@ -54,6 +84,28 @@ QUOTAS = {
     ],
 }
 
+# quotas that are not scaled with the multipliers of a project
+UNSCALED_QUOTAS = {
+    "compute": [
+        "injected_file_content_bytes",
+        "metadata_items",
+        "injected_file_path_bytes",
+    ],
+    "network": [],
+    "volume": ["per_volume_gigabytes"],
+}
+
+# properties of a project the desired quotas depend on besides quota_* overwrites
+QUOTA_PROPERTIES = {
+    "quotamultiplier",
+    "quotamultiplier_compute",
+    "quotamultiplier_network",
+    "quotamultiplier_storage",
+    "has_public_network",
+    "has_service_network",
+    "is_service_project",
+}
+
 logger_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <level>{message}</level>"
 logger.remove()
 logger.add(sys.stdout, format=logger_format)
@@ -68,22 +120,98 @@ class Configuration:
         endpoints: str,
         assign_admin_user: bool,
         admin_domain: str,
+        image_cache_policy: str = "recent",
+        pool_size: int = clients.DEFAULT_POOL_SIZE,
+        retries: int = 0,
+        token_cache: bool = False,
+        api_stats: bool = False,
+        profile: bool = False,
+        profile_output: Optional[Path] = None,
+        trace_file: Optional[Path] = None,
+        record: Optional[Path] = None,
+        replay: Optional[Path] = None,
+        replay_latency: bool = True,
+        fingerprint_file: Optional[Path] = None,
+        verification_interval: int = fingerprint.DEFAULT_VERIFICATION_INTERVAL,
+        force_verification: bool = False,
+        inventory_file: Optional[Path] = None,
+        inventory_ttls: Optional[Dict[str, int]] = None,
+        checkpoint_file: Optional[Path] = None,
+        config_hash: str = "",
+        resume: bool = False,
+        shard: Optional[Tuple[int, int]] = None,
+        run_metrics: Optional[metrics.RunMetrics] = None,
     ):
+        import yaml
+
+        self.metrics = run_metrics or metrics.RunMetrics()
+
+        self.profiler: Optional[profiler.Profiler] = None
+        if profile:
+            self.profiler = profiler.Profiler(profile_output)
+
         self.dry_run = dry_run
+        self.image_cache_policy = image_cache_policy
+
+        # index and number of the shards, only the projects of the shard are managed
+        self.shard = shard
+
+        # fingerprints of the desired state of the projects verified before
+        self.fingerprints: Optional[fingerprint.FingerprintStore] = None
+        if fingerprint_file:
+            self.fingerprints = fingerprint.FingerprintStore(
+                fingerprint_file, verification_interval, force_verification
+            )
+
+        # domains and projects completed by the run and by the interrupted run
+        self.checkpoint: Optional[checkpoint.Checkpoint] = None
+        if checkpoint_file:
+            self.checkpoint = checkpoint.Checkpoint(
+                checkpoint_file, config_hash, resume
+            )
+
+        # local inventory of the resources looked up by the run
+        self.inventory: Optional[Inventory] = None
+        if inventory_file:
+            from openstack_project_manager import inventory
+
+            self.inventory = inventory.Inventory(inventory_file, inventory_ttls)
 
         # load configurations
         with open(endpoints, "r") as fp:
             self.ENDPOINTS = yaml.load(fp, Loader=yaml.SafeLoader)
 
-        # get connections
-        self.os_cloud = openstack.connect(cloud=cloud_name)
-        self.os_keystone = os_client_config.make_client("identity", cloud=cloud_name)
-        self.os_neutron = os_client_config.make_client("network", cloud=cloud_name)
+        # record the API calls of the run or replay a recorded run
+        self.cassette: Optional[BaseAdapter] = None
+        if record:
+            from openstack_project_manager import cassette
+
+            self.cassette = cassette.Recorder(record, pool_size, retries)
+        elif replay:
+            from openstack_project_manager import cassette
+
+            self.cassette = cassette.Player(replay, replay_latency)
+
+        # get connections, all clients share the same session and token
+        self.os_cloud = clients.connect(
+            cloud_name, pool_size, token_cache, self.cassette, retries
+        )
+        self.os_keystone = clients.make_client(self.os_cloud, "identity")
+        self.os_neutron = clients.make_client(self.os_cloud, "network")
+
+        # account for all API calls made through the shared session
+        self.api_stats: Optional[apistats.ApiStats] = None
+        if api_stats:
+            self.api_stats = apistats.instrument(self.os_cloud.session)
+
+        # trace all API calls made through the shared session
+        self.tracer: Optional[tracing.Tracer] = None
+        if trace_file:
+            self.tracer = tracing.Tracer(trace_file)
+            self.tracer.instrument(self.os_cloud.session)
 
         # cache roles
-        self.CACHE_ROLES = {}
-        for role in self.os_cloud.identity.roles():
-            self.CACHE_ROLES[role.name] = role
+        self.CACHE_ROLES = clients.get_roles(self.os_cloud)
 
         # cache admin domain
         self.assign_admin_user = assign_admin_user
@@ -97,7 +225,77 @@ class Configuration:
         self.CACHE_ADMIN_USERS: dict = {}
 
 
-def get_quotaclass(classes: list[Path], quotaclass: str) -> Optional[dict]:
+@contextlib.contextmanager
+def run_context(configuration: Configuration, cloud_name: str) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        if configuration.tracer:
+            stack.enter_context(
+                configuration.tracer.span(
+                    "run",
+                    {"opm.cloud": cloud_name, "opm.dry_run": configuration.dry_run},
+                )
+            )
+        yield
+
+
+@contextlib.contextmanager
+def domain_context(
+    configuration: Configuration, domain: openstack.identity.v3.domain.Domain
+) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(configuration.metrics.domain(domain.name))
+        if configuration.tracer:
+            stack.enter_context(
+                configuration.tracer.span(
+                    "domain",
+                    {"opm.domain.name": domain.name, "opm.domain.id": domain.id},
+                )
+            )
+        yield
+
+
+@contextlib.contextmanager
+def project_context(
+    configuration: Configuration, project: openstack.identity.v3.project.Project
+) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(configuration.metrics.project())
+        if configuration.profiler:
+            stack.enter_context(configuration.profiler.project(project.name))
+        if configuration.tracer:
+            stack.enter_context(
+                configuration.tracer.span(
+                    "project",
+                    {
+                        "opm.project.name": project.name,
+                        "opm.project.id": project.id,
+                        "opm.domain.id": project.domain_id,
+                    },
+                )
+            )
+        yield
+
+
+@contextlib.contextmanager
+def phase_context(configuration: Configuration, name: str) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(apistats.phase(name))
+        if configuration.profiler:
+            stack.enter_context(configuration.profiler.phase(name))
+        if configuration.tracer:
+            stack.enter_context(configuration.tracer.span(name, {"opm.phase": name}))
+        yield
+
+
+@functools.lru_cache(maxsize=16)
+def load_quotaclasses(quotaclasses_raw: str) -> dict:
+    import yaml
+
+    # NOTE: YAML load concatenated classes, so that later definitions overwrite earlier ones, while allowing usage of anchors referencing keys in other files
+    return yaml.load(quotaclasses_raw, Loader=yaml.SafeLoader) or {}
+
+
+def read_quotaclasses(classes: list[Path]) -> dict:
     quotaclasses_raw = "---"
     for classes_path in classes:
         if classes_path.exists() and classes_path.is_file():
@@ -106,17 +304,26 @@ def get_quotaclass(classes: list[Path], quotaclass: str) -> Optional[dict]:
                 "---\n"
             )
 
-    # NOTE: YAML load concatenated classes, so that later definitions overwrite earlier ones, while allowing usage of anchors referencing keys in other files
-    quotaclasses = yaml.load(quotaclasses_raw, Loader=yaml.SafeLoader)
+    return load_quotaclasses(quotaclasses_raw)
+
+
+def get_quotaclass(classes: list[Path], quotaclass: str) -> Optional[dict]:
+    from deepmerge import always_merger
+
+    # NOTE: The parsed classes are cached and shared by all callers, the result is
+    #       modified by the caller and must never reference the cached classes.
+    quotaclasses = read_quotaclasses(classes)
 
     if quotaclass not in quotaclasses:
         return None
 
-    result = quotaclasses[quotaclass]
+    result = copy.deepcopy(quotaclasses[quotaclass])
 
     if "parent" in result:
         if result["parent"] in quotaclasses:
-            result = always_merger.merge(quotaclasses[result["parent"]], result)
+            result = always_merger.merge(
+                copy.deepcopy(quotaclasses[result["parent"]]), result
+            )
         else:
             logger.error(
                 f"Could not find parent {result['parent']} for quota class {quotaclass}"
@@ -136,11 +343,273 @@ def check_bool(project: openstack.identity.v3.project.Project, param: str) -> bo
     ]
 
 
-def check_quota(
+# NOTE: The following helpers look up resources through the local inventory if
+#       one is used and update it after changes, without an inventory they call
+#       the APIs directly.
+
+
+def list_domains(configuration: Configuration) -> list:
+    from openstack.identity.v3.domain import Domain
+
+    if not configuration.inventory:
+        return configuration.os_cloud.list_domains()
+    return configuration.inventory.resources(
+        "domains",
+        "all",
+        Domain,
+        configuration.os_cloud.list_domains,
+        configuration.os_cloud,
+    )
+
+
+def list_projects(
+    configuration: Configuration,
+    domain: Optional[openstack.identity.v3.domain.Domain] = None,
+) -> list:
+    from openstack.identity.v3.project import Project
+
+    # the projects of all domains without a domain
+    filters = {"domain_id": domain.id} if domain else {}
+
+    if not configuration.inventory:
+        return configuration.os_cloud.list_projects(**filters)
+    return configuration.inventory.resources(
+        "projects",
+        domain.id if domain else "all",
+        Project,
+        lambda: configuration.os_cloud.list_projects(**filters),
+        configuration.os_cloud,
+    )
+
+
+def list_flavors(configuration: Configuration) -> list:
+    from openstack.compute.v2.flavor import Flavor
+
+    if not configuration.inventory:
+        return configuration.os_cloud.list_flavors()
+    return configuration.inventory.resources(
+        "flavors",
+        "all",
+        Flavor,
+        configuration.os_cloud.list_flavors,
+        configuration.os_cloud,
+    )
+
+
+def get_flavor_access(
+    configuration: Configuration, flavor: openstack.compute.v2.flavor.Flavor
+) -> list[str]:
+    def fetch() -> list[dict]:
+        return [
+            {"tenant_id": x["tenant_id"]}
+            for x in configuration.os_cloud.list_flavor_access(flavor)
+        ]
+
+    if not configuration.inventory:
+        items = fetch()
+    else:
+        items = configuration.inventory.get("flavor_access", flavor.id, fetch)
+    return [x["tenant_id"] for x in items]
+
+
+def add_flavor_access(
+    configuration: Configuration, flavor_id: str, project_id: str
+) -> None:
+    configuration.os_cloud.add_flavor_access(flavor_id, project_id)
+    if configuration.inventory:
+        configuration.inventory.add(
+            "flavor_access", flavor_id, {"tenant_id": project_id}
+        )
+
+
+def list_volume_types(configuration: Configuration, is_public: bool) -> list:
+    from openstack.block_storage.v3.type import Type
+
+    if not configuration.inventory:
+        return list(configuration.os_cloud.block_storage.types(is_public=is_public))
+    return configuration.inventory.resources(
+        "volume_types",
+        "public" if is_public else "private",
+        Type,
+        lambda: configuration.os_cloud.block_storage.types(is_public=is_public),
+        configuration.os_cloud,
+    )
+
+
+def get_volume_type_access(
+    configuration: Configuration, volume_type: openstack.block_storage.v3.type.Type
+) -> list[str]:
+    def fetch() -> list[dict]:
+        return [
+            {"project_id": x["project_id"]}
+            for x in configuration.os_cloud.block_storage.get_type_access(volume_type)
+        ]
+
+    if not configuration.inventory:
+        items = fetch()
+    else:
+        items = configuration.inventory.get("volume_type_access", volume_type.id, fetch)
+    return [x["project_id"] for x in items]
+
+
+def add_volume_type_access(
+    configuration: Configuration,
+    volume_type: openstack.block_storage.v3.type.Type,
+    project_id: str,
+) -> None:
+    configuration.os_cloud.block_storage.add_type_access(volume_type, project_id)
+    if configuration.inventory:
+        configuration.inventory.add(
+            "volume_type_access", volume_type.id, {"project_id": project_id}
+        )
+
+
+def list_rbac_policies(
     configuration: Configuration,
     project: openstack.identity.v3.project.Project,
-    classes: list[Path],
+    action: str,
+    network: openstack.network.v2.network.Network,
+) -> list[dict]:
+    if not configuration.inventory:
+        return configuration.os_neutron.list_rbac_policies(
+            **{
+                "target_tenant": project.id,
+                "action": action,
+                "object_type": "network",
+                "object_id": network.id,
+                "fields": "id",
+            }
+        )["rbac_policies"]
+
+    # all policies of the network, not only the ones of the project
+    policies = configuration.inventory.get(
+        "rbac_policies",
+        network.id,
+        lambda: [
+            {"id": x["id"], "target_tenant": x["target_tenant"], "action": x["action"]}
+            for x in configuration.os_neutron.list_rbac_policies(
+                **{"object_type": "network", "object_id": network.id}
+            )["rbac_policies"]
+        ],
+    )
+    return [
+        {"id": x["id"]}
+        for x in policies
+        if x["target_tenant"] == project.id and x["action"] == action
+    ]
+
+
+def create_rbac_policy(
+    configuration: Configuration,
+    project: openstack.identity.v3.project.Project,
+    action: str,
+    network: openstack.network.v2.network.Network,
+) -> None:
+    result = configuration.os_neutron.create_rbac_policy(
+        {
+            "rbac_policy": {
+                "target_tenant": project.id,
+                "action": action,
+                "object_type": "network",
+                "object_id": network.id,
+            }
+        }
+    )
+    if configuration.inventory:
+        configuration.inventory.add(
+            "rbac_policies",
+            network.id,
+            {
+                "id": result["rbac_policy"]["id"],
+                "target_tenant": project.id,
+                "action": action,
+            },
+        )
+
+
+def delete_rbac_policy(
+    configuration: Configuration,
+    network: openstack.network.v2.network.Network,
+    rbac_policy_id: str,
 ) -> None:
+    configuration.os_neutron.delete_rbac_policy(rbac_policy_id)
+    if configuration.inventory:
+        configuration.inventory.remove(
+            "rbac_policies", network.id, "id", rbac_policy_id
+        )
+
+
+def list_bandwidth_policies(
+    configuration: Configuration, project: openstack.identity.v3.project.Project
+) -> list:
+    from openstack.network.v2.qos_policy import QoSPolicy
+
+    if not configuration.inventory:
+        return configuration.os_cloud.list_qos_policies(
+            {"name": "bw-limiter", "project_id": project.id}
+        )
+
+    # the bandwidth limit policies of all projects
+    policies = configuration.inventory.resources(
+        "qos_policies",
+        "bw-limiter",
+        QoSPolicy,
+        lambda: configuration.os_cloud.list_qos_policies({"name": "bw-limiter"}),
+        configuration.os_cloud,
+    )
+    return [x for x in policies if x.project_id == project.id]
+
+
+def list_endpoint_groups(configuration: Configuration) -> dict[str, str]:
+    def fetch() -> list[dict]:
+        return [
+            {"id": x.id, "name": x.name}
+            for x in configuration.os_keystone.endpoint_groups.list()
+        ]
+
+    if not configuration.inventory:
+        items = fetch()
+    else:
+        items = configuration.inventory.get("endpoint_groups", "all", fetch)
+    return {x["name"]: x["id"] for x in items}
+
+
+def get_project_endpoint_groups(
+    configuration: Configuration, project: openstack.identity.v3.project.Project
+) -> list[str]:
+    def fetch() -> list[dict]:
+        return [
+            {"name": x.name}
+            for x in configuration.os_keystone.endpoint_filter.list_endpoint_groups_for_project(
+                project=project.id
+            )
+        ]
+
+    if not configuration.inventory:
+        items = fetch()
+    else:
+        items = configuration.inventory.get(
+            "project_endpoint_groups", project.id, fetch
+        )
+    return [x["name"] for x in items]
+
+
+def get_project_quotas(
+    configuration: Configuration,
+    project: openstack.identity.v3.project.Project,
+) -> dict:
+    return {
+        "network": configuration.os_cloud.get_network_quotas(project.id),
+        "compute": configuration.os_cloud.get_compute_quotas(project.id),
+        "volume": configuration.os_cloud.get_volume_quotas(project.id),
+    }
+
+
+def get_project_quotaclass(
+    configuration: Configuration,
+    project: openstack.identity.v3.project.Project,
+    classes: list[Path],
+) -> Tuple[str, Optional[dict]]:
 
     quotaclass_name = ""
 
@@ -162,12 +631,86 @@ def check_quota(
             quotaclass_name = "basic"
             quotaclass = get_quotaclass(classes, quotaclass_name)
 
+    return quotaclass_name, quotaclass
+
+
+def check_quota(
+    configuration: Configuration,
+    project: openstack.identity.v3.project.Project,
+    classes: list[Path],
+    observed: Optional[dict] = None,
+) -> Optional[dict]:
+
+    quotaclass_name, quotaclass = get_project_quotaclass(
+        configuration, project, classes
+    )
     if quotaclass is None:
         logger.error(f"{classes} - does not contain the requested quotaclass")
-        return
+        return None
 
     logger.info(f"{project.name} - quotaclass = {quotaclass_name}")
 
+    for p in [x for x in project if x.startswith("quota_") and x != "quota_router"]:
+        logger.info(f"{project.name} - overwriting {p[6:]} = {project.get(p)}")
+
+    quotas = compute_desired_quotas(project, quotaclass)
+
+    # the quotas read for the fingerprint of the project are not read again
+    if observed is None:
+        observed = get_project_quotas(configuration, project)
+    written: dict = {"network": {}, "compute": {}, "volume": {}}
+
+    logger.info(f"{project.name} - check network quota")
+    quotanetwork = observed["network"]
+    for key, quota_should_be in quotas["network"].items():
+        if quota_should_be != quotanetwork[key]:
+            logger.info(
+                f"{project.name} - network[{key}] = {quota_should_be} != {quotanetwork[key]}"
+            )
+            if not configuration.dry_run:
+                configuration.os_cloud.set_network_quotas(
+                    project.id, **{key: quota_should_be}
+                )
+                written["network"][key] = quota_should_be
+
+    logger.info(f"{project.name} - check compute quota")
+    quotacompute = observed["compute"]
+    for key, quota_should_be in quotas["compute"].items():
+        if quota_should_be != quotacompute[key]:
+            logger.info(
+                f"{project.name} - compute[{key}] = {quota_should_be} != {quotacompute[key]}"
+            )
+            if not configuration.dry_run:
+                configuration.os_cloud.set_compute_quotas(
+                    project.id, **{key: quota_should_be}
+                )
+                written["compute"][key] = quota_should_be
+
+    logger.info(f"{project.name} - check volume quota")
+    quotavolume = observed["volume"]
+    for key, quota_should_be in quotas["volume"].items():
+        if quota_should_be != quotavolume[key]:
+            logger.info(
+                f"{project.name} - volume[{key}] = {quota_should_be} != {quotavolume[key]}"
+            )
+            if not configuration.dry_run:
+                configuration.os_cloud.set_volume_quotas(
+                    project.id, **{key: quota_should_be}
+                )
+                written["volume"][key] = quota_should_be
+
+    # the quotas of the project after the check, the written ones take precedence
+    return {
+        service: collections.ChainMap(written[service], observed[service])
+        for service in written
+    }
+
+
+def compute_desired_quotas(
+    project: openstack.identity.v3.project.Project, quotaclass: dict
+) -> dict[str, dict[str, int]]:
+    # NOTE: The desired quotas only depend on the properties of the project and its
+    #       quota class, they are computed without API calls.
     if "quotamultiplier" in project:
         multiplier = int(project.quotamultiplier)
     else:
@@ -203,96 +746,65 @@ def check_quota(
         ):
             quota_router = quota_router + 1
 
+    # the quota class is shared with the bandwidth check and not modified
+    quotas = {x: dict(quotaclass[x]) for x in ["network", "compute", "volume"]}
     overwrites = {}
 
     # overwrite quotas
     for p in [x for x in project if x.startswith("quota_") and x != "quota_router"]:
-        logger.info(f"{project.name} - overwriting {p[6:]} = {project.get(p)}")
         overwrites[p[6:]] = True
         if p[6:] in QUOTAS["network"]:
-            quotaclass["network"][p[6:]] = int(str(project.get(p)))
+            quotas["network"][p[6:]] = int(str(project.get(p)))
         elif p[6:] in QUOTAS["compute"]:
-            quotaclass["compute"][p[6:]] = int(str(project.get(p)))
+            quotas["compute"][p[6:]] = int(str(project.get(p)))
         elif p[6:] in QUOTAS["volume"]:
-            quotaclass["volume"][p[6:]] = int(str(project.get(p)))
+            quotas["volume"][p[6:]] = int(str(project.get(p)))
 
-    logger.info(f"{project.name} - check network quota")
-    quotanetwork = configuration.os_cloud.get_network_quotas(project.id)
-    for key in quotaclass["network"]:
+    result: dict[str, dict[str, int]] = {"network": {}, "compute": {}, "volume": {}}
+
+    for key in quotas["network"]:
         if key == "router":
             quota_should_be = quota_router
         elif key in overwrites:
-            quota_should_be = quotaclass["network"][key]
+            quota_should_be = quotas["network"][key]
         else:
-            quota_should_be = quotaclass["network"][key] * multiplier_network
+            quota_should_be = quotas["network"][key] * multiplier_network
 
         if quota_should_be < 0:
             quota_should_be = -1
+        result["network"][key] = quota_should_be
 
-        if quota_should_be != quotanetwork[key]:
-            logger.info(
-                f"{project.name} - network[{key}] = {quota_should_be} != {quotanetwork[key]}"
-            )
-            if not configuration.dry_run:
-                configuration.os_cloud.set_network_quotas(
-                    project.id, **{key: quota_should_be}
-                )
-
-    check_bandwidth_limit(configuration, project, quotaclass)
-
-    logger.info(f"{project.name} - check compute quota")
-    quotacompute = configuration.os_cloud.get_compute_quotas(project.id)
-    for key in quotaclass["compute"]:
-        if key in [
-            "injected_file_content_bytes",
-            "metadata_items",
-            "injected_file_path_bytes",
-        ]:
+    for key in quotas["compute"]:
+        if key in UNSCALED_QUOTAS["compute"]:
             tmultiplier = 1
         else:
             tmultiplier = multiplier_compute
 
         if key in overwrites:
-            quota_should_be = quotaclass["compute"][key]
+            quota_should_be = quotas["compute"][key]
         else:
-            quota_should_be = quotaclass["compute"][key] * tmultiplier
+            quota_should_be = quotas["compute"][key] * tmultiplier
 
         if quota_should_be < 0:
             quota_should_be = -1
+        result["compute"][key] = quota_should_be
 
-        if quota_should_be != quotacompute[key]:
-            logger.info(
-                f"{project.name} - compute[{key}] = {quota_should_be} != {quotacompute[key]}"
-            )
-            if not configuration.dry_run:
-                configuration.os_cloud.set_compute_quotas(
-                    project.id, **{key: quota_should_be}
-                )
-
-    logger.info(f"{project.name} - check volume quota")
-    quotavolume = configuration.os_cloud.get_volume_quotas(project.id)
-    for key in quotaclass["volume"]:
-        if key in ["per_volume_gigabytes"]:
+    for key in quotas["volume"]:
+        if key in UNSCALED_QUOTAS["volume"]:
             tmultiplier = 1
         else:
             tmultiplier = multiplier_storage
 
         if key in overwrites:
-            quota_should_be = quotaclass["volume"][key]
+            quota_should_be = quotas["volume"][key]
         else:
-            quota_should_be = quotaclass["volume"][key] * tmultiplier
+            quota_should_be = quotas["volume"][key] * tmultiplier
 
         if quota_should_be < 0:
             quota_should_be = -1
+        result["volume"][key] = quota_should_be
 
-        if quota_should_be != quotavolume[key]:
-            logger.info(
-                f"{project.name} - volume[{key}] = {quota_should_be} != {quotavolume[key]}"
-            )
-            if not configuration.dry_run:
-                configuration.os_cloud.set_volume_quotas(
-                    project.id, **{key: quota_should_be}
-                )
+    return result
 
 
 def update_bandwidth_policy_rule(
@@ -337,6 +849,17 @@ def update_bandwidth_policy_rule(
         )
 
 
+def check_bandwidth(
+    configuration: Configuration,
+    project: openstack.identity.v3.project.Project,
+    classes: list[Path],
+) -> None:
+    # check_quota reports a missing quotaclass
+    _, quotaclass = get_project_quotaclass(configuration, project, classes)
+    if quotaclass is not None:
+        check_bandwidth_limit(configuration, project, quotaclass)
+
+
 def check_bandwidth_limit(
     configuration: Configuration,
     project: openstack.identity.v3.project.Project,
@@ -367,9 +890,7 @@ def check_bandwidth_limit(
         if "ingress_burst" in quotaclass["bandwidth"]:
             limit_ingress_burst = int(quotaclass["bandwidth"]["ingress_burst"])
 
-    existingPolicies = configuration.os_cloud.list_qos_policies(
-        {"name": "bw-limiter", "project_id": project.id}
-    )
+    existingPolicies = list_bandwidth_policies(configuration, project)
 
     if (
         limit_egress == -1
@@ -382,6 +903,10 @@ def check_bandwidth_limit(
             logger.info(f"{project.name} - removing bandwidth limit policy")
             for policy in existingPolicies:
                 configuration.os_cloud.delete_qos_policy(policy.id)
+                if configuration.inventory:
+                    configuration.inventory.remove(
+                        "qos_policies", "bw-limiter", "id", policy.id
+                    )
         return
 
     if len(existingPolicies) == 0:
@@ -389,6 +914,10 @@ def check_bandwidth_limit(
         policy = configuration.os_cloud.create_qos_policy(
             name="bw-limiter", default=True, project_id=project.id
         )
+        if configuration.inventory:
+            from openstack_project_manager.inventory import to_item
+
+            configuration.inventory.add("qos_policies", "bw-limiter", to_item(policy))
     else:
         policy = existingPolicies[0]
 
@@ -467,6 +996,7 @@ def check_volume_types(
     domain: openstack.identity.v3.domain.Domain,
     classes: list[Path],
 ) -> None:
+    import openstack
 
     if "quotaclass" in project:
         quotaclass = get_quotaclass(classes, project.quotaclass)
@@ -480,12 +1010,17 @@ def check_volume_types(
     if quotaclass and "volume_types" in quotaclass:
         for item in quotaclass["volume_types"]:
             logger.info(f"{project.name} - add volume type {item}")
-            volume_types = [
-                x
-                for x in configuration.os_cloud.block_storage.types(
-                    **{"name": item, "is_public": "False"}
-                )
-            ]
+            if configuration.inventory:
+                volume_types = [
+                    x for x in list_volume_types(configuration, False) if x.name == item
+                ]
+            else:
+                volume_types = [
+                    x
+                    for x in configuration.os_cloud.block_storage.types(
+                        **{"name": item, "is_public": "False"}
+                    )
+                ]
 
             if len(volume_types) > 1:
                 logger.warning(
@@ -497,10 +1032,14 @@ def check_volume_types(
                 logger.warning(f"{project.name} - volume type {item} not found")
                 continue
 
+            # the access of the project is known without an API call
+            if configuration.inventory and project.id in get_volume_type_access(
+                configuration, volume_types[0]
+            ):
+                continue
+
             try:
-                configuration.os_cloud.block_storage.add_type_access(
-                    volume_types[0], project.id
-                )
+                add_volume_type_access(configuration, volume_types[0], project.id)
             except openstack.exceptions.ConflictException:
                 pass
 
@@ -521,7 +1060,7 @@ def manage_private_volumetypes(
         f"{project.name} - managing private volume types for domain {domain.name}"
     )
 
-    all_volume_types = list(configuration.os_cloud.block_storage.types(is_public=False))
+    all_volume_types = list_volume_types(configuration, False)
 
     for volume_type in all_volume_types:
         if not volume_type.name.upper().startswith(f"{domain.name.upper()}-"):
@@ -531,10 +1070,7 @@ def manage_private_volumetypes(
         if location != admin_project.id:
             continue
 
-        projects_with_access = [
-            x["project_id"]
-            for x in configuration.os_cloud.block_storage.get_type_access(volume_type)
-        ]
+        projects_with_access = get_volume_type_access(configuration, volume_type)
 
         if project.id in projects_with_access:
             logger.debug(
@@ -543,7 +1079,7 @@ def manage_private_volumetypes(
             continue
 
         logger.info(f"{project.name} - Adding volume type {volume_type.name}")
-        configuration.os_cloud.block_storage.add_type_access(volume_type, project.id)
+        add_volume_type_access(configuration, volume_type, project.id)
 
 
 def manage_default_volume_type(
@@ -552,6 +1088,8 @@ def manage_default_volume_type(
     domain: openstack.identity.v3.domain.Domain,
     classes: list[Path],
 ) -> None:
+    import openstack
+
     logger.info(f"{project.name} - managing default volume type")
     if "quotaclass" in project:
         quotaclass = get_quotaclass(classes, project.quotaclass)
@@ -576,9 +1114,7 @@ def manage_default_volume_type(
         for is_public in [True, False]:
             default_volume_types += [
                 volume_type
-                for volume_type in configuration.os_cloud.block_storage.types(
-                    is_public=is_public
-                )
+                for volume_type in list_volume_types(configuration, is_public)
                 if default_volume_type_name_or_id == volume_type.id
                 or default_volume_type_name_or_id == volume_type.name
             ]
@@ -630,6 +1166,7 @@ def check_flavors(
     domain: openstack.identity.v3.domain.Domain,
     classes: list[Path],
 ) -> None:
+    import openstack
 
     if "quotaclass" in project:
         quotaclass = get_quotaclass(classes, project.quotaclass)
@@ -641,18 +1178,13 @@ def check_flavors(
             quotaclass = get_quotaclass(classes, "basic")
 
     if quotaclass and "flavors" in quotaclass:
+        # list the flavors once, not once per flavor of the quotaclass
+        private_flavors = [f for f in list_flavors(configuration) if not f.is_public]
+
         for item in quotaclass["flavors"]:
             logger.info(f"{project.name} - add flavor {item}")
 
-            all_flavors = list(configuration.os_cloud.list_flavors())
-            flavors = []
-
-            for f in all_flavors:
-                if f.is_public:
-                    continue
-
-                if f.name == item or f.id == item:
-                    flavors.append(f)
+            flavors = [f for f in private_flavors if f.name == item or f.id == item]
 
             if len(flavors) > 1:
                 logger.error(
@@ -664,8 +1196,14 @@ def check_flavors(
                 logger.error(f"{project.name} - flavor {item} not found")
                 continue
 
+            # the access of the project is known without an API call
+            if configuration.inventory and project.id in get_flavor_access(
+                configuration, flavors[0]
+            ):
+                continue
+
             try:
-                configuration.os_cloud.add_flavor_access(flavors[0].id, project.id)
+                add_flavor_access(configuration, flavors[0].id, project.id)
             except openstack.exceptions.ConflictException:
                 pass
 
@@ -677,7 +1215,7 @@ def manage_private_flavors(
 ) -> None:
     logger.info(f"{project.name} - managing private flavors for domain {domain.name}")
 
-    all_flavors = list(configuration.os_cloud.list_flavors())
+    all_flavors = list_flavors(configuration)
 
     for flavor in all_flavors:
         if not flavor.name.upper().startswith(f"{domain.name.upper()}-"):
@@ -686,16 +1224,14 @@ def manage_private_flavors(
         if flavor.is_public:
             continue
 
-        projects_with_access = [
-            x["tenant_id"] for x in configuration.os_cloud.list_flavor_access(flavor)
-        ]
+        projects_with_access = get_flavor_access(configuration, flavor)
 
         if project.id in projects_with_access:
             logger.debug(f"{project.name} - flavor {flavor.name} is already assigned")
             continue
 
         logger.info(f"{project.name} - Adding flavor {flavor.name}")
-        configuration.os_cloud.add_flavor_access(flavor.id, project.id)
+        add_flavor_access(configuration, flavor.id, project.id)
 
 
 def create_network_resources(
@@ -789,6 +1325,7 @@ def add_service_network(
     project: openstack.identity.v3.project.Project,
     net_name: str,
 ) -> None:
+    import neutronclient.common.exceptions
 
     if "service_network_type" in project:
         service_network_type = f"access_as_{project.service_network_type}"
@@ -800,33 +1337,18 @@ def add_service_network(
             f"{project.name} - check if service rbac policy must be created ({net_name})"
         )
         net = configuration.os_cloud.get_network(net_name)
-        rbac_policies = configuration.os_neutron.list_rbac_policies(
-            **{
-                "target_tenant": project.id,
-                "action": service_network_type,
-                "object_type": "network",
-                "object_id": net.id,
-                "fields": "id",
-            }
+        rbac_policies = list_rbac_policies(
+            configuration, project, service_network_type, net
         )
 
-        if len(rbac_policies["rbac_policies"]) == 0:
+        if len(rbac_policies) == 0:
             logger.info(
                 f"{project.name} - service rbac policy has to be created ({net_name})"
             )
 
-        if not configuration.dry_run and len(rbac_policies["rbac_policies"]) == 0:
+        if not configuration.dry_run and len(rbac_policies) == 0:
             logger.info(f"{project.name} - create service rbac policy ({net_name})")
-            configuration.os_neutron.create_rbac_policy(
-                {
-                    "rbac_policy": {
-                        "target_tenant": project.id,
-                        "action": service_network_type,
-                        "object_type": "network",
-                        "object_id": net.id,
-                    }
-                }
-            )
+            create_rbac_policy(configuration, project, service_network_type, net)
 
     except neutronclient.common.exceptions.Conflict:
         pass
@@ -839,6 +1361,7 @@ def del_service_network(
     project: openstack.identity.v3.project.Project,
     public_net_name: str,
 ) -> None:
+    import neutronclient.common.exceptions
 
     try:
         logger.info(
@@ -846,27 +1369,21 @@ def del_service_network(
         )
 
         public_net = configuration.os_cloud.get_network(public_net_name)
-        rbac_policies = configuration.os_neutron.list_rbac_policies(
-            **{
-                "target_tenant": project.id,
-                "action": "access_as_shared",
-                "object_type": "network",
-                "object_id": public_net.id,
-                "fields": "id",
-            }
+        rbac_policies = list_rbac_policies(
+            configuration, project, "access_as_shared", public_net
         )
 
-        if len(rbac_policies["rbac_policies"]) == 1:
+        if len(rbac_policies) == 1:
             logger.info(
                 f"{project.name} - service rbac policy has to be deleted ({public_net_name})"
             )
 
-        if not configuration.dry_run and len(rbac_policies["rbac_policies"]) == 1:
+        if not configuration.dry_run and len(rbac_policies) == 1:
             logger.info(
                 f"{project.name} - delete service rbac policy ({public_net_name})"
             )
-            rbac_policy = rbac_policies["rbac_policies"][0]["id"]
-            configuration.os_neutron.delete_rbac_policy(rbac_policy)
+            rbac_policy = rbac_policies[0]["id"]
+            delete_rbac_policy(configuration, public_net, rbac_policy)
 
     except neutronclient.common.exceptions.Conflict:
         pass
@@ -879,6 +1396,7 @@ def add_external_network(
     project: openstack.identity.v3.project.Project,
     public_net_name: str,
 ) -> None:
+    import neutronclient.common.exceptions
 
     try:
         logger.info(
@@ -886,33 +1404,18 @@ def add_external_network(
         )
 
         public_net = configuration.os_cloud.get_network(public_net_name)
-        rbac_policies = configuration.os_neutron.list_rbac_policies(
-            **{
-                "target_tenant": project.id,
-                "action": "access_as_external",
-                "object_type": "network",
-                "object_id": public_net.id,
-                "fields": "id",
-            }
+        rbac_policies = list_rbac_policies(
+            configuration, project, "access_as_external", public_net
         )
 
-        if len(rbac_policies["rbac_policies"]) == 0:
+        if len(rbac_policies) == 0:
             logger.info(
                 f"{project.name} - external rbac policy has to be created ({public_net_name})"
             )
 
-        if not configuration.dry_run and len(rbac_policies["rbac_policies"]) == 0:
+        if not configuration.dry_run and len(rbac_policies) == 0:
             logger.info(f"{project.name} - create rbac policy ({public_net_name})")
-            configuration.os_neutron.create_rbac_policy(
-                {
-                    "rbac_policy": {
-                        "target_tenant": project.id,
-                        "action": "access_as_external",
-                        "object_type": "network",
-                        "object_id": public_net.id,
-                    }
-                }
-            )
+            create_rbac_policy(configuration, project, "access_as_external", public_net)
 
     except neutronclient.common.exceptions.Conflict:
         pass
@@ -925,6 +1428,7 @@ def del_external_network(
     project: openstack.identity.v3.project.Project,
     public_net_name: str,
 ) -> None:
+    import neutronclient.common.exceptions
 
     try:
         logger.info(
@@ -932,27 +1436,21 @@ def del_external_network(
         )
 
         public_net = configuration.os_cloud.get_network(public_net_name)
-        rbac_policies = configuration.os_neutron.list_rbac_policies(
-            **{
-                "target_tenant": project.id,
-                "action": "access_as_external",
-                "object_type": "network",
-                "object_id": public_net.id,
-                "fields": "id",
-            }
+        rbac_policies = list_rbac_policies(
+            configuration, project, "access_as_external", public_net
         )
 
-        if len(rbac_policies["rbac_policies"]) == 1:
+        if len(rbac_policies) == 1:
             logger.info(
                 f"{project.name} - external rbac policy has to be deleted ({public_net_name})"
             )
 
-        if not configuration.dry_run and len(rbac_policies["rbac_policies"]) == 1:
+        if not configuration.dry_run and len(rbac_policies) == 1:
             logger.info(
                 f"{project.name} - delete external rbac policy ({public_net_name})"
             )
-            rbac_policy = rbac_policies["rbac_policies"][0]["id"]
-            configuration.os_neutron.delete_rbac_policy(rbac_policy)
+            rbac_policy = rbac_policies[0]["id"]
+            delete_rbac_policy(configuration, public_net, rbac_policy)
 
     except neutronclient.common.exceptions.Conflict:
         pass
@@ -1173,16 +1671,9 @@ def check_endpoints(
     else:
         endpoints = ["default", "orchestration"]
 
-    existing_endpoint_groups = {
-        x.name: x for x in configuration.os_keystone.endpoint_groups.list()
-    }
+    existing_endpoint_groups = list_endpoint_groups(configuration)
 
-    assigned_endpoint_groups = [
-        x.name
-        for x in configuration.os_keystone.endpoint_filter.list_endpoint_groups_for_project(
-            project=project.id
-        )
-    ]
+    assigned_endpoint_groups = get_project_endpoint_groups(configuration, project)
 
     for endpoint in [x for e in endpoints for x in configuration.ENDPOINTS[e]]:
         for interface in ["internal", "public"]:
@@ -1196,13 +1687,20 @@ def check_endpoints(
                 continue
 
             try:
-                endpoint_group = existing_endpoint_groups[endpoint_group_name]
+                endpoint_group_id = existing_endpoint_groups[endpoint_group_name]
                 configuration.os_keystone.endpoint_filter.add_endpoint_group_to_project(
-                    endpoint_group=endpoint_group.id, project=project.id
+                    endpoint_group=endpoint_group_id, project=project.id
                 )
                 logger.info(f"{project.name} - add endpoint {endpoint} ({interface})")
             except KeyError:
-                pass
+                continue
+
+            if configuration.inventory:
+                configuration.inventory.add(
+                    "project_endpoint_groups",
+                    project.id,
+                    {"name": endpoint_group_name},
+                )
 
 
 def share_image_with_project(
@@ -1246,9 +1744,98 @@ def share_images(
         share_image_with_project(configuration, image, project)
 
 
+def get_image_cache_size(image: openstack.image.v2.image.Image) -> int:
+    # convert bytes to gigabytes and always round up
+    volume_size = math.ceil(image.size / (1024 * 1024 * 1024))
+    if volume_size < image.min_disk:
+        volume_size = image.min_disk
+
+    return volume_size
+
+
+def rank_images(
+    images: List[openstack.image.v2.image.Image], policy: str
+) -> List[openstack.image.v2.image.Image]:
+    if policy == "size":
+        # prefer small images, this keeps as many images as possible warm
+        return sorted(images, key=lambda x: (get_image_cache_size(x), x.name or ""))
+
+    # prefer the most recently used images, the latest version of an image
+    # is usually the one that is booted the most
+    return sorted(
+        images,
+        key=lambda x: str(x.updated_at or x.created_at or ""),
+        reverse=True,
+    )
+
+
+def plan_image_cache(
+    images: List[openstack.image.v2.image.Image],
+    volumes: List[openstack.block_storage.v2.volume.Volume],
+    quota: dict,
+    policy: str,
+) -> Tuple[
+    List[openstack.image.v2.image.Image],
+    List[openstack.block_storage.v2.volume.Volume],
+]:
+    cache_volumes = {x.name: x for x in volumes if x.name.startswith("cache-")}
+
+    # volumes in the images project that are not part of the image cache
+    # count against the quota as well
+    other_volumes = [x for x in volumes if x.name not in cache_volumes]
+    available_gigabytes = quota["gigabytes"]
+    if available_gigabytes >= 0:
+        available_gigabytes -= sum(x.size for x in other_volumes)
+    available_volumes = quota["volumes"]
+    if available_volumes >= 0:
+        available_volumes -= len(other_volumes)
+
+    keep = []
+    to_create = []
+    for image in rank_images(images, policy):
+        volume = cache_volumes.get(f"cache-{image.id}")
+        size = volume.size if volume else get_image_cache_size(image)
+
+        if (available_gigabytes >= 0 and size > available_gigabytes) or (
+            available_volumes == 0
+        ):
+            continue
+
+        if available_gigabytes >= 0:
+            available_gigabytes -= size
+        if available_volumes > 0:
+            available_volumes -= 1
+
+        if volume:
+            keep.append(volume.name)
+        else:
+            to_create.append(image)
+
+    # NOTE: Cache volumes that are not kept, e.g. of images that are no longer
+    #       shared, are only evicted when they do not fit next to the planned
+    #       image cache, not when the quota still has room for them.
+    to_evict = []
+    for volume in cache_volumes.values():
+        if volume.name in keep:
+            continue
+        if (available_gigabytes >= 0 and volume.size > available_gigabytes) or (
+            available_volumes == 0
+        ):
+            to_evict.append(volume)
+            continue
+
+        if available_gigabytes >= 0:
+            available_gigabytes -= volume.size
+        if available_volumes > 0:
+            available_volumes -= 1
+
+    return (to_create, to_evict)
+
+
 def cache_images(
     configuration: Configuration, domain: openstack.identity.v3.domain.Domain
 ) -> None:
+    import openstack
 
     # get the images project
     project_images = configuration.os_cloud.get_project(
@@ -1262,8 +1849,10 @@ def cache_images(
         return
 
     # only images owned by the images project should be cached
-    images = configuration.os_cloud.image.images(
-        owner=project_images.id, visibility="shared"
+    images = list(
+        configuration.os_cloud.image.images(
+            owner=project_images.id, visibility="shared"
+        )
     )
 
     try:
@@ -1276,39 +1865,70 @@ def cache_images(
         )
         return
 
+    if configuration.cassette:
+        for prefix in ["https://", "http://"]:
+            cloud_domain_admin.session.session.mount(prefix, configuration.cassette)
+    if configuration.api_stats:
+        configuration.api_stats.instrument(cloud_domain_admin.session)
+    if configuration.tracer:
+        configuration.tracer.instrument(cloud_domain_admin.session)
+
     # remove cache volume for which there is no image anymore
-    volumes: List[openstack.block_storage.v2.volume.Volume] = (
+    volumes: List[openstack.block_storage.v2.volume.Volume] = list(
         cloud_domain_admin.volume.volumes(owner=project_images.id)
     )
 
-    for volume in volumes:
+    for volume in list(volumes):
+        if not volume.name.startswith("cache-"):
+            continue
+
         image = cloud_domain_admin.image.find_image(name_or_id=volume.name[6:])
         if not image:
             logger.info(
                 f"{domain.name} - remove cache volume {volume.name} for which there is no image anymore"
             )
             cloud_domain_admin.volume.delete_volume(volume)
+            volumes.remove(volume)
 
-    for image in images:
-        volume_name = f"cache-{image.id}"
-        volume = cloud_domain_admin.volume.find_volume(name_or_id=volume_name)
+    if not images:
+        return
 
-        if not volume:
-            logger.info(
-                f"{domain.name} - prepare image cache for '{image.name}' ({image.id})"
-            )
+    # plan the image cache within the quota of the images project
+    quota = configuration.os_cloud.get_volume_quotas(project_images.id)
+    to_create, to_evict = plan_image_cache(
+        images, volumes, quota, configuration.image_cache_policy
+    )
 
-            # convert bytes to gigabytes and always round up
-            volume_size = math.ceil(image.size / (1024 * 1024 * 1024))
-            if volume_size < image.min_disk:
-                volume_size = image.min_disk
+    for volume in to_evict:
+        logger.info(
+            f"{domain.name} - evict cache volume {volume.name} to make room for more valuable images"
+        )
+        if not configuration.dry_run:
+            cloud_domain_admin.volume.delete_volume(volume)
 
-            try:
-                cloud_domain_admin.volume.create_volume(
-                    name=volume_name, size=volume_size, imageRef=image.id
-                )
-            except openstack.exceptions.HttpException as e:
-                logger.error(f"{domain.name} - {e.message}")
+    for image in to_create:
+        logger.info(
+            f"{domain.name} - prepare image cache for '{image.name}' ({image.id})"
+        )
+
+        if configuration.dry_run:
+            continue
+
+        try:
+            cloud_domain_admin.volume.create_volume(
+                name=f"cache-{image.id}",
+                size=get_image_cache_size(image),
+                imageRef=image.id,
+            )
+        except openstack.exceptions.HttpException as e:
+            logger.error(f"{domain.name} - {e.message}")
+
+    cached = len([x for x in volumes if x.name.startswith("cache-")]) - len(to_evict)
+    skipped = len(images) - len(to_create) - cached
+    if skipped > 0:
+        logger.warning(
+            f"{domain.name} - {skipped} image(s) not cached, quota of {project_images.name} exhausted"
+        )
 
 
 def process_project(
@@ -1328,55 +1948,161 @@ def process_project(
 
     if "unmanaged" in project:
         logger.warning(f"{project.name} - not managed --> skipping")
+        configuration.metrics.projects_skipped += 1
         return
     elif "quotaclass" not in project:
         logger.info(
             f"{project.name} - no quotaclass set (not created by project manager) --> skipping"
         )
+        configuration.metrics.projects_skipped += 1
         return
-    else:
+
+    with project_context(configuration, project):
         domain = configuration.os_cloud.get_domain(project.domain_id)
 
         # At this point, quotaclass is guaranteed to exist due to early return above
         quotaclass = project.quotaclass
 
-        check_quota(configuration, project, classes)
+        # NOTE: The phases derived from the quotaclass and the properties of the
+        #       project are skipped if neither changed since the last verification
+        #       and the quotas of the project were not changed outside the tool.
+        #       The phases that depend on other resources, images and private
+        #       flavors and volume types of the domain, home project users and the
+        #       admin user, always run.
+        verify = True
+        observed = None
+        if configuration.fingerprints:
+            observed = get_project_quotas(configuration, project)
+            project_fingerprint = get_project_fingerprint(
+                configuration,
+                project,
+                domain,
+                classes,
+                manage_endpoints,
+                manage_defaultvolumetype,
+                observed,
+            )
+            if configuration.fingerprints.is_unchanged(project.id, project_fingerprint):
+                logger.info(
+                    f"{project.name} - desired state unchanged since the last verification, skipping quotaclass phases"
+                )
+                verify = False
+
+        quotas = None
+        if verify:
+            with phase_context(configuration, "quota"):
+                quotas = check_quota(configuration, project, classes, observed)
+            with phase_context(configuration, "bandwidth"):
+                check_bandwidth(configuration, project, classes)
 
-        if manage_endpoints:
-            check_endpoints(configuration, project)
+        if manage_endpoints and verify:
+            with phase_context(configuration, "endpoints"):
+                check_endpoints(configuration, project)
 
         if manage_homeprojects:
-            check_homeproject_permissions(configuration, project, domain)
+            with phase_context(configuration, "homeproject"):
+                check_homeproject_permissions(configuration, project, domain)
 
         if configuration.assign_admin_user:
-            assign_admin_user(configuration, project, domain)
+            with phase_context(configuration, "admin_user"):
+                assign_admin_user(configuration, project, domain)
 
-        manage_external_network_rbacs(configuration, project, domain, classes)
+        if verify:
+            with phase_context(configuration, "rbac"):
+                manage_external_network_rbacs(configuration, project, domain, classes)
 
         if check_bool(project, "has_shared_images"):
-            share_images(configuration, project, domain)
-
-        if (
-            quotaclass not in ["default", "service"]
-            and "managed_network_resources" in project
-        ) or (
-            check_bool(project, "is_service_project")
-            and check_bool(project, "has_service_network")
+            with phase_context(configuration, "images"):
+                share_images(configuration, project, domain)
+
+        if verify and (
+            (
+                quotaclass not in ["default", "service"]
+                and "managed_network_resources" in project
+            )
+            or (
+                check_bool(project, "is_service_project")
+                and check_bool(project, "has_service_network")
+            )
         ):
-            create_network_resources(configuration, project, domain)
+            with phase_context(configuration, "network"):
+                create_network_resources(configuration, project, domain)
 
-        check_volume_types(configuration, project, domain, classes)
+        if verify:
+            with phase_context(configuration, "volume_types"):
+                check_volume_types(configuration, project, domain, classes)
 
         if manage_privatevolumetypes:
-            manage_private_volumetypes(configuration, project, domain)
+            with phase_context(configuration, "private_volume_types"):
+                manage_private_volumetypes(configuration, project, domain)
 
-        if manage_defaultvolumetype:
-            manage_default_volume_type(configuration, project, domain, classes)
+        if manage_defaultvolumetype and verify:
+            with phase_context(configuration, "default_volume_type"):
+                manage_default_volume_type(configuration, project, domain, classes)
 
-        check_flavors(configuration, project, domain, classes)
+        if verify:
+            with phase_context(configuration, "flavors"):
+                check_flavors(configuration, project, domain, classes)
 
         if manage_privateflavors:
-            manage_private_flavors(configuration, project, domain)
+            with phase_context(configuration, "private_flavors"):
+                manage_private_flavors(configuration, project, domain)
+
+        if configuration.fingerprints and verify and not configuration.dry_run:
+            # the quotas check_quota left the project with are stored
+            configuration.fingerprints.update(
+                project.id,
+                get_project_fingerprint(
+                    configuration,
+                    project,
+                    domain,
+                    classes,
+                    manage_endpoints,
+                    manage_defaultvolumetype,
+                    quotas,
+                ),
+            )
+
+
+def get_project_fingerprint(
+    configuration: Configuration,
+    project: openstack.identity.v3.project.Project,
+    domain: openstack.identity.v3.domain.Domain,
+    classes: list[Path],
+    manage_endpoints: bool,
+    manage_defaultvolumetype: bool,
+    quotas: Optional[dict] = None,
+) -> str:
+    properties = project.to_dict()
+    for key in ["links", "location"]:
+        properties.pop(key, None)
+
+    # check_quota uses the classes of the admin and service projects by name
+    quotaclass_name = project.quotaclass
+    if project.name in ["admin", "service"]:
+        quotaclass_name = project.name
+
+    # NOTE: The quotas are the observed state that is cheap to read, a changed
+    #       access list or endpoint group is only noticed with the next full
+    #       verification.
+    if quotas is None:
+        quotas = get_project_quotas(configuration, project)
+
+    # the okeanos class of domains starting with ok is part of the resolved class
+    return fingerprint.get_fingerprint(
+        {
+            "project": properties,
+            "domain": domain.name,
+            "quotaclass": get_quotaclass(classes, quotaclass_name),
+            "quotas": {
+                service: {key: values[key] for key in QUOTAS[service]}
+                for service, values in quotas.items()
+            },
+            "okeanos": get_quotaclass(classes, "okeanos"),
+            "endpoints": configuration.ENDPOINTS if manage_endpoints else None,
+            "manage_defaultvolumetype": manage_defaultvolumetype,
+        }
+    )
 
 
 def handle_unmanaged_project(
@@ -1384,16 +2110,21 @@ def handle_unmanaged_project(
     project: openstack.identity.v3.project.Project,
     classes: list[Path],
 ) -> None:
-    # the service project must always be able to access the public network.
-    if project.name == "service":
-        if "public_network" in project:
-            public_net_name = project.public_network
-        else:
-            public_net_name = "public"
-        add_external_network(configuration, project, public_net_name)
+    with project_context(configuration, project):
+        # the service project must always be able to access the public network.
+        if project.name == "service":
+            if "public_network" in project:
+                public_net_name = project.public_network
+            else:
+                public_net_name = "public"
+            with phase_context(configuration, "network"):
+                add_external_network(configuration, project, public_net_name)
 
-    # On the service and admin project, the quota is always managed as well.
-    check_quota(configuration, project, classes)
+        # On the service and admin project, the quota is always managed as well.
+        with phase_context(configuration, "quota"):
+            check_quota(configuration, project, classes)
+        with phase_context(configuration, "bandwidth"):
+            check_bandwidth(configuration, project, classes)
 
     logger.warning(
         f"project {project.name} ({project.id}) in the default domain is not managed"
@@ -1446,6 +2177,13 @@ def run(
     admin_domain: Annotated[
         str, typer.Option("--admin-domain", help="Admin domain")
     ] = "default",
+    image_cache_policy: Annotated[
+        ImageCachePolicy,
+        typer.Option(
+            "--image-cache-policy",
+            help="Policy to rank images when the image cache does not fit into the quota of the images project",
+        ),
+    ] = ImageCachePolicy.recent,
     classes: Annotated[
         list[Path],
         typer.Option(
@@ -1465,21 +2203,439 @@ def run(
     cloud_name: Annotated[
         str, typer.Option("--cloud", help="Cloud name in clouds.yaml")
     ] = "admin",
+    pool_size: Annotated[
+        int,
+        typer.Option(
+            "--pool-size", help="Size of the HTTP connection pool shared by all clients"
+        ),
+    ] = clients.DEFAULT_POOL_SIZE,
+    retries: Annotated[
+        int,
+        typer.Option(
+            "--retries",
+            help="Retry requests answered with 429 or 503 this many times, waiting as long as the Retry-After header asks for",
+        ),
+    ] = 0,
+    token_cache: Annotated[
+        bool,
+        typer.Option(
+            "--token-cache/--notoken-cache",
+            help="Cache token and service catalog on disk until the token expires",
+        ),
+    ] = False,
+    api_report: Annotated[
+        bool,
+        typer.Option(
+            "--api-report/--noapi-report",
+            help="Report the API calls per service, endpoint and phase at the end of the run",
+        ),
+    ] = False,
+    textfile: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--textfile",
+            help="Write the metrics of the run to a textfile of the node_exporter textfile collector",
+        ),
+    ] = None,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            "--profile/--noprofile",
+            help="Report wall-clock and CPU time of the slowest projects and phases at the end of the run",
+        ),
+    ] = False,
+    profile_output: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--profile-output",
+            help="Write a cProfile dump (.prof) or collapsed stacks (any other suffix) of the run, implies --profile",
+        ),
+    ] = None,
+    trace_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--trace-file",
+            help="Append the spans of the run, its domains, projects, phases and API calls to a OTLP/JSON lines file",
+        ),
+    ] = None,
+    record: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--record",
+            help="Record all API requests and responses of the run to a gzip compressed cassette, secrets are redacted",
+        ),
+    ] = None,
+    replay: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--replay",
+            help="Serve all API requests of the run from a cassette recorded with --record",
+        ),
+    ] = None,
+    replay_latency: Annotated[
+        bool,
+        typer.Option(
+            "--replay-latency/--noreplay-latency",
+            help="Wait as long as the recorded requests took when replaying a cassette",
+        ),
+    ] = True,
+    fingerprint_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--fingerprint-file",
+            help="Skip the quotaclass phases of projects whose desired state and quotas are unchanged since their last verification stored in this file, "
+            "changed RBAC policies, flavor access and endpoint groups are only restored by the next verification",
+        ),
+    ] = None,
+    verification_interval: Annotated[
+        int,
+        typer.Option(
+            "--verification-interval",
+            help="Seconds after which a project with an unchanged desired state is verified again",
+        ),
+    ] = fingerprint.DEFAULT_VERIFICATION_INTERVAL,
+    force_verification: Annotated[
+        bool,
+        typer.Option(
+            "--force-verification",
+            help="Verify all projects and update their fingerprints, even if their state is unchanged",
+        ),
+    ] = False,
+    inventory_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--inventory",
+            help="Look up domains, projects, flavors, volume types, access lists, RBAC and QoS policies and endpoint groups in a local SQLite inventory",
+        ),
+    ] = None,
+    inventory_ttls: Annotated[
+        List[str],
+        typer.Option(
+            "--inventory-ttl",
+            help="Seconds the resources of a type are used from the inventory as TYPE=SECONDS, may be specified multiple times",
+        ),
+    ] = [],
+    checkpoint_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--checkpoint",
+            help="Record the completed domains and projects in this file, it is removed when the run succeeds",
+        ),
+    ] = None,
+    resume: Annotated[
+        bool,
+        typer.Option(
+            "--resume/--noresume",
+            help="Skip the domains and projects completed by an interrupted run with the same configuration",
+        ),
+    ] = False,
     domain_name: Annotated[
         Optional[str], typer.Option("--domain", help="Domain to be managed")
     ] = None,
     project_name: Annotated[
         Optional[str], typer.Option("--name", help="Project to be managed")
     ] = None,
+    projects_from: Annotated[
+        Optional[str],
+        typer.Option(
+            "--projects-from",
+            help=f"File with the projects to be managed, one ID or DOMAIN/NAME per line, - for stdin, "
+            f"more than {PROJECT_LOOKUP_LIMIT} IDs list the projects of all domains",
+        ),
+    ] = None,
+    shard_spec: Annotated[
+        Optional[str],
+        typer.Option(
+            "--shard",
+            help="Only manage the projects of shard INDEX/COUNT, e.g. 3/24, selected by a consistent hash of the project ID",
+        ),
+    ] = None,
 ) -> None:
 
-    configuration = Configuration(
-        dry_run, cloud_name, endpoints, assign_admin_user, admin_domain
+    if record and replay:
+        logger.error("--record and --replay can not be used together")
+        sys.exit(1)
+
+    if resume and not checkpoint_file:
+        logger.error("--resume requires --checkpoint")
+        sys.exit(1)
+
+    project_refs = None
+    if projects_from:
+        if domain_name or project_name:
+            logger.error("--projects-from can not be used with --domain or --name")
+            sys.exit(1)
+        try:
+            project_refs = parse_project_refs(
+                sys.stdin.read()
+                if projects_from == "-"
+                else Path(projects_from).read_text()
+            )
+        except OSError as e:
+            logger.error(f"projects file {projects_from} is not readable: {e}")
+            sys.exit(1)
+
+    shard_index = None
+    if shard_spec:
+        if project_name:
+            logger.error("--shard can not be used with --name")
+            sys.exit(1)
+        try:
+            shard_index = shard.parse_shard(shard_spec)
+        except ValueError as e:
+            logger.error(f"invalid --shard: {e}")
+            sys.exit(1)
+
+    config_hash = checkpoint.get_config_hash(
+        {
+            "assign_admin_user": assign_admin_user,
+            "dry_run": dry_run,
+            "manage_endpoints": manage_endpoints,
+            "manage_homeprojects": manage_homeprojects,
+            "manage_privatevolumetypes": manage_privatevolumetypes,
+            "manage_defaultvolumetype": manage_defaultvolumetype,
+            "manage_privateflavors": manage_privateflavors,
+            "admin_domain": admin_domain,
+            "image_cache_policy": image_cache_policy.value,
+            "cloud_name": cloud_name,
+            "domain_name": domain_name,
+            "project_name": project_name,
+            "projects_from": project_refs,
+            "shard": shard_spec,
+        },
+        classes + [Path(endpoints)],
     )
 
+    ttls = None
+    if inventory_ttls:
+        from openstack_project_manager.inventory import parse_ttls
+
+        try:
+            ttls = parse_ttls(inventory_ttls)
+        except ValueError as e:
+            logger.error(f"invalid --inventory-ttl: {e}")
+            sys.exit(1)
+
+    # NOTE: The configuration connects to the cloud, a failed authentication is
+    #       written to the textfile as a failed run as well.
+    run_metrics = metrics.RunMetrics()
+    try:
+        configuration = Configuration(
+            dry_run,
+            cloud_name,
+            endpoints,
+            assign_admin_user,
+            admin_domain,
+            image_cache_policy=image_cache_policy.value,
+            pool_size=pool_size,
+            retries=retries,
+            token_cache=token_cache,
+            api_stats=api_report or textfile is not None,
+            profile=profile or profile_output is not None,
+            profile_output=profile_output,
+            trace_file=trace_file,
+            record=record,
+            replay=replay,
+            replay_latency=replay_latency,
+            fingerprint_file=fingerprint_file,
+            verification_interval=verification_interval,
+            force_verification=force_verification,
+            inventory_file=inventory_file,
+            inventory_ttls=ttls,
+            checkpoint_file=checkpoint_file,
+            config_hash=config_hash,
+            resume=resume,
+            shard=shard_index,
+            run_metrics=run_metrics,
+        )
+    except BaseException:
+        run_metrics.success = False
+        if textfile:
+            run_metrics.write_textfile(textfile)
+        raise
+
+    try:
+        with run_context(configuration, cloud_name):
+            reconcile(
+                configuration,
+                classes,
+                manage_endpoints,
+                manage_homeprojects,
+                manage_privatevolumetypes,
+                manage_defaultvolumetype,
+                manage_privateflavors,
+                domain_name,
+                project_name,
+                project_refs,
+            )
+        if configuration.checkpoint:
+            configuration.checkpoint.remove()
+    except BaseException:
+        configuration.metrics.success = False
+        raise
+    finally:
+        if api_report and configuration.api_stats:
+            print(configuration.api_stats.report())
+        if textfile:
+            configuration.metrics.write_textfile(textfile, configuration.api_stats)
+        if configuration.profiler:
+            configuration.profiler.stop()
+            print(configuration.profiler.report())
+        if configuration.tracer:
+            configuration.tracer.close()
+        if configuration.cassette:
+            configuration.cassette.close()
+        if configuration.fingerprints and not configuration.dry_run:
+            configuration.fingerprints.save()
+        if configuration.inventory:
+            configuration.inventory.close()
+        if configuration.checkpoint:
+            configuration.checkpoint.close()
+
+
+def in_shard(configuration: Configuration, resource_id: str) -> bool:
+    if not configuration.shard:
+        return True
+    index, count = configuration.shard
+    return shard.get_shard(resource_id, count) == index
+
+
+def is_completed(
+    configuration: Configuration, project: openstack.identity.v3.project.Project
+) -> bool:
+    if configuration.checkpoint and project.id in configuration.checkpoint.projects:
+        logger.info(f"{project.name} - completed before the checkpoint, skipping")
+        return True
+    return False
+
+
+def complete_project(
+    configuration: Configuration, project: openstack.identity.v3.project.Project
+) -> None:
+    if configuration.checkpoint:
+        configuration.checkpoint.complete_project(project.id)
+
+
+def parse_project_refs(text: str) -> list[str]:
+    # one project ID or DOMAIN/NAME per line, comments and empty lines are ignored
+    refs = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            refs.append(line)
+    return refs
+
+
+def resolve_projects(
+    configuration: Configuration, domains: list, refs: list[str]
+) -> Tuple[list, list[str]]:
+    import openstack
+
+    # NOTE: The DOMAIN/NAME pairs are looked up with one list call per domain.
+    #       A few IDs are looked up one by one, listing the projects of all
+    #       domains is only cheaper for many of them.
+    domains_by_name = {x.name: x for x in domains}
+
+    ids = [x for x in refs if "/" not in x]
+    projects_by_id = {}
+    if len(ids) > PROJECT_LOOKUP_LIMIT:
+        projects_by_id = {x.id: x for x in list_projects(configuration)}
+    else:
+        for project_id in ids:
+            try:
+                projects_by_id[project_id] = (
+                    configuration.os_cloud.identity.get_project(project_id)
+                )
+            except openstack.exceptions.NotFoundException:
+                pass
+
+    projects_by_name: dict = {}
+    projects: dict = {}
+    missing = []
+    for ref in refs:
+        project = None
+        if "/" in ref:
+            domain_name, project_name = ref.split("/", 1)
+            domain = domains_by_name.get(domain_name)
+            if domain:
+                if domain.id not in projects_by_name:
+                    projects_by_name[domain.id] = {
+                        x.name: x for x in list_projects(configuration, domain)
+                    }
+                project = projects_by_name[domain.id].get(project_name)
+        else:
+            project = projects_by_id.get(ref)
+
+        if not project:
+            missing.append(ref)
+        else:
+            projects.setdefault(project.id, project)
+
+    return list(projects.values()), missing
+
+
+def reconcile(
+    configuration: Configuration,
+    classes: list[Path],
+    manage_endpoints: bool,
+    manage_homeprojects: bool,
+    manage_privatevolumetypes: bool,
+    manage_defaultvolumetype: bool,
+    manage_privateflavors: bool,
+    domain_name: Optional[str],
+    project_name: Optional[str],
+    project_refs: Optional[list[str]] = None,
+) -> None:
+
     # check existence of project and/or domain
 
-    if project_name and not domain_name:
+    if project_refs is not None:
+        domains_by_id = {x.id: x for x in list_domains(configuration)}
+        projects, missing = resolve_projects(
+            configuration, list(domains_by_id.values()), project_refs
+        )
+        for ref in missing:
+            logger.error(f"project {ref} does not exist")
+
+        logger.info(f"Processing {len(projects)} projects")
+
+        # the projects of a domain are processed together in the order of the list
+        projects_by_domain: dict = {}
+        for project in projects:
+            projects_by_domain.setdefault(project.domain_id, []).append(project)
+
+        for domain_id, domain_projects in projects_by_domain.items():
+            domain = domains_by_id[domain_id]
+            with domain_context(configuration, domain):
+                logger.info(f"{domain.name} - domain_id = {domain.id}")
+
+                for project in domain_projects:
+                    if not in_shard(configuration, project.id):
+                        continue
+                    if is_completed(configuration, project):
+                        continue
+                    if (
+                        project.domain_id == "default"
+                        and project.name in UNMANAGED_PROJECTS
+                    ):
+                        handle_unmanaged_project(configuration, project, classes)
+                    else:
+                        process_project(
+                            configuration,
+                            project,
+                            classes,
+                            manage_endpoints,
+                            manage_homeprojects,
+                            manage_privatevolumetypes,
+                            manage_defaultvolumetype,
+                            manage_privateflavors,
+                        )
+                    complete_project(configuration, project)
+
+        if missing:
+            sys.exit(1)
+
+    elif project_name and not domain_name:
         project = configuration.os_cloud.get_project(name_or_id=project_name)
         if not project:
             logger.error(f"project {project_name} does not exist")
@@ -1487,7 +2643,7 @@ def run(
 
         if project.domain_id == "default" and project_name in UNMANAGED_PROJECTS:
             handle_unmanaged_project(configuration, project, classes)
-            sys.exit(0)
+            return
 
         domain = configuration.os_cloud.get_domain(name_or_id=project.domain_id)
         logger.info(f"{domain.name} - domain_id = {domain.id}")
@@ -1515,7 +2671,7 @@ def run(
             )
 
             handle_unmanaged_project(configuration, project, classes)
-            sys.exit(0)
+            return
 
         logger.info(f"{domain.name} - domain_id = {domain.id}")
 
@@ -1545,39 +2701,17 @@ def run(
             logger.error(f"domain {domain} does not exist")
             sys.exit(1)
 
-        logger.info(f"{domain.name} - domain_id = {domain.id}")
-
-        for project in configuration.os_cloud.list_projects(domain_id=domain.id):
-            if "quotaclass" not in project and project.domain_id != "default":
-                logger.info(f"{project.name} - skipping project without quotaclass")
-                continue
-            if project.domain_id == "default" and project.name in UNMANAGED_PROJECTS:
-                handle_unmanaged_project(configuration, project, classes)
-            else:
-                process_project(
-                    configuration,
-                    project,
-                    classes,
-                    manage_endpoints,
-                    manage_homeprojects,
-                    manage_privatevolumetypes,
-                    manage_defaultvolumetype,
-                    manage_privateflavors,
-                )
-
-        cache_images(configuration, domain)
-
-    else:
-        logger.info("Processing all domains")
-        domains = configuration.os_cloud.list_domains()
-
-        for domain in domains:
+        with domain_context(configuration, domain):
             logger.info(f"{domain.name} - domain_id = {domain.id}")
 
-            for project in configuration.os_cloud.list_projects(domain_id=domain.id):
-                logger.info(f"{project.name} - project_id = {project.id}")
+            for project in list_projects(configuration, domain):
+                if not in_shard(configuration, project.id):
+                    continue
+                if is_completed(configuration, project):
+                    continue
                 if "quotaclass" not in project and project.domain_id != "default":
                     logger.info(f"{project.name} - skipping project without quotaclass")
+                    configuration.metrics.projects_skipped += 1
                     continue
                 if (
                     project.domain_id == "default"
@@ -1595,8 +2729,66 @@ def run(
                         manage_defaultvolumetype,
                         manage_privateflavors,
                     )
+                complete_project(configuration, project)
+
+            # the image cache of a domain is managed by one of the shards
+            if in_shard(configuration, domain.id):
+                with phase_context(configuration, "image_cache"):
+                    cache_images(configuration, domain)
+
+    else:
+        logger.info("Processing all domains")
+        domains = list_domains(configuration)
+
+        for domain in domains:
+            if (
+                configuration.checkpoint
+                and domain.id in configuration.checkpoint.domains
+            ):
+                logger.info(
+                    f"{domain.name} - completed before the checkpoint, skipping"
+                )
+                continue
 
-            cache_images(configuration, domain)
+            with domain_context(configuration, domain):
+                logger.info(f"{domain.name} - domain_id = {domain.id}")
+
+                for project in list_projects(configuration, domain):
+                    if not in_shard(configuration, project.id):
+                        continue
+                    if is_completed(configuration, project):
+                        continue
+                    logger.info(f"{project.name} - project_id = {project.id}")
+                    if "quotaclass" not in project and project.domain_id != "default":
+                        logger.info(
+                            f"{project.name} - skipping project without quotaclass"
+                        )
+                        configuration.metrics.projects_skipped += 1
+                        continue
+                    if (
+                        project.domain_id == "default"
+                        and project.name in UNMANAGED_PROJECTS
+                    ):
+                        handle_unmanaged_project(configuration, project, classes)
+                    else:
+                        process_project(
+                            configuration,
+                            project,
+                            classes,
+                            manage_endpoints,
+                            manage_homeprojects,
+                            manage_privatevolumetypes,
+                            manage_defaultvolumetype,
+                            manage_privateflavors,
+                        )
+                    complete_project(configuration, project)
+
+                if in_shard(configuration, domain.id):
+                    with phase_context(configuration, "image_cache"):
+                        cache_images(configuration, domain)
+
+            if configuration.checkpoint:
+                configuration.checkpoint.complete_domain(domain.id)
 
 
 def main() -> None:
@@ -4,19 +4,20 @@ from pathlib import Path
 import re
 import sys
 
-from dynaconf import Dynaconf
-import ldap
 from loguru import logger
-import openstack
 import typer
 from typing_extensions import Annotated
 from typing import Optional
 
+from openstack_project_manager import clients
+
 # Default roles to be assigned to a new user for a project
 DEFAULT_ROLES = ["member", "load-balancer_member"]
 
 
 def get_settings(domain_name: str):
+    from dynaconf import Dynaconf
+
     # NOTE: This toxdir thing is super hacky, but works that way for us for now.
     toxdir = Path(__file__).parents[1]
     settings = Dynaconf(
@@ -36,6 +37,13 @@ def run(
     cloud_name: Annotated[
         str, typer.Option("--cloud", help="Cloud name in clouds.yml")
     ] = "admin",
+    inventory_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--inventory",
+            help="Look up the users and projects of the domain in a local SQLite inventory",
+        ),
+    ] = None,
     domain_name: Annotated[
         str, typer.Option("--domain", help="Domain to be managed")
     ] = "default",
@@ -108,18 +116,24 @@ def run(
 
     # get ldap information
 
+    import ldap
+
     conn = ldap.initialize(ldap_server)
     conn.simple_bind_s(ldap_username, ldap_password)
 
     # check openstack projects
 
-    os_cloud = openstack.connect(cloud=cloud_name)
+    os_cloud = clients.connect(cloud_name)
     domain = os_cloud.identity.find_domain(domain_name)
 
+    inventory = None
+    if inventory_file:
+        from openstack_project_manager.inventory import Inventory
+
+        inventory = Inventory(inventory_file)
+
     # cache roles
-    CACHE_ROLES = {}
-    for role in os_cloud.identity.roles():
-        CACHE_ROLES[role.name] = role
+    CACHE_ROLES = clients.get_roles(os_cloud)
 
     # handle project groups
     search_filter = (
@@ -132,8 +146,8 @@ def run(
     for a, b in result:
         m = re.search(rf"cn={ldap_project_group_prefix}(\w+),", a)
         if m:
-            project = os_cloud.identity.find_project(
-                f"{domain.name}-{m.group(1)}", domain_id=domain.id
+            project = clients.find_project(
+                os_cloud, f"{domain.name}-{m.group(1)}", domain.id, inventory
             )
             if not project:
                 logger.warning(f"Create project {domain.name}-{m.group(1)} first")
@@ -142,7 +156,7 @@ def run(
                     username = x.decode("utf-8")
 
                     logger.debug(f"Checking user {username}")
-                    user = os_cloud.identity.find_user(username, domain_id=domain.id)
+                    user = clients.find_user(os_cloud, username, domain.id, inventory)
 
                     if not user:
                         logger.warning(f"User {username} not found")
@@ -175,13 +189,13 @@ def run(
             username = x.decode("utf-8")
 
             logger.debug(f"Checking user {username}")
-            user = os_cloud.identity.find_user(username, domain_id=domain.id)
+            user = clients.find_user(os_cloud, username, domain.id, inventory)
 
             if not user:
                 logger.warning(f"User {username} not found")
                 continue
 
-            for project in os_cloud.identity.projects(domain_id=domain.id):
+            for project in clients.list_projects(os_cloud, domain.id, inventory):
                 logger.info(
                     f"{project.name} - ensure admin project permissions for user = {username}, user_id = {user.id}"
                 )
@@ -196,6 +210,9 @@ def run(
 
     conn.unbind_s()
 
+    if inventory:
+        inventory.close()
+
 
 def main() -> None:
     typer.run(run)
@@ -0,0 +1,225 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import contextlib
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from openstack_project_manager import apistats
+
+if TYPE_CHECKING:
+    from openstack_project_manager.workqueue import WorkQueue
+
+PREFIX = "openstack_project_manager"
+
+# quantiles of the API latencies in the textfile
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class RunMetrics:
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.success = True
+
+        self.projects_processed = 0
+        self.projects_skipped = 0
+        self.projects_failed = 0
+
+        # duration in seconds by domain name
+        self.domains: Dict[str, float] = {}
+
+        # reconciles of the daemon by result and the time of the last one
+        self.reconciles = {"succeeded": 0, "failed": 0}
+        self.last_reconcile = 0.0
+
+    @contextlib.contextmanager
+    def project(self) -> Iterator[None]:
+        try:
+            yield
+        except BaseException:
+            self.projects_failed += 1
+            raise
+        self.projects_processed += 1
+
+    @contextlib.contextmanager
+    def reconcile(self) -> Iterator[None]:
+        try:
+            yield
+        except BaseException:
+            self.reconciles["failed"] += 1
+            raise
+        else:
+            self.reconciles["succeeded"] += 1
+        finally:
+            self.last_reconcile = time.time()
+
+    @contextlib.contextmanager
+    def domain(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.domains[name] = time.monotonic() - start
+
+    def get_textfile(
+        self,
+        api_stats: Optional[apistats.ApiStats] = None,
+        work_queue: Optional["WorkQueue"] = None,
+    ) -> str:
+        lines: List[str] = []
+
+        def add(name: str, kind: str, help: str, samples: list) -> None:
+            lines.append(f"# HELP {PREFIX}_{name} {help}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{PREFIX}_{name}{suffix}{format_labels(labels)} {value}")
+
+        # NOTE: The daemon has no runs, the series of the last run are replaced
+        #       by the reconciles of the daemon.
+        if work_queue is None:
+            add(
+                "run_duration_seconds",
+                "gauge",
+                "Duration of the last reconcile run.",
+                [("", {}, f"{time.monotonic() - self.start:.3f}")],
+            )
+            add(
+                "run_timestamp_seconds",
+                "gauge",
+                "Time the last reconcile run finished.",
+                [("", {}, f"{time.time():.3f}")],
+            )
+            add(
+                "run_success",
+                "gauge",
+                "Whether the last reconcile run finished without errors.",
+                [("", {}, int(self.success))],
+            )
+            add(
+                "projects",
+                "gauge",
+                "Projects of the last reconcile run by state.",
+                [
+                    ("", {"state": "processed"}, self.projects_processed),
+                    ("", {"state": "skipped"}, self.projects_skipped),
+                    ("", {"state": "failed"}, self.projects_failed),
+                ],
+            )
+            add(
+                "domain_duration_seconds",
+                "gauge",
+                "Duration of the domains of the last reconcile run.",
+                [
+                    ("", {"domain": name}, f"{duration:.3f}")
+                    for name, duration in sorted(self.domains.items())
+                ],
+            )
+
+        if api_stats:
+            add(
+                "mutations",
+                "gauge",
+                "Mutating API calls of the last reconcile run by phase.",
+                [
+                    ("", {"phase": phase}, count)
+                    for phase, count in sorted(api_stats.get_mutations().items())
+                ],
+            )
+
+            samples: list = []
+            for service, latencies in sorted(api_stats.get_latencies(0).items()):
+                for quantile in QUANTILES:
+                    samples.append(
+                        (
+                            "",
+                            {"service": service, "quantile": str(quantile)},
+                            f"{apistats.get_quantile(latencies, quantile):.6f}",
+                        )
+                    )
+                samples.append(("_sum", {"service": service}, f"{sum(latencies):.6f}"))
+                samples.append(("_count", {"service": service}, len(latencies)))
+            add(
+                "api_latency_seconds",
+                "summary",
+                "Latency of the API calls of the last reconcile run by service.",
+                samples,
+            )
+
+        if work_queue:
+            with work_queue.condition:
+                depth = len(work_queue.pending)
+                events = [
+                    ("", {"state": "received"}, work_queue.received),
+                    ("", {"state": "coalesced"}, work_queue.coalesced),
+                    ("", {"state": "processed"}, work_queue.processed),
+                ]
+                latencies = sorted(work_queue.latencies)
+                latency_sum = work_queue.latency_sum
+
+            add(
+                "reconciles_total",
+                "counter",
+                "Projects reconciled by the daemon by result.",
+                [("", {"result": k}, v) for k, v in self.reconciles.items()],
+            )
+            add(
+                "last_reconcile_timestamp_seconds",
+                "gauge",
+                "Time the daemon finished its last reconcile.",
+                [("", {}, f"{self.last_reconcile:.3f}")],
+            )
+            add(
+                "queue_depth",
+                "gauge",
+                "Projects waiting in the work queue of the daemon.",
+                [("", {}, depth)],
+            )
+            add(
+                "queue_events_total",
+                "counter",
+                "Notifications of the work queue of the daemon by state.",
+                events,
+            )
+            add(
+                "queue_latency_seconds",
+                "summary",
+                "Time from the first notification of a project to its reconcile.",
+                [
+                    (
+                        "",
+                        {"quantile": str(quantile)},
+                        f"{apistats.get_quantile(latencies, quantile):.6f}",
+                    )
+                    for quantile in (QUANTILES if latencies else [])
+                ]
+                + [
+                    ("_sum", {}, f"{latency_sum:.6f}"),
+                    ("_count", {}, events[2][2]),
+                ],
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(
+        self,
+        path: Path,
+        api_stats: Optional[apistats.ApiStats] = None,
+        work_queue: Optional["WorkQueue"] = None,
+    ) -> None:
+        # NOTE: The node_exporter may read the file at any time, it is written to
+        #       a temporary file next to it and renamed to never expose a partial file.
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.get_textfile(api_stats, work_queue))
+        os.replace(tmp, path)
@@ -0,0 +1,76 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import sys
+from typing import List
+
+import typer
+
+from openstack_project_manager import (
+    clients,
+    create,
+    create_endpoint_groups,
+    create_ldap,
+    create_user,
+    daemon,
+    manage,
+    manage_ldap,
+    simulate,
+)
+
+# separator between chained commands
+CHAIN_SEPARATOR = "+"
+
+app = typer.Typer(
+    no_args_is_help=True,
+    help=(
+        f"Manage OpenStack projects. Commands can be chained with '{CHAIN_SEPARATOR}', e.g. "
+        f"'opm create --name x {CHAIN_SEPARATOR} manage --name default-x'. Chained commands run "
+        "in one process and share the authenticated connection, the role cache and the quota classes."
+    ),
+)
+
+app.command("create", help="Create a domain or project")(create.run)
+app.command("create-endpoint-groups", help="Create endpoint groups for all services")(
+    create_endpoint_groups.run
+)
+app.command("create-ldap", help="Create projects for LDAP users")(create_ldap.run)
+app.command("create-user", help="Create a user for a project")(create_user.run)
+app.command("daemon", help="Reconcile projects on keystone notifications")(daemon.run)
+app.command("manage", help="Reconcile projects with their quota classes")(manage.run)
+app.command("manage-ldap", help="Manage project permissions of LDAP groups")(
+    manage_ldap.run
+)
+app.command("simulate", help="Simulate changes of the quota classes offline")(
+    simulate.run
+)
+
+
+def split_chain(args: List[str]) -> List[List[str]]:
+    commands: List[List[str]] = [[]]
+    for arg in args:
+        if arg == CHAIN_SEPARATOR:
+            commands.append([])
+        else:
+            commands[-1].append(arg)
+
+    return [x for x in commands if x]
+
+
+def run_chain(args: List[str]) -> None:
+    clients.RUNTIME = clients.Runtime()
+
+    for command in split_chain(args) or [[]]:
+        try:
+            app(args=command, prog_name="opm")
+        except SystemExit as e:
+            # NOTE: Every command ends with SystemExit, only stop the chain on errors.
+            if e.code:
+                raise
+
+
+def main() -> None:
+    run_chain(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
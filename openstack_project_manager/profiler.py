@@ -0,0 +1,188 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import contextlib
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# interval of the stack sampler in seconds
+SAMPLE_INTERVAL = 0.005
+
+# number of rows in the report of the slowest projects
+TOP_PROJECTS = 10
+
+
+class Timer:
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.wall_max = 0.0
+
+    def add(self, wall: float, cpu: float) -> None:
+        self.calls += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.wall_max = max(self.wall_max, wall)
+
+
+@contextlib.contextmanager
+def measure(timer: Timer) -> Iterator[None]:
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield
+    finally:
+        timer.add(time.perf_counter() - wall, time.process_time() - cpu)
+
+
+class Sampler(threading.Thread):
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stopped = threading.Event()
+
+        # number of samples by collapsed stack
+        self.stacks: Dict[str, int] = {}
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            stack = []
+            while frame:
+                stack.append(
+                    f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+                )
+                frame = frame.f_back
+
+            if stack:
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+    def write(self, path: Path) -> None:
+        with open(path, "w") as fp:
+            for stack, count in sorted(self.stacks.items()):
+                fp.write(f"{stack} {count}\n")
+
+
+class Profiler:
+
+    def __init__(self, output: Optional[Path] = None):
+        self.output = output
+
+        # timers by project, by phase and by (project, phase)
+        self.projects: Dict[str, Timer] = {}
+        self.phases: Dict[str, Timer] = {}
+        self.project_phases: Dict[Tuple[str, str], Timer] = {}
+
+        self.current_project = ""
+
+        # NOTE: A .prof output is written by cProfile and can be read with pstats
+        #       or snakeviz, every other output gets collapsed stacks of a sampler
+        #       that can be turned into a flame graph.
+        self.cprofile = None
+        self.sampler: Optional[Sampler] = None
+        if output and output.suffix == ".prof":
+            import cProfile
+
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        elif output:
+            self.sampler = Sampler(threading.get_ident())
+            self.sampler.start()
+
+    @contextlib.contextmanager
+    def project(self, name: str) -> Iterator[None]:
+        self.current_project = name
+        try:
+            with measure(self.projects.setdefault(name, Timer())):
+                yield
+        finally:
+            self.current_project = ""
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        key = (self.current_project, name)
+        with measure(self.phases.setdefault(name, Timer())):
+            with measure(self.project_phases.setdefault(key, Timer())):
+                yield
+
+    def stop(self) -> None:
+        if self.cprofile:
+            self.cprofile.disable()
+            if self.output:
+                self.cprofile.dump_stats(self.output)
+        elif self.sampler:
+            self.sampler.stop()
+            if self.output:
+                self.sampler.write(self.output)
+
+    def report(self) -> str:
+        from tabulate import tabulate
+
+        projects: List[list] = []
+        for name, timer in sorted(
+            self.projects.items(), key=lambda x: x[1].wall, reverse=True
+        )[:TOP_PROJECTS]:
+            slowest = max(
+                [(t.wall, p) for (n, p), t in self.project_phases.items() if n == name],
+                default=(0.0, ""),
+            )
+            projects.append([name, f"{timer.wall:.3f}", f"{timer.cpu:.3f}", slowest[1]])
+
+        phases: List[list] = []
+        for name, timer in sorted(
+            self.phases.items(), key=lambda x: x[1].wall, reverse=True
+        ):
+            slowest = max(
+                [
+                    (t.wall_max, n)
+                    for (n, p), t in self.project_phases.items()
+                    if p == name
+                ],
+                default=(0.0, ""),
+            )
+            phases.append(
+                [
+                    name,
+                    timer.calls,
+                    f"{timer.wall:.3f}",
+                    f"{timer.cpu:.3f}",
+                    f"{timer.wall / timer.calls * 1000:.1f}",
+                    f"{timer.wall_max * 1000:.1f}",
+                    slowest[1],
+                ]
+            )
+
+        return "\n".join(
+            [
+                tabulate(
+                    projects,
+                    headers=["project", "wall s", "cpu s", "slowest phase"],
+                    tablefmt="psql",
+                ),
+                tabulate(
+                    phases,
+                    headers=[
+                        "phase",
+                        "calls",
+                        "wall s",
+                        "cpu s",
+                        "avg ms",
+                        "max ms",
+                        "slowest project",
+                    ],
+                    tablefmt="psql",
+                ),
+            ]
+        )
@@ -0,0 +1,30 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import hashlib
+from typing import Tuple
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    index, count = (int(x) for x in value.split("/", 1))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(
+            f"shard {value} is not one of 0/{count} to {count - 1}/{count}"
+        )
+    return index, count
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    # NOTE: Jump consistent hash of Lamping and Veach, when the number of shards
+    #       grows, only the keys moving to the new shards change their shard.
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def get_shard(resource_id: str, count: int) -> int:
+    # the built-in hash of strings changes with every process
+    key = int.from_bytes(hashlib.sha256(resource_id.encode()).digest()[:8], "big")
+    return jump_hash(key, count)
@@ -0,0 +1,276 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import collections
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+import typer
+from typing_extensions import Annotated
+
+from openstack_project_manager import classwatch, manage
+
+
+class ProjectItem(dict):
+
+    # check_quota reads the properties of a project as attributes
+    def __getattr__(self, name: str):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def get_properties(project: dict) -> tuple:
+    # the properties the desired quotas of a project depend on besides its class
+    return tuple(
+        sorted(
+            (k, str(v))
+            for k, v in project.items()
+            if k in manage.QUOTA_PROPERTIES or k.startswith("quota_")
+        )
+    )
+
+
+def get_quota_key(project: dict, quotaclass: str) -> tuple:
+    # projects with the same key have the same desired quotas
+    return (quotaclass,) + get_properties(project)
+
+
+def get_desired_quotas(
+    resolved: Dict[str, Optional[dict]], project: dict, quotaclass: str
+) -> Optional[dict]:
+    # check_quota does not change the quotas of a project with a missing class
+    resolved_class = resolved.get(quotaclass)
+    if resolved_class is None:
+        return None
+    return manage.compute_desired_quotas(
+        ProjectItem(project), resolved_class  # type: ignore[arg-type]
+    )
+
+
+def get_changes(
+    old: Optional[dict], new: Optional[dict]
+) -> List[Tuple[str, str, Optional[int], int]]:
+    # NOTE: check_quota writes every quota of the class that differs with its own
+    #       API call, quotas removed from a class are left as they are.
+    changes = []
+    for service, quotas in (new or {}).items():
+        for key, value in quotas.items():
+            old_value = (old or {}).get(service, {}).get(key)
+            if old_value != value:
+                changes.append((service, key, old_value, value))
+    return changes
+
+
+def select_projects(projects: Iterable[dict]) -> List[Tuple[dict, str]]:
+    selected = []
+    seen = set()
+    for project in projects:
+        # the projects of all domains may be stored next to those of one domain
+        if project["id"] in seen:
+            continue
+        seen.add(project["id"])
+
+        quotaclass = classwatch.get_effective_class(project)
+        if quotaclass:
+            selected.append((project, quotaclass))
+    return selected
+
+
+def group_projects(
+    projects: List[Tuple[dict, str]],
+) -> Tuple[List[Tuple[dict, str]], List[int]]:
+    # NOTE: Most projects only differ in their name and ID, the changes are
+    #       computed once for the first project with the same class and
+    #       properties. The index refers every project to its group.
+    groups: Dict[tuple, int] = {}
+    first: List[Tuple[dict, str]] = []
+    index: List[int] = []
+    for project, quotaclass in projects:
+        key = get_quota_key(project, quotaclass)
+        if key not in groups:
+            groups[key] = len(first)
+            first.append((project, quotaclass))
+        index.append(groups[key])
+    return first, index
+
+
+def get_project_changes(
+    projects: List[Tuple[dict, str]],
+    old_classes: Dict[str, Optional[dict]],
+    new_classes: Dict[str, Optional[dict]],
+) -> List[Optional[list]]:
+    result: List[Optional[list]] = []
+    for project, quotaclass in projects:
+        try:
+            result.append(
+                get_changes(
+                    get_desired_quotas(old_classes, project, quotaclass),
+                    get_desired_quotas(new_classes, project, quotaclass),
+                )
+            )
+        except (KeyError, TypeError, ValueError):
+            result.append(None)
+    return result
+
+
+def simulate(
+    projects: Iterable[dict],
+    old_classes: Dict[str, Optional[dict]],
+    new_classes: Dict[str, Optional[dict]],
+    details: bool = True,
+) -> dict:
+    report: dict = {
+        "projects": 0,
+        "changed_projects": 0,
+        "writes": 0,
+        "missing": 0,
+        "errors": 0,
+        "quotas": {},
+        "changes": [],
+    }
+
+    selected = select_projects(projects)
+    report["projects"] = len(selected)
+
+    first, index = group_projects(selected)
+    group_changes = get_project_changes(first, old_classes, new_classes)
+    group_changes = [
+        sorted(x, key=lambda y: (y[0], y[1])) if x else x for x in group_changes
+    ]
+
+    # NOTE: The totals are counted once per group, only the changes of every
+    #       single project for the output and the errors are listed by project.
+    counts = collections.Counter(index)
+    missing: Dict[str, int] = {}
+    quotas: Dict[str, int] = {}
+    for i, ((_, quotaclass), changes) in enumerate(zip(first, group_changes)):
+        count = counts[i]
+        if new_classes.get(quotaclass) is None:
+            missing[quotaclass] = missing.get(quotaclass, 0) + count
+            report["missing"] += count
+
+        if changes is None:
+            report["errors"] += count
+            continue
+        if not changes:
+            continue
+
+        report["changed_projects"] += count
+        report["writes"] += count * len(changes)
+        for service, name, _, _ in changes:
+            quotas[f"{service}.{name}"] = quotas.get(f"{service}.{name}", 0) + count
+    report["quotas"] = dict(sorted(quotas.items()))
+
+    for (project, quotaclass), i in zip(selected, index):
+        changes = group_changes[i]
+        if changes is None:
+            logger.error(f"{project['name']} - could not compute quotas")
+        elif changes and details:
+            report["changes"].append(
+                {
+                    "id": project["id"],
+                    "name": project["name"],
+                    "domain_id": project.get("domain_id"),
+                    "quotaclass": quotaclass,
+                    "changes": [
+                        {"service": x[0], "quota": x[1], "old": x[2], "new": x[3]}
+                        for x in changes
+                    ],
+                }
+            )
+
+    for quotaclass, count in sorted(missing.items()):
+        logger.warning(f"quotaclass {quotaclass} of {count} projects not found")
+
+    return report
+
+
+def run(
+    inventory_file: Annotated[
+        Path,
+        typer.Option(
+            "--inventory",
+            help="SQLite inventory of a previous run with the projects of the cloud",
+        ),
+    ],
+    new_classes: Annotated[
+        list[Path],
+        typer.Option(
+            "--new-classes",
+            help="Path to a changed classes.yml file. May be specified multiple times like --classes",
+        ),
+    ],
+    classes: Annotated[
+        list[Path],
+        typer.Option(
+            "--classes",
+            help=(
+                "Path to a classes.yml file. May be specified multiple times, in which case YAML files will be merged with the latter ones taking precedence "
+                "over previous ones. Non-existent files will be skipped"
+            ),
+        ),
+    ] = [
+        Path("etc/classes.yml"),
+        Path("/opt/configuration/environments/openstack/project-manager/classes.yml"),
+    ],
+    output: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--output", help="Write the changes of every project to a JSON file"
+        ),
+    ] = None,
+) -> None:
+    from tabulate import tabulate
+
+    from openstack_project_manager.inventory import Inventory
+
+    if not inventory_file.is_file():
+        logger.error(f"inventory {inventory_file} not found")
+        raise typer.Exit(1)
+
+    start = time.monotonic()
+    try:
+        inventory = Inventory(inventory_file, readonly=True)
+    except ValueError as e:
+        logger.error(str(e))
+        raise typer.Exit(1)
+
+    try:
+        report = simulate(
+            inventory.items("projects"),
+            classwatch.resolve_classes(classes),
+            classwatch.resolve_classes(new_classes),
+            details=output is not None,
+        )
+    finally:
+        inventory.db.close()
+
+    print(
+        tabulate(
+            [x.split(".", 1) + [y] for x, y in sorted(report["quotas"].items())],
+            headers=["service", "quota", "projects"],
+            tablefmt="psql",
+        )
+    )
+    logger.info(
+        f"{report['changed_projects']} of {report['projects']} projects change with {report['writes']} API writes "
+        f"({time.monotonic() - start:.2f}s)"
+    )
+
+    if output:
+        output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if report["missing"] or report["errors"]:
+        raise typer.Exit(1)
+
+
+def main() -> None:
+    typer.run(run)
+
+
+if __name__ == "__main__":
+    main()
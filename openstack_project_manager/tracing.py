@@ -0,0 +1,166 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+if TYPE_CHECKING:
+    import keystoneauth1.session
+
+SERVICE_NAME = "openstack-project-manager"
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+def format_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    elif isinstance(value, int):
+        return {"intValue": str(value)}
+    elif isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+
+    def __init__(
+        self,
+        trace_id: str,
+        parent: Optional[Span],
+        name: str,
+        kind: int,
+        attributes: Dict[str, Any],
+    ):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else ""
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end = 0
+        self.status: dict = {"code": STATUS_CODE_OK}
+
+    def to_otlp(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [
+                {"key": k, "value": format_value(v)}
+                for k, v in self.attributes.items()
+                if v is not None
+            ],
+            "status": self.status,
+        }
+
+
+class Tracer:
+
+    def __init__(self, path: Path):
+        self.trace_id = os.urandom(16).hex()
+        self.current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+            "span", default=None
+        )
+        self.lock = threading.Lock()
+        self.fp = open(path, "a")
+
+    # NOTE: Every line of the file is a complete OTLP/JSON export request with a
+    #       single span, the format of the file exporter of the OpenTelemetry
+    #       collector. The file can be replayed into a collector or converted for
+    #       a trace viewer, and spans are not lost when the run is interrupted.
+    def export(self, span: Span) -> None:
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                {
+                                    "key": "service.name",
+                                    "value": format_value(SERVICE_NAME),
+                                }
+                            ]
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "openstack_project_manager"},
+                                "spans": [span.to_otlp()],
+                            }
+                        ],
+                    }
+                ]
+            }
+        )
+        with self.lock:
+            self.fp.write(line + "\n")
+
+    @contextlib.contextmanager
+    def span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+    ) -> Iterator[Span]:
+        span = Span(self.trace_id, self.current.get(), name, kind, attributes or {})
+        token = self.current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = {"code": STATUS_CODE_ERROR, "message": repr(e)}
+            raise
+        finally:
+            self.current.reset(token)
+            span.end = time.time_ns()
+            self.export(span)
+
+    def instrument(self, session: keystoneauth1.session.Session) -> None:
+        request = session.request
+
+        # the session is shared by chained commands, instrument it only once
+        if getattr(request, "tracer", None) is self:
+            return
+
+        @functools.wraps(request)
+        def traced_request(url, method, **kwargs):
+            # a chained command may have closed its tracer already
+            if self.fp.closed:
+                return request(url, method, **kwargs)
+
+            endpoint_filter = kwargs.get("endpoint_filter") or {}
+            with self.span(
+                f"{method} {endpoint_filter.get('service_type', '')}".strip(),
+                {
+                    "http.request.method": method,
+                    "url.full": url,
+                    "openstack.service": endpoint_filter.get("service_type"),
+                },
+                SPAN_KIND_CLIENT,
+            ) as span:
+                response = request(url, method, **kwargs)
+                span.attributes["http.response.status_code"] = response.status_code
+                return response
+
+        traced_request.tracer = self  # type: ignore[attr-defined]
+        session.request = traced_request  # type: ignore[method-assign,assignment]
+
+    def close(self) -> None:
+        with self.lock:
+            self.fp.close()
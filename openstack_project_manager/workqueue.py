@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+
+import collections
+import threading
+import time
+from typing import Deque, Dict, Optional, Tuple
+
+# seconds a project waits for further notifications before it is reconciled
+DEFAULT_DEBOUNCE = 5.0
+
+# seconds a project with a steady stream of notifications waits at most
+DEFAULT_MAX_DELAY = 60.0
+
+# pending projects before the producer is blocked
+DEFAULT_MAX_SIZE = 10000
+
+# latencies kept for the quantiles of the metrics
+LATENCY_WINDOW = 1000
+
+
+class WorkQueue:
+
+    def __init__(
+        self,
+        debounce: float = DEFAULT_DEBOUNCE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_size = max_size
+
+        self.condition = threading.Condition()
+        self.closed = False
+
+        # time of the first pending notification and due time by key
+        self.pending: Dict[str, Tuple[float, float]] = {}
+
+        self.received = 0
+        self.coalesced = 0
+        self.processed = 0
+        self.latency_sum = 0.0
+        self.latencies: Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def put(self, key: str, block: bool = True) -> None:
+        # NOTE: A burst of notifications for the same key, e.g. the property
+        #       updates of a new project, is coalesced into one work item. Every
+        #       notification moves the due time, but never beyond the max delay.
+        with self.condition:
+            now = time.monotonic()
+            self.received += 1
+
+            if key in self.pending:
+                first, _ = self.pending[key]
+                self.pending[key] = (
+                    first,
+                    min(now + self.debounce, first + self.max_delay),
+                )
+                self.coalesced += 1
+                return
+
+            # NOTE: The memory of the queue is bounded, the producer waits for the
+            #       worker. The worker itself enqueues without waiting for itself.
+            while block and len(self.pending) >= self.max_size and not self.closed:
+                self.condition.wait()
+
+            self.pending[key] = (now, now + self.debounce)
+            self.condition.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        # the next due key, None on timeout or when the queue is closed and empty
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                now = time.monotonic()
+
+                wait: Optional[float] = None
+                if self.pending:
+                    key = min(self.pending, key=lambda x: self.pending[x][1])
+                    first, due = self.pending[key]
+
+                    # a closed queue is drained without waiting
+                    if due <= now or self.closed:
+                        del self.pending[key]
+                        self.processed += 1
+                        self.latency_sum += now - first
+                        self.latencies.append(now - first)
+                        self.condition.notify_all()
+                        return key
+                    wait = due - now
+                elif self.closed:
+                    return None
+
+                if deadline is not None:
+                    if deadline <= now:
+                        return None
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self.condition.wait(wait)
+
+    @property
+    def done(self) -> bool:
+        with self.condition:
+            return self.closed and not self.pending
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
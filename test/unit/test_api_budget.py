@@ -0,0 +1,171 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import typer
+import yaml
+from typer.testing import CliRunner
+
+from openstack_project_manager.apistats import ApiStats
+from openstack_project_manager.fakecloud import FakeCloud
+from openstack_project_manager.manage import run
+
+app = typer.Typer()
+app.command()(run)
+
+# numbers of projects in the domain of the measured runs
+SIZES = [1, 10, 100]
+
+# NOTE: Upper bound of the API calls of a phase as (calls per project, calls per
+#       domain). A phase with calls that grow faster than linear with the number
+#       of projects, e.g. a list call in a loop over the resources of a class,
+#       exceeds the budget of the larger runs. Lower the budgets when a phase gets
+#       cheaper, raise them only with a good reason.
+BUDGETS = {
+    "other": (1, 8),
+    "quota": (18, 1),
+    "bandwidth": (16, 0),
+    "endpoints": (6, 0),
+    "homeproject": (4, 0),
+    "rbac": (6, 0),
+    "images": (7, 1),
+    "network": (15, 0),
+    "volume_types": (2, 0),
+    # two private volume types and flavors of the domain
+    "private_volume_types": (7, 0),
+    "default_volume_type": (4, 1),
+    "flavors": (3, 0),
+    "private_flavors": (5, 0),
+    "image_cache": (0, 3),
+}
+
+CLASSES = """
+---
+default:
+  compute:
+    cores: 0
+    instances: 0
+  network:
+    network: 0
+    router: 0
+  volume:
+    gigabytes: 0
+    volumes: 0
+
+basic:
+  parent: default
+  compute:
+    cores: 4
+    instances: -1
+  network:
+    network: 1
+    router: 0
+  volume:
+    gigabytes: 20
+    volumes: 4
+  bandwidth:
+    egress: 1000
+    egress_burst: 100
+  flavors:
+    - SCS-2V-4
+    - SCS-4V-8
+  volume_types:
+    - ssd
+  default_volume_type: ssd
+"""
+
+ENDPOINTS = """
+---
+default:
+  - nova
+orchestration:
+  - heat
+"""
+
+
+def measure(projects: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir, FakeCloud(seed=0) as cloud:
+        admin = cloud.find("projects", "admin")
+        cloud.add_network("public", admin["id"], external=True)
+
+        domain = cloud.add_domain("test")
+        images = cloud.add_project("test-images", domain["id"])
+        cloud.add_image("Ubuntu 24.04", images["id"])
+        for name in ["SCS-2V-4", "SCS-4V-8", "test-gpu1", "test-gpu2"]:
+            cloud.add_flavor(name, is_public=False)
+        for name in ["ssd", "test-ssd1", "test-ssd2"]:
+            cloud.add_volume_type(name, is_public=False)
+        for name in ["nova-public", "nova-internal", "heat-public", "heat-internal"]:
+            cloud.add_endpoint_group(name)
+
+        for index in range(projects):
+            cloud.add_user(f"user{index}", domain["id"])
+            cloud.add_project(
+                f"test-user{index}",
+                domain["id"],
+                quotaclass="basic",
+                has_public_network="True",
+                has_shared_images="True",
+                managed_network_resources="True",
+            )
+
+        path = Path(tmpdir)
+        (path / "clouds.yml").write_text(yaml.dump(cloud.get_clouds_yaml()))
+        (path / "classes.yml").write_text(CLASSES)
+        (path / "endpoints.yml").write_text(ENDPOINTS)
+
+        with patch.dict(
+            os.environ, {"OS_CLIENT_CONFIG_FILE": str(path / "clouds.yml")}
+        ), patch.object(ApiStats, "report", autospec=True, return_value="") as report:
+            result = CliRunner().invoke(
+                app,
+                [
+                    "--cloud=fakecloud",
+                    f"--classes={path / 'classes.yml'}",
+                    f"--endpoints={path / 'endpoints.yml'}",
+                    "--manage-endpoints",
+                    "--manage-homeprojects",
+                    "--domain=test",
+                    "--api-report",
+                ],
+            )
+            assert result.exit_code == 0, (result, result.stdout)
+
+    # calls by phase of the api stats of the run
+    calls: dict = {}
+    for (_, _, _, phase), latencies in report.call_args[0][0].calls.items():
+        calls[phase] = calls.get(phase, 0) + len(latencies)
+    return calls
+
+
+class TestApiBudget(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.calls = {projects: measure(projects) for projects in SIZES}
+
+    def test_budget(self):
+        for projects, calls in self.calls.items():
+            for phase, count in calls.items():
+                with self.subTest(projects=projects, phase=phase):
+                    self.assertIn(phase, BUDGETS, "phase without a budget")
+                    per_project, per_domain = BUDGETS[phase]
+                    self.assertLessEqual(count, per_project * projects + per_domain)
+
+    def test_phases(self):
+        # every phase of the budget is measured, a budget of a phase that is no
+        # longer called would hide a phase that was renamed
+        for calls in self.calls.values():
+            assert set(calls) == set(BUDGETS)
+
+    def test_flavors(self):
+        # one list call for all flavors of the quotaclass and one call to add
+        # the access to each of them
+        for projects, calls in self.calls.items():
+            assert calls["flavors"] == 3 * projects
+
+
+if __name__ == "__main__":
+    unittest.main()
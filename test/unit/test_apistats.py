@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import MagicMock
+
+from openstack_project_manager import apistats
+from openstack_project_manager.apistats import ApiStats, get_endpoint_template
+
+
+class TestApiStats(unittest.TestCase):
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.request = self.session.request
+
+    def test_get_endpoint_template(self):
+        assert (
+            get_endpoint_template(
+                "https://compute.example.com/v2.1/os-quota-sets/0123456789abcdef0123456789abcdef"
+            )
+            == "/v2.1/os-quota-sets/{id}"
+        )
+        assert (
+            get_endpoint_template(
+                "/v2.0/networks/6f0b0a2a-5a6d-4d1c-9a5e-2b9d7e6e3c1f/"
+            )
+            == "/v2.0/networks/{id}"
+        )
+        assert get_endpoint_template("/flavors/42/os-flavor-access") == (
+            "/flavors/{id}/os-flavor-access"
+        )
+
+    def test_instrument(self):
+        api_stats = apistats.instrument(self.session)
+
+        self.session.request(
+            "/projects", "GET", endpoint_filter={"service_type": "identity"}
+        )
+        with apistats.phase("quota"):
+            self.session.request(
+                "/os-quota-sets/1", "PUT", endpoint_filter={"service_type": "compute"}
+            )
+        self.session.request("https://keystone/v3/auth/tokens", "POST")
+
+        self.request.assert_called_with("https://keystone/v3/auth/tokens", "POST")
+        assert set(api_stats.calls) == {
+            ("identity", "GET", "/projects", "other"),
+            ("compute", "PUT", "/os-quota-sets/{id}", "quota"),
+            ("identity", "POST", "/v3/auth/tokens", "other"),
+        }
+        # issuing a token does not change any resource
+        assert api_stats.get_mutations() == {"quota": 1}
+
+        # the session is instrumented only once
+        assert apistats.instrument(self.session) is api_stats
+
+    def test_instrument_error(self):
+        api_stats = apistats.instrument(self.session)
+        self.request.side_effect = Exception("connection refused")
+
+        with self.assertRaises(Exception):
+            self.session.request("/servers", "GET")
+
+        assert api_stats.calls[("unknown", "GET", "/servers", "other")]
+
+    def test_report(self):
+        api_stats = ApiStats()
+        for latency in [0.1, 0.2, 0.3]:
+            api_stats.record("network", "get", "/v2.0/quotas/1", "quota", latency)
+        api_stats.record("compute", "get", "/flavors/1", "flavors", 0.4)
+
+        report = api_stats.report()
+
+        assert (
+            "| network   | GET      | /v2.0/quotas/{id} | quota   |       3 |" in report
+        )
+        assert "total" in report
+        assert api_stats.get_latencies(0) == {
+            "network": [0.1, 0.2, 0.3],
+            "compute": [0.4],
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from typer.testing import CliRunner
+import typer
+
+from openstack_project_manager.benchmark import (
+    compare,
+    get_targets,
+    parse_textfile,
+    run,
+    run_case,
+)
+from openstack_project_manager.fakecloud import FakeCloud, Faults
+from openstack_project_manager.generate_cloud import generate
+
+app = typer.Typer()
+app.command()(run)
+
+ETC = Path(__file__).parents[2] / "etc"
+
+TEXTFILE = """# HELP openstack_project_manager_projects Projects of the last reconcile run by state.
+# TYPE openstack_project_manager_projects gauge
+openstack_project_manager_projects{state="processed"} 3
+openstack_project_manager_projects{state="skipped"} 1
+openstack_project_manager_api_latency_seconds_count{service="compute"} 4
+"""
+
+
+def get_result(projects_per_second, api_calls):
+    return {
+        "profile": "tiny",
+        "mode": "all",
+        "variant": "apply",
+        "projects_per_second": projects_per_second,
+        "api_calls": api_calls,
+        "peak_rss_kb": 1024,
+    }
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_parse_textfile(self):
+        assert parse_textfile(TEXTFILE) == {
+            'openstack_project_manager_projects{state="processed"}': 3.0,
+            'openstack_project_manager_projects{state="skipped"}': 1.0,
+            'openstack_project_manager_api_latency_seconds_count{service="compute"}': 4.0,
+        }
+
+    def test_get_targets(self):
+        state = generate(FakeCloud(seed=1), "tiny", 1).state
+        domain_name, project_name = get_targets(state)
+
+        domain = FakeCloud(state).find("domains", domain_name)
+        project = FakeCloud(state).find("projects", project_name)
+        assert project["domain_id"] == domain["id"]
+        assert project["quotaclass"] == "basic"
+
+    def test_compare(self):
+        previous = {"results": [get_result(10.0, 100)]}
+
+        rows, regressions = compare(previous, {"results": [get_result(9.0, 100)]})
+        assert regressions == 0
+        assert rows[0][5] == "-10.0%"
+
+        # a lower throughput or more API calls are regressions
+        _, regressions = compare(previous, {"results": [get_result(7.0, 100)]})
+        assert regressions == 1
+        _, regressions = compare(previous, {"results": [get_result(12.0, 101)]})
+        assert regressions == 1
+
+        # cases without a previous result are not compared
+        rows, regressions = compare({"results": []}, {"results": [get_result(1, 1)]})
+        assert (rows, regressions) == ([], 0)
+
+    def test_run_case(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            workdir = Path(tmpdir)
+            state_path = workdir / "tiny.json"
+            generate(FakeCloud(seed=1), "tiny", 1).save(state_path)
+
+            result = run_case(
+                state_path,
+                "tiny",
+                "project",
+                "dry-run",
+                ETC / "classes.yml",
+                ETC / "endpoints.yml",
+                workdir,
+            )
+
+        assert result["exit_code"] == 0
+        assert result["projects"] == 1
+        assert result["api_calls"] > 0
+        assert result["peak_rss_kb"] > 0
+
+    def test_run_case_faults(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            workdir = Path(tmpdir)
+            state_path = workdir / "tiny.json"
+            generate(FakeCloud(seed=1), "tiny", 1).save(state_path)
+
+            # the throttled requests are retried and the run completes
+            result = run_case(
+                state_path,
+                "tiny",
+                "project",
+                "apply",
+                ETC / "classes.yml",
+                ETC / "endpoints.yml",
+                workdir,
+                Faults(throttle_rate=0.1, retry_after=0),
+                seed=1,
+                retries=10,
+            )
+
+        assert result["exit_code"] == 0
+        assert result["projects"] > 0
+        assert result["injected_errors"] > 0
+
+    def test_cli_unknown_mode(self):
+        result = CliRunner().invoke(app, ["--mode=everything"])
+        self.assertEqual(result.exit_code, 2, result)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir) / "results.json"
+            result = CliRunner().invoke(
+                app,
+                [
+                    "--size=tiny",
+                    "--mode=project",
+                    "--variant=dry-run",
+                    f"--classes={ETC / 'classes.yml'}",
+                    f"--endpoints={ETC / 'endpoints.yml'}",
+                    f"--output={output}",
+                    f"--compare={output}",
+                ],
+            )
+            # the output is written before it is compared with itself
+            self.assertEqual(result.exit_code, 0, (result, result.stdout))
+
+            report = json.loads(output.read_text())
+            [case] = report["results"]
+            assert (case["profile"], case["mode"], case["variant"]) == (
+                "tiny",
+                "project",
+                "dry-run",
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
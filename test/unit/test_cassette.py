@@ -0,0 +1,146 @@
+import datetime
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import requests
+
+from openstack_project_manager.cassette import (
+    REDACTED,
+    Player,
+    Recorder,
+    redact,
+    redact_body,
+    redact_headers,
+    refresh_token,
+)
+
+
+def make_request(method, url, body=None):
+    return requests.Request(
+        method, url, data=body, headers={"X-Auth-Token": "secret-token"}
+    ).prepare()
+
+
+def make_response(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "OK"
+    response.headers = requests.structures.CaseInsensitiveDict(
+        {"Content-Type": "application/json", "X-Subject-Token": "secret-token"}
+    )
+    response._content = json.dumps(body).encode()
+    return response
+
+
+class TestCassette(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "cassette.json.gz"
+
+    def test_redact(self):
+        body = {
+            "auth": {
+                "identity": {
+                    "methods": ["password", "token"],
+                    "password": {"user": {"name": "admin", "password": "secret"}},
+                    "token": {"id": "secret-token"},
+                }
+            }
+        }
+        assert redact(body) == {
+            "auth": {
+                "identity": {
+                    "methods": ["password", "token"],
+                    "password": {"user": {"name": "admin", "password": REDACTED}},
+                    "token": {"id": REDACTED},
+                }
+            }
+        }
+        assert redact([{"secret": "x", "id": "y"}]) == [{"secret": REDACTED, "id": "y"}]
+
+    def test_redact_headers(self):
+        assert redact_headers({"X-Auth-Token": "x", "Accept": "application/json"}) == {
+            "X-Auth-Token": REDACTED,
+            "Accept": "application/json",
+        }
+
+    def test_redact_body(self):
+        assert redact_body(None) == ""
+        assert redact_body(b"not json") == "not json"
+        assert json.loads(redact_body(b'{"password": "x"}')) == {"password": REDACTED}
+
+    def test_record_replay(self):
+        recorder = Recorder(self.path, 1)
+        recorder.adapter = MagicMock()
+        recorder.adapter.send.side_effect = [
+            make_response(200, {"project": {"id": "1", "name": "first"}}),
+            make_response(200, {"project": {"id": "1", "name": "second"}}),
+            make_response(201, {"user": {"password": "secret"}}),
+        ]
+
+        url = "http://cloud.example.com/identity/v3/projects/1"
+        for _ in range(2):
+            recorder.send(make_request("GET", url))
+        response = recorder.send(
+            make_request(
+                "POST",
+                "http://cloud.example.com/identity/v3/users",
+                json.dumps({"user": {"password": "secret"}}),
+            )
+        )
+        recorder.close()
+
+        # the caller still gets the complete response
+        assert response.json() == {"user": {"password": "secret"}}
+
+        content = gzip.open(self.path, "rt").read()
+        assert "secret" not in content
+
+        player = Player(self.path, latency=False)
+
+        # repeated requests get the recorded responses in turn, the last one
+        # is repeated
+        for name in ["first", "second", "second"]:
+            response = player.send(make_request("GET", url))
+            assert response.status_code == 200
+            assert response.json()["project"]["name"] == name
+            assert response.headers["X-Subject-Token"] == REDACTED
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            player.send(make_request("DELETE", url))
+
+    def test_refresh_token(self):
+        body = json.dumps(
+            {
+                "token": {
+                    "issued_at": "2020-01-01T00:00:00.000000Z",
+                    "expires_at": "2020-01-02T00:00:00.000000Z",
+                }
+            }
+        )
+        token = json.loads(refresh_token(body))["token"]
+
+        issued_at = datetime.datetime.fromisoformat(token["issued_at"][:-1])
+        expires_at = datetime.datetime.fromisoformat(token["expires_at"][:-1])
+        assert expires_at - issued_at == datetime.timedelta(days=1)
+        assert expires_at > datetime.datetime.utcnow()
+
+        assert refresh_token("not json") == "not json"
+        assert refresh_token('{"error": {}}') == '{"error": {}}'
+
+    def test_player_version(self):
+        with gzip.open(self.path, "wt") as fp:
+            fp.write(json.dumps({"version": 0}) + "\n")
+
+        with self.assertRaises(ValueError):
+            Player(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from openstack_project_manager.checkpoint import Checkpoint, get_config_hash
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "checkpoint.jsonl"
+
+    def test_get_config_hash(self):
+        classes = Path(self.tmpdir.name) / "classes.yml"
+        classes.write_text("basic: {}\n")
+
+        config_hash = get_config_hash({"dry_run": False}, [classes])
+        assert config_hash == get_config_hash({"dry_run": False}, [classes])
+        assert config_hash != get_config_hash({"dry_run": True}, [classes])
+
+        # a changed classes file is another configuration
+        classes.write_text("basic: {compute: {cores: 1}}\n")
+        assert config_hash != get_config_hash({"dry_run": False}, [classes])
+
+    def test_resume(self):
+        checkpoint = Checkpoint(self.path, "abc")
+        checkpoint.complete_project("p1")
+        checkpoint.complete_domain("d1")
+        checkpoint.close()
+
+        checkpoint = Checkpoint(self.path, "abc", resume=True)
+        self.addCleanup(checkpoint.close)
+        assert checkpoint.projects == {"p1"}
+        assert checkpoint.domains == {"d1"}
+
+    def test_no_resume(self):
+        Checkpoint(self.path, "abc").complete_project("p1")
+
+        checkpoint = Checkpoint(self.path, "abc")
+        self.addCleanup(checkpoint.close)
+        assert not checkpoint.projects
+
+    def test_config_hash(self):
+        checkpoint = Checkpoint(self.path, "abc")
+        checkpoint.complete_project("p1")
+        checkpoint.close()
+
+        checkpoint = Checkpoint(self.path, "def", resume=True)
+        self.addCleanup(checkpoint.close)
+        assert not checkpoint.projects
+
+    def test_incomplete(self):
+        checkpoint = Checkpoint(self.path, "abc")
+        checkpoint.complete_project("p1")
+        checkpoint.close()
+        with open(self.path, "a") as fp:
+            fp.write('{"proj')
+
+        # the incomplete line of the interrupted run is dropped
+        checkpoint = Checkpoint(self.path, "abc", resume=True)
+        checkpoint.complete_project("p2")
+        checkpoint.close()
+
+        lines = [json.loads(x) for x in self.path.read_text().splitlines()]
+        assert lines[1:] == [{"project": "p1"}, {"project": "p2"}]
+
+    def test_missing(self):
+        checkpoint = Checkpoint(self.path, "abc", resume=True)
+        assert not checkpoint.projects
+
+        checkpoint.remove()
+        assert not self.path.exists()
+
+
+if __name__ == "__main__":
+    unittest.main()
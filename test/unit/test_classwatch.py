@@ -0,0 +1,108 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from openstack_project_manager.classwatch import (
+    ClassWatcher,
+    get_changed_classes,
+    get_class_index,
+    resolve_classes,
+)
+
+CLASSES = """
+---
+default:
+  compute:
+    cores: 0
+    instances: 0
+
+basic:
+  parent: default
+  compute:
+    cores: 4
+
+service:
+  compute:
+    cores: -1
+"""
+
+
+class TestClassWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "classes.yml"
+        self.path.write_text(CLASSES)
+
+    def test_resolve_classes(self):
+        resolved = resolve_classes([self.path, Path(self.tmpdir.name) / "missing.yml"])
+        assert resolved["basic"] == {"compute": {"cores": 4, "instances": 0}}
+        assert set(resolved) == {"default", "basic", "service"}
+
+    def test_get_changed_classes(self):
+        old = resolve_classes([self.path])
+
+        # a changed parent changes the classes inheriting from it
+        self.path.write_text(CLASSES.replace("instances: 0", "instances: 1"))
+        assert get_changed_classes(old, resolve_classes([self.path])) == {
+            "default",
+            "basic",
+        }
+
+        # an overwritten value of the parent does not change the child
+        self.path.write_text(CLASSES.replace("cores: 0", "cores: 1"))
+        assert get_changed_classes(old, resolve_classes([self.path])) == {"default"}
+
+        # removed and added classes
+        self.path.write_text(CLASSES.replace("service:", "other:"))
+        assert get_changed_classes(old, resolve_classes([self.path])) == {
+            "service",
+            "other",
+        }
+
+    def test_get_class_index(self):
+        index = get_class_index(
+            [
+                {"id": "p1", "name": "project1", "quotaclass": "basic"},
+                {"id": "p2", "name": "project2", "quotaclass": "basic"},
+                {"id": "p3", "name": "service", "quotaclass": "default"},
+                {"id": "p4", "name": "project4"},
+                {"id": "p5", "name": "admin", "domain_id": "default"},
+                {"id": "p6", "name": "project6", "quotaclass": "basic", "unmanaged": 1},
+                {"id": "p1", "name": "project1", "quotaclass": "basic"},
+            ]
+        )
+        assert index == {"basic": {"p1", "p2"}, "service": {"p3"}, "admin": {"p5"}}
+
+    def test_check(self):
+        watcher = ClassWatcher([self.path], interval=0)
+        assert watcher.check() == set()
+
+        self.path.write_text(CLASSES.replace("cores: 4", "cores: 8"))
+        assert watcher.check() == {"basic"}
+        assert watcher.check() == set()
+
+        # invalid classes are ignored until the next change
+        self.path.write_text(CLASSES + "\n  invalid: [")
+        assert watcher.check() == set()
+        assert watcher.resolved["basic"] == {"compute": {"cores": 8, "instances": 0}}
+
+        self.path.write_text(CLASSES)
+        assert watcher.check() == {"basic"}
+
+    @patch("openstack_project_manager.classwatch.time.monotonic")
+    def test_interval(self, mock_monotonic):
+        mock_monotonic.return_value = 1000.0
+        watcher = ClassWatcher([self.path], interval=10)
+
+        self.path.write_text(CLASSES.replace("cores: 4", "cores: 8"))
+        assert watcher.check() == set()
+
+        mock_monotonic.return_value = 1010.0
+        assert watcher.check() == {"basic"}
+
+
+if __name__ == "__main__":
+    unittest.main()
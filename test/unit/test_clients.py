@@ -0,0 +1,269 @@
+import datetime
+import http.server
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from pathlib import Path
+
+import requests
+from keystoneauth1 import session as ks_session
+from keystoneauth1.identity import v3
+
+from openstack_project_manager.clients import (
+    connect,
+    find_project,
+    find_user,
+    get_retry,
+    get_token_cache_path,
+    load_token_cache,
+    make_client,
+    save_token_cache,
+)
+
+
+class TestClients(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = patch("openstack.connect")
+        self.mock_connect = self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        self.mock_os_cloud = MagicMock()
+        self.mock_os_cloud.config.get_interface.return_value = "internal"
+        self.mock_os_cloud.config.get_region_name.return_value = "RegionOne"
+        self.mock_os_cloud.config.get_endpoint.return_value = None
+        self.mock_connect.return_value = self.mock_os_cloud
+
+    def test_connect(self):
+        os_cloud = connect("cloud-name", 32)
+
+        assert os_cloud is self.mock_os_cloud
+        self.mock_connect.assert_called_once_with(cloud="cloud-name")
+        assert self.mock_os_cloud.session.session.mount.call_count == 2
+        for mount_call in self.mock_os_cloud.session.session.mount.call_args_list:
+            adapter = mount_call.args[1]
+            assert adapter._pool_connections == 32
+            assert adapter._pool_maxsize == 32
+
+    def test_connect_retries(self):
+        connect("cloud-name", retries=3)
+
+        for mount_call in self.mock_os_cloud.session.session.mount.call_args_list:
+            retry = mount_call.args[1].max_retries
+            assert retry.total == 3
+            assert retry.is_retry("POST", 429)
+            assert retry.is_retry("GET", 503)
+            assert not retry.is_retry("POST", 503)
+            assert not retry.is_retry("POST", 409)
+
+    def test_retry_requests(self):
+        requests_by_method: dict = {}
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def reply(self):
+                requests_by_method.setdefault(self.command, 0)
+                requests_by_method[self.command] += 1
+                self.send_response(int(self.path.strip("/")))
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            do_GET = do_POST = reply
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        session = requests.Session()
+        session.mount(
+            "http://", requests.adapters.HTTPAdapter(max_retries=get_retry(2))
+        )
+
+        # a POST that may have been processed is not sent again
+        assert session.post(f"{url}/503").status_code == 503
+        assert requests_by_method == {"POST": 1}
+
+        # a throttled POST is sent again
+        assert session.post(f"{url}/429").status_code == 429
+        assert requests_by_method == {"POST": 4}
+
+        assert session.get(f"{url}/503").status_code == 503
+        assert requests_by_method == {"POST": 4, "GET": 3}
+
+    def test_connect_adapter(self):
+        adapter = MagicMock()
+        connect("cloud-name", adapter=adapter)
+
+        for mount_call in self.mock_os_cloud.session.session.mount.call_args_list:
+            assert mount_call.args[1] is adapter
+
+    @patch("keystoneclient.v3.client.Client")
+    def test_make_client_identity(self, mock_client):
+        client = make_client(self.mock_os_cloud, "identity")
+
+        assert client is mock_client.return_value
+        mock_client.assert_called_once()
+        assert mock_client.call_args.kwargs["session"] is self.mock_os_cloud.session
+        assert mock_client.call_args.kwargs["interface"] == "internal"
+        assert mock_client.call_args.kwargs["region_name"] == "RegionOne"
+
+    @patch("neutronclient.v2_0.client.Client")
+    def test_make_client_network(self, mock_client):
+        client = make_client(self.mock_os_cloud, "network")
+
+        assert client is mock_client.return_value
+        assert mock_client.call_args.kwargs["session"] is self.mock_os_cloud.session
+        assert mock_client.call_args.kwargs["endpoint_type"] == "internal"
+
+    def test_find_inventory(self):
+        from openstack.identity.v3.project import Project
+        from openstack.identity.v3.user import User
+
+        from openstack_project_manager.inventory import Inventory
+
+        self.mock_os_cloud.identity.users.return_value = [
+            User(id="u1", name="user1", domain_id="d1")
+        ]
+        self.mock_os_cloud.identity.projects.return_value = [
+            Project(id="p1", name="d1-user1", domain_id="d1", quotaclass="basic")
+        ]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            inventory = Inventory(Path(tmpdir) / "inventory.sqlite")
+            for _ in range(2):
+                assert (
+                    find_user(self.mock_os_cloud, "user1", "d1", inventory).id == "u1"
+                )
+                assert not find_user(self.mock_os_cloud, "user2", "d1", inventory)
+                project = find_project(self.mock_os_cloud, "d1-user1", "d1", inventory)
+                assert project.quotaclass == "basic"
+            inventory.close()
+
+        self.mock_os_cloud.identity.users.assert_called_once_with(domain_id="d1")
+        self.mock_os_cloud.identity.projects.assert_called_once_with(domain_id="d1")
+        self.mock_os_cloud.identity.find_user.assert_not_called()
+
+    def test_find(self):
+        find_user(self.mock_os_cloud, "user1", "d1")
+        self.mock_os_cloud.identity.find_user.assert_called_once_with(
+            "user1", domain_id="d1"
+        )
+        find_project(self.mock_os_cloud, "d1-user1", "d1")
+        self.mock_os_cloud.identity.find_project.assert_called_once_with(
+            "d1-user1", domain_id="d1"
+        )
+
+    def test_make_client_unknown(self):
+        with self.assertRaises(ValueError):
+            make_client(self.mock_os_cloud, "compute")
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "cache" / "admin.json"
+
+    def make_os_cloud(self):
+        os_cloud = MagicMock()
+        os_cloud.session = ks_session.Session(
+            auth=v3.Password(
+                auth_url="http://keystone.example.com:5000/v3",
+                username="admin",
+                password="password",
+                user_domain_name="Default",
+                project_name="admin",
+                project_domain_name="Default",
+            )
+        )
+        os_cloud.config.get_auth_args.return_value = {
+            "auth_url": "http://keystone.example.com:5000/v3",
+            "username": "admin",
+            "password": "password",
+        }
+        return os_cloud
+
+    def set_token(self, os_cloud, expires_in: datetime.timedelta):
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + expires_in
+        body = {
+            "token": {
+                "expires_at": expires_at.strftime("%Y-%m-%dT%H:%M:%S.000000Z"),
+                "methods": ["password"],
+                "catalog": [],
+                "user": {"id": "user-id", "name": "admin"},
+                "project": {"id": "project-id", "name": "admin"},
+            }
+        }
+        os_cloud.session.auth.set_auth_state(
+            json.dumps({"auth_token": "cached-token", "body": body})
+        )
+
+    def test_get_token_cache_path(self):
+        os_cloud = self.make_os_cloud()
+        path = get_token_cache_path(os_cloud, "admin")
+        assert path.name.startswith("admin-")
+        assert "password" not in str(path)
+
+        # the password is not part of the key, the user is
+        os_cloud.config.get_auth_args.return_value["password"] = "other"
+        assert get_token_cache_path(os_cloud, "admin") == path
+        os_cloud.config.get_auth_args.return_value["username"] = "other"
+        assert get_token_cache_path(os_cloud, "admin") != path
+
+    def test_save_and_load_token_cache(self):
+        os_cloud = self.make_os_cloud()
+        self.set_token(os_cloud, datetime.timedelta(hours=1))
+
+        save_token_cache(os_cloud, self.path)
+
+        assert os.stat(self.path).st_mode & 0o777 == 0o600
+        assert os.stat(self.path.parent).st_mode & 0o777 == 0o700
+
+        # only the token is cached, no temporary file is left behind
+        assert list(json.loads(self.path.read_text())) == ["auth"]
+        assert os.listdir(self.path.parent) == [self.path.name]
+
+        os_cloud = self.make_os_cloud()
+        assert load_token_cache(os_cloud, self.path)
+        assert os_cloud.session.get_token() == "cached-token"
+
+    def test_load_token_cache_expired(self):
+        os_cloud = self.make_os_cloud()
+        self.set_token(os_cloud, datetime.timedelta(seconds=10))
+        save_token_cache(os_cloud, self.path)
+
+        os_cloud = self.make_os_cloud()
+        assert not load_token_cache(os_cloud, self.path)
+        assert os_cloud.session.auth.get_auth_state() is None
+
+    def test_save_token_cache_concurrent(self):
+        os_cloud = self.make_os_cloud()
+        self.set_token(os_cloud, datetime.timedelta(hours=1))
+
+        # a process writes to its own temporary file
+        with patch("os.replace") as mock_replace:
+            save_token_cache(os_cloud, self.path)
+        tmp = mock_replace.call_args.args[0]
+        assert str(os.getpid()) in Path(tmp).name
+        assert Path(tmp).parent == self.path.parent
+
+    def test_load_token_cache_missing(self):
+        os_cloud = self.make_os_cloud()
+        assert not load_token_cache(os_cloud, self.path)
+
+    def test_save_token_cache_unauthenticated(self):
+        os_cloud = self.make_os_cloud()
+        save_token_cache(os_cloud, self.path)
+        assert not self.path.exists()
+
+
+if __name__ == "__main__":
+    unittest.main()
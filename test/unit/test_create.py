@@ -71,7 +71,7 @@ class TestCLI(unittest.TestCase):
         self.addCleanup(self.patcher2.stop)
         self.mock_generate_password.return_value = "randompassword"
 
-        self.patcher3 = patch("os_client_config.make_client")
+        self.patcher3 = patch("openstack_project_manager.clients.make_client")
         self.mock_make_client = self.patcher3.start()
         self.addCleanup(self.patcher3.stop)
         self.mock_os_keystone = MagicMock()
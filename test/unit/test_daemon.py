@@ -0,0 +1,355 @@
+import json
+import os
+import queue
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import typer
+import yaml
+from typer.testing import CliRunner
+
+from openstack_project_manager.daemon import (
+    Daemon,
+    MessagingSource,
+    FileSource,
+    QueueSource,
+    parse_notification,
+    run,
+)
+from openstack_project_manager.fakecloud import FakeCloud
+from openstack_project_manager.inventory import Inventory
+from openstack_project_manager.metrics import RunMetrics
+from openstack_project_manager.workqueue import WorkQueue
+
+app = typer.Typer()
+app.command()(run)
+
+CLASSES = """
+---
+default:
+  compute:
+    cores: 0
+    instances: 0
+  network:
+    network: 0
+    router: 0
+  volume:
+    gigabytes: 0
+    volumes: 0
+
+basic:
+  parent: default
+  compute:
+    cores: 4
+"""
+
+
+def notification(event_type: str, project_id: str) -> dict:
+    return {
+        "event_type": event_type,
+        "payload": {
+            "typeURI": "http://schemas.dmtf.org/cloud/audit/1.0/event",
+            "action": event_type.split(".")[-1] + ".project",
+            "resource_info": project_id,
+        },
+    }
+
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name)
+
+    def test_parse_notification(self):
+        assert (
+            parse_notification(notification("identity.project.created", "abc")) == "abc"
+        )
+        assert (
+            parse_notification(notification("identity.project.updated", "abc")) == "abc"
+        )
+        assert not parse_notification(notification("identity.user.created", "abc"))
+
+        # the envelope of the message bus
+        envelope = {
+            "oslo.version": "2.0",
+            "oslo.message": json.dumps(notification("identity.project.created", "abc")),
+        }
+        assert parse_notification(envelope) == "abc"
+
+    def test_file_source(self):
+        path = self.path / "notifications.jsonl"
+        path.write_text('{"event_type": "a"}\n\nnot json\n{"event_type": "b"}\n')
+
+        assert [x["event_type"] for x in FileSource(path, follow=False)] == ["a", "b"]
+
+    def test_file_source_follow(self):
+        path = self.path / "notifications.jsonl"
+        path.write_text('{"event_type": "a"}\n{"event_')
+
+        source = FileSource(path, follow=True, interval=0.01)
+        messages = iter(source)
+        assert next(messages) == {"event_type": "a"}
+
+        # the incomplete line is read when it is complete
+        with open(path, "a") as fp:
+            fp.write('type": "b"}\n')
+        assert next(messages) == {"event_type": "b"}
+
+        source.stop()
+        assert list(messages) == []
+
+    def test_queue_source(self):
+        source = QueueSource()
+        source.put({"event_type": "a"})
+        source.stop()
+        assert list(source) == [{"event_type": "a"}]
+
+    def test_messaging_source(self):
+        modules = {"oslo_config": MagicMock(), "oslo_messaging": MagicMock()}
+        with patch.dict(sys.modules, modules):
+            source = MessagingSource("rabbit://", "notifications", "opm", 1)
+
+        # a full queue pushes back on the listener instead of growing
+        source.info({}, "identity", "identity.project.created", {}, {})
+        with self.assertRaises(queue.Full):
+            source.queue.put({}, timeout=0.01)
+
+        messages = iter(source)
+        assert next(messages) == {
+            "event_type": "identity.project.created",
+            "payload": {},
+        }
+        source.stop()
+        listener = modules["oslo_messaging"].get_notification_listener.return_value
+        listener.stop.assert_called_once()
+        assert list(messages) == []
+
+    def test_serve(self):
+        configuration = MagicMock()
+        configuration.metrics = RunMetrics()
+        daemon = Daemon(configuration, [], False, False, True, True, True)
+        daemon.reconcile = MagicMock(side_effect=[RuntimeError("failed"), None])
+
+        source = QueueSource()
+        source.put(notification("identity.project.created", "p1"))
+        source.put(notification("identity.user.created", "u1"))
+        source.put(notification("identity.project.updated", "p2"))
+        source.stop()
+
+        # a failed project does not stop the daemon
+        daemon.serve(source)
+        assert [x.args[0] for x in daemon.reconcile.call_args_list] == ["p1", "p2"]
+        assert configuration.metrics.reconciles == {"succeeded": 1, "failed": 1}
+
+    def test_serve_coalesce(self):
+        work_queue = WorkQueue(debounce=60)
+        textfile = self.path / "opm.prom"
+        configuration = MagicMock()
+        configuration.metrics = RunMetrics()
+        daemon = Daemon(
+            configuration, [], False, False, True, True, True, work_queue, textfile
+        )
+        daemon.reconcile = MagicMock()
+
+        source = QueueSource()
+        for _ in range(3):
+            source.put(notification("identity.project.updated", "p1"))
+        source.put(notification("identity.project.created", "p2"))
+        source.stop()
+
+        # the notifications of a project are reconciled once
+        daemon.serve(source, interval=0.01)
+        assert sorted(x.args[0] for x in daemon.reconcile.call_args_list) == [
+            "p1",
+            "p2",
+        ]
+        assert work_queue.coalesced == 2
+
+        metrics = textfile.read_text()
+        assert "openstack_project_manager_queue_depth 0\n" in metrics
+        assert (
+            'openstack_project_manager_queue_events_total{state="received"} 4\n'
+            in metrics
+        )
+        assert "openstack_project_manager_queue_latency_seconds_count 2\n" in metrics
+        assert (
+            'openstack_project_manager_reconciles_total{result="succeeded"} 2\n'
+            in metrics
+        )
+
+    def test_reload(self):
+        configuration = MagicMock()
+        configuration.inventory.items.return_value = [
+            {"id": "p1", "name": "project1", "quotaclass": "basic"},
+            {"id": "p2", "name": "project2", "quotaclass": "default"},
+            {"id": "p3", "name": "project3", "quotaclass": "other"},
+            {"id": "p4", "name": "project4"},
+        ]
+        work_queue = WorkQueue()
+        watcher = MagicMock()
+        daemon = Daemon(
+            configuration,
+            [],
+            False,
+            False,
+            True,
+            True,
+            True,
+            work_queue,
+            watcher=watcher,
+        )
+
+        watcher.check.return_value = set()
+        daemon.reload()
+        assert work_queue.pending == {}
+
+        # only the projects of the changed classes are reconciled
+        watcher.check.return_value = {"basic", "default"}
+        daemon.reload()
+        configuration.inventory.items.assert_called_once_with("projects")
+        assert sorted(work_queue.pending) == ["p1", "p2"]
+
+    @patch("openstack_project_manager.manage.list_projects")
+    def test_reload_empty_inventory(self, mock_list_projects):
+        configuration = MagicMock()
+        configuration.inventory.items.return_value = iter([])
+        project = MagicMock()
+        project.to_dict.return_value = {
+            "id": "p1",
+            "name": "project1",
+            "quotaclass": "basic",
+        }
+        mock_list_projects.return_value = [project]
+        work_queue = WorkQueue()
+        watcher = MagicMock()
+        watcher.check.return_value = {"basic"}
+        daemon = Daemon(
+            configuration,
+            [],
+            False,
+            False,
+            True,
+            True,
+            True,
+            work_queue,
+            watcher=watcher,
+        )
+
+        # the projects are listed if the inventory does not contain any yet
+        daemon.reload()
+        mock_list_projects.assert_called_once_with(configuration)
+        assert sorted(work_queue.pending) == ["p1"]
+
+    @patch("openstack_project_manager.manage.process_project")
+    def test_reconcile_inventory(self, mock_process_project):
+        inventory = Inventory(self.path / "inventory.sqlite")
+        for scope in ["d1", "all"]:
+            inventory.store(
+                "projects",
+                scope,
+                [
+                    {"id": "p1", "name": "project1", "quotaclass": "basic"},
+                    {"id": "p2", "name": "project2", "quotaclass": "basic"},
+                ],
+            )
+        configuration = MagicMock()
+        configuration.inventory = inventory
+        project = MagicMock()
+        project.domain_id = "d1"
+        project.name = "project1"
+        project.to_dict.return_value = {
+            "id": "p1",
+            "name": "project1",
+            "domain_id": "d1",
+            "quotaclass": "default",
+        }
+        configuration.os_cloud.identity.get_project.return_value = project
+        work_queue = WorkQueue()
+        watcher = MagicMock()
+        daemon = Daemon(
+            configuration,
+            [],
+            False,
+            False,
+            True,
+            True,
+            True,
+            work_queue,
+            watcher=watcher,
+        )
+
+        # a project moved to another class is indexed under its new class
+        daemon.reconcile("p1")
+        mock_process_project.assert_called_once()
+        watcher.check.return_value = {"default"}
+        daemon.reload()
+        assert sorted(work_queue.pending) == ["p1"]
+
+        daemon.work_queue = WorkQueue()
+        watcher.check.return_value = {"basic"}
+        daemon.reload()
+        assert sorted(daemon.work_queue.pending) == ["p2"]
+        inventory.close()
+
+    def test_fakecloud(self):
+        with FakeCloud(seed=0) as cloud:
+            admin = cloud.find("projects", "admin")
+            cloud.add_network("public", admin["id"], external=True)
+            domain = cloud.add_domain("test")
+            project = cloud.add_project(
+                "test-project1", domain["id"], quotaclass="basic"
+            )
+            other = cloud.add_project("test-project2", domain["id"], quotaclass="basic")
+
+            (self.path / "clouds.yml").write_text(yaml.dump(cloud.get_clouds_yaml()))
+            (self.path / "classes.yml").write_text(CLASSES)
+            (self.path / "endpoints.yml").write_text("---\ndefault: []\n")
+            notifications = self.path / "notifications.jsonl"
+            notifications.write_text(
+                json.dumps(notification("identity.project.created", project["id"]))
+                + "\n"
+                + json.dumps(notification("identity.project.updated", "unknown"))
+                + "\n"
+            )
+
+            with patch.dict(
+                os.environ, {"OS_CLIENT_CONFIG_FILE": str(self.path / "clouds.yml")}
+            ):
+                result = CliRunner().invoke(
+                    app,
+                    [
+                        "--source=file",
+                        f"--file={notifications}",
+                        "--nofollow",
+                        "--cloud=fakecloud",
+                        f"--classes={self.path / 'classes.yml'}",
+                        f"--endpoints={self.path / 'endpoints.yml'}",
+                    ],
+                )
+            self.assertEqual(result.exit_code, 0, (result, result.stdout))
+
+            # only the project of the notification is reconciled
+            quotas = cloud.state["quotas"]["compute"]
+            assert quotas[project["id"]]["cores"] == 4
+            assert other["id"] not in quotas
+
+    def test_missing_options(self):
+        result = CliRunner().invoke(app, ["--source=file"])
+        assert result.exit_code == 1
+
+        result = CliRunner().invoke(app, ["--source=messaging"])
+        assert result.exit_code == 1
+
+    def test_invalid_source(self):
+        result = CliRunner().invoke(app, ["--source=bogus"])
+        assert result.exit_code == 2
+        assert "[file|messaging]" in CliRunner().invoke(app, ["--help"]).stdout
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,482 @@
+import gzip
+import json
+import os
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import typer
+import yaml
+from typer.testing import CliRunner
+
+from openstack_project_manager.cassette import Player
+from openstack_project_manager.fakecloud import FakeCloud, Faults, parse_latency
+from openstack_project_manager.manage import run
+
+app = typer.Typer()
+app.command()(run)
+
+CLASSES = """
+---
+default:
+  compute:
+    cores: 0
+    instances: 0
+  network:
+    network: 0
+    router: 0
+  volume:
+    gigabytes: 0
+    volumes: 0
+
+basic:
+  parent: default
+  compute:
+    cores: 4
+    instances: -1
+  network:
+    network: 1
+    router: 0
+  volume:
+    gigabytes: 20
+    volumes: 4
+  bandwidth:
+    egress: 1000
+    egress_burst: 100
+  flavors:
+    - SCS-2V-4
+  volume_types:
+    - ssd
+  default_volume_type: ssd
+"""
+
+ENDPOINTS = """
+---
+default:
+  - nova
+orchestration:
+  - heat
+"""
+
+
+class TestFakeCloud(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        tmpdir = Path(self.tmpdir.name)
+
+        self.cloud = FakeCloud().start()
+        self.addCleanup(self.cloud.stop)
+
+        admin = self.cloud.find("projects", "admin")
+        self.public = self.cloud.add_network("public", admin["id"], external=True)
+        self.domain = self.cloud.add_domain("test")
+        self.project = self.cloud.add_project(
+            "test-project1",
+            self.domain["id"],
+            quotaclass="basic",
+            has_public_network="True",
+            has_shared_images="True",
+        )
+        self.user = self.cloud.add_user("project1", self.domain["id"])
+        images = self.cloud.add_project("test-images", self.domain["id"])
+        self.image = self.cloud.add_image("Ubuntu 24.04", images["id"])
+        self.flavor = self.cloud.add_flavor("SCS-2V-4", is_public=False)
+        self.private_flavor = self.cloud.add_flavor("test-gpu", is_public=False)
+        self.volume_type = self.cloud.add_volume_type("ssd", is_public=False)
+        for name in ["nova-public", "nova-internal", "heat-public", "heat-internal"]:
+            self.cloud.add_endpoint_group(name)
+
+        (tmpdir / "clouds.yml").write_text(yaml.dump(self.cloud.get_clouds_yaml()))
+        (tmpdir / "classes.yml").write_text(CLASSES)
+        (tmpdir / "endpoints.yml").write_text(ENDPOINTS)
+
+        patcher = patch.dict(
+            os.environ, {"OS_CLIENT_CONFIG_FILE": str(tmpdir / "clouds.yml")}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.args = [
+            "--cloud=fakecloud",
+            f"--classes={tmpdir / 'classes.yml'}",
+            f"--endpoints={tmpdir / 'endpoints.yml'}",
+            "--manage-endpoints",
+            "--manage-homeprojects",
+            "--domain=test",
+        ]
+
+    def invoke(self, *args):
+        result = CliRunner().invoke(app, self.args + list(args))
+        self.assertEqual(result.exit_code, 0, (result, result.stdout))
+        return result
+
+    def test_manage(self):
+        self.invoke()
+
+        state = self.cloud.state
+        project_id = self.project["id"]
+
+        assert state["quotas"]["compute"][project_id]["cores"] == 4
+        assert state["quotas"]["compute"][project_id]["instances"] == -1
+        assert state["quotas"]["network"][project_id]["router"] == 1
+        assert state["quotas"]["volume"][project_id]["gigabytes"] == 20
+
+        [policy] = state["qos_policies"].values()
+        assert policy["project_id"] == project_id
+        [rule] = state["qos_bandwidth_limit_rules"].values()
+        assert (rule["direction"], rule["max_kbps"]) == ("egress", 1000)
+
+        [rbac_policy] = state["rbac_policies"].values()
+        assert rbac_policy["object_id"] == self.public["id"]
+        assert rbac_policy["target_tenant"] == project_id
+        assert rbac_policy["action"] == "access_as_external"
+
+        assert {"flavor_id": self.flavor["id"], "tenant_id": project_id} in state[
+            "flavor_access"
+        ]
+        assert {
+            "flavor_id": self.private_flavor["id"],
+            "tenant_id": project_id,
+        } in state["flavor_access"]
+        assert {
+            "volume_type_id": self.volume_type["id"],
+            "project_id": project_id,
+        } in state["volume_type_access"]
+        assert state["default_volume_types"][project_id] == self.volume_type["id"]
+
+        [member] = state["image_members"]
+        assert member["member_id"] == project_id
+        assert member["status"] == "accepted"
+
+        assert len(state["project_endpoint_groups"]) == 4
+        assert (
+            len([x for x in state["role_assignments"] if x["project_id"] == project_id])
+            == 2
+        )
+
+        # a second run has nothing left to change
+        state = json.dumps(self.cloud.state, sort_keys=True)
+        self.invoke()
+        assert json.dumps(self.cloud.state, sort_keys=True) == state
+
+    def test_manage_dry_run(self):
+        self.invoke("--dry-run")
+
+        # NOTE: Only quotas, networks, RBAC policies and endpoint groups honour the
+        #       dry run, the other phases change the cloud in a dry run as well.
+        state = self.cloud.state
+        assert state["quotas"] == {"compute": {}, "network": {}, "volume": {}}
+        assert list(state["networks"]) == [self.public["id"]]
+        assert not state["routers"]
+        assert not state["subnets"]
+        assert not state["rbac_policies"]
+        assert not state["project_endpoint_groups"]
+
+    def test_record_replay(self):
+        cassette = Path(self.tmpdir.name) / "cassette.json.gz"
+        recorded = self.invoke(f"--record={cassette}")
+        state = json.dumps(self.cloud.state, sort_keys=True)
+
+        # the replayed run gets all responses from the cassette
+        self.cloud.stop()
+        replayed = self.invoke(f"--replay={cassette}", "--noreplay-latency")
+
+        assert json.dumps(self.cloud.state, sort_keys=True) == state
+        assert replayed.stdout.count(" - ") == recorded.stdout.count(" - ")
+
+        with gzip.open(cassette, "rt") as fp:
+            interactions = [json.loads(x) for x in fp.readlines()[1:]]
+        [auth] = [x for x in interactions if x["url"].endswith("/auth/tokens")]
+        body = json.loads(auth["request"]["body"])
+        assert body["auth"]["identity"]["password"]["user"]["password"] == "REDACTED"
+        assert auth["response"]["headers"]["X-Subject-Token"] == "REDACTED"
+
+    def test_replay_expired_token(self):
+        cassette = Path(self.tmpdir.name) / "cassette.json.gz"
+        self.invoke(f"--record={cassette}")
+        self.cloud.stop()
+
+        # the cassette of a run whose token has expired since
+        with gzip.open(cassette, "rt") as fp:
+            lines = fp.readlines()
+        for i, line in enumerate(lines[1:], 1):
+            interaction = json.loads(line)
+            if interaction["url"].endswith("/auth/tokens"):
+                body = json.loads(interaction["response"]["body"])
+                body["token"]["issued_at"] = "2020-01-01T00:00:00.000000Z"
+                body["token"]["expires_at"] = "2020-01-02T00:00:00.000000Z"
+                interaction["response"]["body"] = json.dumps(body)
+                lines[i] = json.dumps(interaction) + "\n"
+        with gzip.open(cassette, "wt") as fp:
+            fp.writelines(lines)
+
+        with patch.object(
+            Player, "send", autospec=True, side_effect=Player.send
+        ) as send:
+            self.invoke(f"--replay={cassette}", "--noreplay-latency")
+
+        # the replayed token is still valid, the run authenticates only once
+        urls = [x.args[1].url for x in send.call_args_list]
+        assert len([x for x in urls if x.endswith("/auth/tokens")]) == 1
+
+    def test_dry_run_mutations(self):
+        # NOTE: The project without a class is only looked up, the other
+        #       projects try to add access lists that exist already in dry runs.
+        textfile = Path(self.tmpdir.name) / "metrics.prom"
+        self.invoke("--dry-run", "--name=test-images", f"--textfile={textfile}")
+
+        # the token issued for the dry run is not a mutation
+        metrics = textfile.read_text()
+        assert "openstack_project_manager_api_latency_seconds_count" in metrics
+        assert "openstack_project_manager_mutations{" not in metrics
+
+    def test_fingerprint(self):
+        fingerprints = Path(self.tmpdir.name) / "fingerprints.json"
+        with patch.object(self.cloud, "handle", wraps=self.cloud.handle) as handle:
+            self.invoke(f"--fingerprint-file={fingerprints}")
+        state = json.dumps(self.cloud.state, sort_keys=True)
+
+        # the quotas are read once for the fingerprint and the verification
+        quota_reads = [
+            x.args[1]
+            for x in handle.call_args_list
+            if x.args[0] == "GET"
+            and "quota" in x.args[1]
+            and self.project["id"] in x.args[1]
+        ]
+        assert len(quota_reads) == 3, quota_reads
+
+        with patch.object(self.cloud, "handle", wraps=self.cloud.handle) as handle:
+            self.invoke(f"--fingerprint-file={fingerprints}")
+            skipped = handle.call_count
+            self.invoke()
+            full = handle.call_count - skipped
+
+        assert skipped < full
+        assert json.dumps(self.cloud.state, sort_keys=True) == state
+
+        # quotas changed outside the tool get a full verification
+        quotas = self.cloud.state["quotas"]["compute"]
+        quotas[self.project["id"]]["cores"] = 100
+        self.invoke(f"--fingerprint-file={fingerprints}")
+        assert quotas[self.project["id"]]["cores"] == 4
+
+        # flavor access changed outside the tool is only restored when forced
+        access = {"flavor_id": self.flavor["id"], "tenant_id": self.project["id"]}
+        self.cloud.state["flavor_access"].remove(access)
+        self.invoke(f"--fingerprint-file={fingerprints}")
+        assert access not in self.cloud.state["flavor_access"]
+        self.invoke(f"--fingerprint-file={fingerprints}", "--force-verification")
+        assert access in self.cloud.state["flavor_access"]
+
+        # a changed property of the project gets a full verification
+        self.cloud.state["projects"][self.project["id"]]["quotaclass"] = "default"
+        self.invoke(f"--fingerprint-file={fingerprints}")
+        assert self.cloud.state["quotas"]["compute"][self.project["id"]]["cores"] == 0
+
+    def test_inventory(self):
+        inventory = Path(self.tmpdir.name) / "inventory.sqlite"
+        with patch.object(self.cloud, "handle", wraps=self.cloud.handle) as handle:
+            self.invoke(f"--inventory={inventory}")
+            first = handle.call_count
+            self.invoke(f"--inventory={inventory}")
+            second = handle.call_count - first
+
+        # the second run looks up the resources locally
+        assert second < first
+
+        # the run with the inventory left nothing to change
+        state = json.dumps(self.cloud.state, sort_keys=True)
+        self.invoke()
+        assert json.dumps(self.cloud.state, sort_keys=True) == state
+
+    def test_checkpoint(self):
+        checkpoint = Path(self.tmpdir.name) / "checkpoint.jsonl"
+        project2 = self.cloud.add_project(
+            "test-project2", self.domain["id"], quotaclass="basic"
+        )
+
+        # the run is interrupted after the first project
+        with patch(
+            "openstack_project_manager.manage.process_project",
+            side_effect=[None, RuntimeError("interrupted")],
+        ):
+            result = CliRunner().invoke(app, self.args + [f"--checkpoint={checkpoint}"])
+        assert result.exit_code != 0
+        assert checkpoint.exists()
+
+        with patch("openstack_project_manager.manage.process_project") as process:
+            self.invoke(f"--checkpoint={checkpoint}", "--resume")
+
+        [call] = process.call_args_list
+        assert call.args[1].id == project2["id"]
+        assert not checkpoint.exists()
+
+    def test_shard(self):
+        # fixed IDs that fall into all three shards
+        for i in range(2, 9):
+            self.cloud.add_project(
+                f"test-project{i}",
+                self.domain["id"],
+                id=f"{i:032x}",
+                quotaclass="basic",
+            )
+
+        # every project is managed by exactly one of the shards
+        processed = []
+        for i in range(3):
+            with patch("openstack_project_manager.manage.process_project") as process:
+                self.invoke(f"--shard={i}/3")
+            processed.append({x.args[1].id for x in process.call_args_list})
+
+        assert set.union(*processed) == {
+            x["id"]
+            for x in self.cloud.state["projects"].values()
+            if x["domain_id"] == self.domain["id"] and "quotaclass" in x
+        }
+        assert sum(len(x) for x in processed) == 8
+        assert all(processed)
+
+        result = CliRunner().invoke(app, self.args + ["--shard=3/3"])
+        assert result.exit_code == 1
+
+    def test_projects_from(self):
+        project2 = self.cloud.add_project(
+            "test-project2", self.domain["id"], quotaclass="basic"
+        )
+        project3 = self.cloud.add_project(
+            "test-project3", self.domain["id"], quotaclass="basic"
+        )
+        projects = Path(self.tmpdir.name) / "projects.txt"
+        projects.write_text(f"{self.project['id']}\ntest/test-project2\n")
+
+        args = [x for x in self.args if not x.startswith("--domain")]
+        with patch.object(self.cloud, "handle", wraps=self.cloud.handle) as handle:
+            result = CliRunner().invoke(app, args + [f"--projects-from={projects}"])
+        self.assertEqual(result.exit_code, 0, (result, result.stdout))
+
+        quotas = self.cloud.state["quotas"]["compute"]
+        assert self.project["id"] in quotas
+        assert project2["id"] in quotas
+        assert project3["id"] not in quotas
+
+        # the ID is looked up on its own, the name with the projects of the domain
+        project_lists = [
+            x.args[1]
+            for x in handle.call_args_list
+            if x.args[0] == "GET"
+            and re.search(r"/v3/projects(\?domain_id=\w+)?$", x.args[1])
+        ]
+        assert len(project_lists) == 1
+        assert "domain_id" in project_lists[0]
+        assert any(
+            x.args[0] == "GET"
+            and x.args[1].endswith(f"/v3/projects/{self.project['id']}")
+            for x in handle.call_args_list
+        )
+
+        # many IDs are looked up with one list call of all projects
+        with patch(
+            "openstack_project_manager.manage.PROJECT_LOOKUP_LIMIT", 0
+        ), patch.object(self.cloud, "handle", wraps=self.cloud.handle) as handle:
+            result = CliRunner().invoke(app, args + [f"--projects-from={projects}"])
+        self.assertEqual(result.exit_code, 0, (result, result.stdout))
+        project_lists = [
+            x.args[1]
+            for x in handle.call_args_list
+            if x.args[0] == "GET"
+            and re.search(r"/v3/projects(\?domain_id=\w+)?$", x.args[1])
+        ]
+        assert len(project_lists) == 2
+
+        # unknown projects fail the run after the known ones are processed
+        result = CliRunner().invoke(
+            app,
+            args + ["--projects-from=-"],
+            input="unknown\ntest/test-project3\n",
+        )
+        assert result.exit_code == 1
+        assert project3["id"] in self.cloud.state["quotas"]["compute"]
+
+    def test_parse_latency(self):
+        assert parse_latency(["compute=50:10", "*=20"]) == {
+            "compute": (0.05, 0.01),
+            "*": (0.02, 0.0),
+        }
+
+    @patch("time.sleep")
+    def test_latency(self, mock_sleep):
+        cloud = FakeCloud(seed=1, faults=Faults({"compute": (0.05, 0.0)}))
+
+        cloud.handle("GET", "/compute/v2.1/flavors", None)
+        mock_sleep.assert_called_once_with(0.05)
+
+        mock_sleep.reset_mock()
+        cloud.handle("GET", "/identity/v3/projects", None)
+        mock_sleep.assert_not_called()
+
+    def test_throttle(self):
+        cloud = FakeCloud(seed=1, faults=Faults(throttle_rate=1.0, retry_after=7))
+
+        statuses = set()
+        for _ in range(20):
+            status, _, headers = cloud.handle("GET", "/identity/v3/projects", None)
+            assert headers["Retry-After"] == "7"
+            statuses.add(status)
+        assert statuses == {429, 503}
+        assert sum(cloud.injected.values()) == 20
+
+        # a 503 is not retried for a POST
+        for _ in range(20):
+            status, _, _ = cloud.handle(
+                "POST", "/identity/v3/projects", {"project": {"name": "test"}}
+            )
+            assert status == 429
+
+        # version discovery and authentication are never throttled
+        assert cloud.handle("GET", "/identity/v3", None)[0] == 200
+        assert cloud.handle("GET", "/compute", None)[0] == 300
+
+    def test_conflict(self):
+        cloud = FakeCloud(seed=1, faults=Faults(conflict_rate=1.0))
+
+        assert cloud.handle("GET", "/identity/v3/projects", None)[0] == 200
+        status, _, _ = cloud.handle(
+            "POST", "/identity/v3/projects", {"project": {"name": "test"}}
+        )
+        assert status == 409
+        assert cloud.injected == {"409": 1}
+        assert not cloud.lookup("projects", {"name": "test"})
+
+    def test_state(self):
+        path = Path(self.tmpdir.name) / "state.json"
+        self.cloud.save(path)
+
+        with FakeCloud(FakeCloud.load_state(path)) as cloud:
+            assert cloud.state == self.cloud.state
+            assert cloud.find("projects", "test-project1")["quotaclass"] == "basic"
+
+    def test_seed(self):
+        assert FakeCloud(seed=1).state == FakeCloud(seed=1).state
+        assert FakeCloud(seed=1).state != FakeCloud(seed=2).state
+
+    def test_lookup(self):
+        assert self.cloud.lookup("projects", {"name": "TEST-PROJECT1"}) == [
+            self.project
+        ]
+        assert self.cloud.lookup(
+            "projects", {"domain_id": self.domain["id"], "name": "test-project1"}
+        ) == [self.project]
+
+        # the index is dropped when the collection changes
+        project = self.cloud.add_project("test-project2", self.domain["id"])
+        assert self.cloud.lookup("projects", {"name": "test-project2"}) == [project]
+        assert len(self.cloud.lookup("projects", {"domain_id": self.domain["id"]})) == 3
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from openstack_project_manager.fingerprint import FingerprintStore, get_fingerprint
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "fingerprints.json"
+
+    def test_get_fingerprint(self):
+        assert get_fingerprint({"a": 1, "b": [1, 2]}) == get_fingerprint(
+            {"b": [1, 2], "a": 1}
+        )
+        assert get_fingerprint({"a": 1}) != get_fingerprint({"a": 2})
+
+    @patch("openstack_project_manager.fingerprint.time.time")
+    def test_is_unchanged(self, mock_time):
+        mock_time.return_value = 1000.0
+        store = FingerprintStore(self.path, verification_interval=100)
+        assert not store.is_unchanged("project", "abc")
+
+        store.update("project", "abc")
+        assert store.is_unchanged("project", "abc")
+        assert not store.is_unchanged("project", "def")
+
+        # the periodic full verification
+        mock_time.return_value = 1100.0
+        assert not store.is_unchanged("project", "abc")
+
+    def test_force(self):
+        store = FingerprintStore(self.path, force=True)
+        store.update("project", "abc")
+        assert not store.is_unchanged("project", "abc")
+        assert store.projects["project"]["fingerprint"] == "abc"
+
+    def test_save(self):
+        store = FingerprintStore(self.path)
+        store.update("project", "abc")
+        store.save()
+
+        assert FingerprintStore(self.path).is_unchanged("project", "abc")
+        assert [x.name for x in Path(self.tmpdir.name).iterdir()] == [
+            "fingerprints.json"
+        ]
+
+    def test_unusable(self):
+        self.path.write_text("{")
+        assert FingerprintStore(self.path).projects == {}
+
+        # fingerprints of another version are discarded
+        self.path.write_text(json.dumps({"version": 0, "projects": {"a": {}}}))
+        assert FingerprintStore(self.path).projects == {}
+
+
+if __name__ == "__main__":
+    unittest.main()
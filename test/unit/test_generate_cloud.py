@@ -0,0 +1,90 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from typer.testing import CliRunner
+import typer
+
+from openstack_project_manager.fakecloud import FakeCloud
+from openstack_project_manager.generate_cloud import (
+    PROFILES,
+    generate,
+    get_project_counts,
+    run,
+)
+
+app = typer.Typer()
+app.command()(run)
+
+
+class TestGenerateCloud(unittest.TestCase):
+
+    def test_generate(self):
+        cloud = generate(FakeCloud(seed=1), "tiny", 1)
+        state = cloud.state
+
+        domains = [x for x in state["domains"].values() if x["id"] != "default"]
+        assert len(domains) == PROFILES["tiny"]["domains"]
+
+        for domain in domains:
+            projects = {
+                x["name"]: x
+                for x in state["projects"].values()
+                if x["domain_id"] == domain["id"]
+            }
+            service = projects.pop(f"{domain['name']}-service")
+            assert service["is_service_project"] == "True"
+            images = projects.pop(f"{domain['name']}-images")
+            assert [x for x in state["images"].values() if x["owner"] == images["id"]]
+            assert all(x.startswith(f"{domain['name']}-") for x in projects)
+            cloud.find("users", f"{domain['name']}-admin", domain_id="default")
+
+        projects = [
+            x for x in state["projects"].values() if x["name"].split("-")[-1][0] in "pu"
+        ]
+        assert len(projects) == PROFILES["tiny"]["projects"]
+        assert {x.get("quotaclass") for x in projects} <= {
+            None,
+            "basic",
+            "default",
+            "okeanos",
+            "testbed",
+            "unlimited",
+        }
+
+    def test_generate_reproducible(self):
+        first = generate(FakeCloud(seed=1), "tiny", 1).state
+        assert generate(FakeCloud(seed=1), "tiny", 1).state == first
+        assert generate(FakeCloud(seed=2), "tiny", 2).state != first
+
+    def test_get_project_counts(self):
+        import random
+
+        counts = get_project_counts(random.Random(0), 10, 1000)
+        assert len(counts) == 10
+        assert sum(counts) == 1000
+        assert min(counts) >= 1
+
+        assert get_project_counts(random.Random(0), 10, 5) == [1] * 10
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir) / "state.json"
+            result = CliRunner().invoke(
+                app, ["--profile=tiny", "--seed=3", f"--output={output}"]
+            )
+            self.assertEqual(result.exit_code, 0, result)
+
+            state = FakeCloud.load_state(output)
+            assert state == generate(FakeCloud(seed=3), "tiny", 3).state
+
+            with FakeCloud(state) as cloud:
+                assert cloud.find("projects", "domain000-images")
+
+    def test_cli_unknown_profile(self):
+        result = CliRunner().invoke(app, ["--profile=huge", "--output=state.json"])
+        self.assertEqual(result.exit_code, 2, result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ENTRY_POINTS = [
+    "benchmark",
+    "create",
+    "create_endpoint_groups",
+    "create_ldap",
+    "create_user",
+    "daemon",
+    "fakecloud",
+    "generate_cloud",
+    "manage",
+    "manage_ldap",
+    "opm",
+    "simulate",
+]
+
+# NOTE: The client libraries and other heavy modules are imported in the
+#       functions that use them and only for type checking at the top of the
+#       modules, importing them eagerly took most of the startup time of the
+#       tools. These modules must only be imported on the code paths that
+#       need them.
+LAZY_MODULES = [
+    "deepmerge",
+    "dynaconf",
+    "keystoneauth1",
+    "keystoneclient",
+    "ldap",
+    "neutronclient",
+    "openstack",
+    "os_client_config",
+    "oslo_config",
+    "oslo_messaging",
+    "tabulate",
+    "yaml",
+]
+
+# cumulative import time of an entry point in microseconds, importing the
+# client libraries eagerly takes about 600ms
+IMPORT_TIME_BUDGET = 400000
+
+
+def importtime(module: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parents[2],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative)
+
+    return modules
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_import_time(self):
+        for entry_point in ENTRY_POINTS:
+            module = f"openstack_project_manager.{entry_point}"
+
+            with self.subTest(module=module):
+                modules = importtime(module)
+
+                eager = [x for x in modules if x.split(".")[0] in LAZY_MODULES]
+                self.assertEqual(eager, [], f"{module} imports heavy modules eagerly")
+                self.assertLess(modules[module], IMPORT_TIME_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
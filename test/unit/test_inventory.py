@@ -0,0 +1,138 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from openstack.compute.v2.flavor import Flavor
+
+from openstack_project_manager.inventory import Inventory, parse_ttls
+
+
+class TestInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "inventory.sqlite"
+        self.inventory = Inventory(self.path, {"flavors": 100})
+        self.addCleanup(self.inventory.db.close)
+
+    def test_parse_ttls(self):
+        assert parse_ttls(["projects=60", "flavors=0"]) == {
+            "projects": 60,
+            "flavors": 0,
+        }
+        with self.assertRaises(ValueError):
+            parse_ttls(["servers=60"])
+
+    @patch("openstack_project_manager.inventory.time.time")
+    def test_get(self, mock_time):
+        mock_time.return_value = 1000.0
+        fetch = MagicMock(return_value=[{"id": "a"}])
+
+        assert self.inventory.get("flavors", "all", fetch) == [{"id": "a"}]
+        assert self.inventory.get("flavors", "all", fetch) == [{"id": "a"}]
+        fetch.assert_called_once()
+        assert (self.inventory.hits, self.inventory.misses) == (1, 1)
+
+        # the scopes are refreshed independently
+        self.inventory.get("flavors", "other", fetch)
+        assert fetch.call_count == 2
+
+        # expired after the TTL of the resource type
+        mock_time.return_value = 1100.0
+        self.inventory.get("flavors", "all", fetch)
+        assert fetch.call_count == 3
+
+    def test_add_remove(self):
+        self.inventory.get("flavor_access", "f1", lambda: [{"tenant_id": "p1"}])
+
+        self.inventory.add("flavor_access", "f1", {"tenant_id": "p2"})
+        self.inventory.remove("flavor_access", "f1", "tenant_id", "p1")
+        assert self.inventory.get("flavor_access", "f1", MagicMock()) == [
+            {"tenant_id": "p2"}
+        ]
+
+        # a list that is not stored is fetched with the change later
+        self.inventory.add("flavor_access", "f2", {"tenant_id": "p2"})
+        assert self.inventory.load("flavor_access", "f2") is None
+
+    def test_invalidate(self):
+        fetch = MagicMock(return_value=[])
+        self.inventory.get("projects", "d1", fetch)
+        self.inventory.get("projects", "d2", fetch)
+
+        self.inventory.invalidate("projects", "d1")
+        assert self.inventory.load("projects", "d1") is None
+        assert self.inventory.load("projects", "d2") == []
+
+        self.inventory.invalidate("projects")
+        assert self.inventory.load("projects", "d2") is None
+
+    @patch("openstack_project_manager.inventory.time.time")
+    def test_items(self, mock_time):
+        mock_time.return_value = 1000.0
+        self.inventory.store("projects", "d1", [{"id": "p1"}])
+        self.inventory.store("projects", "d2", [{"id": "p2"}])
+        self.inventory.store("users", "d1", [{"id": "u1"}])
+
+        # expired resources are returned as well
+        mock_time.return_value = 100000.0
+        assert sorted(x["id"] for x in self.inventory.items("projects")) == [
+            "p1",
+            "p2",
+        ]
+
+    def test_resources(self):
+        fetch = MagicMock(return_value=[Flavor(id="f1", name="gpu", is_public=False)])
+
+        [flavor] = self.inventory.resources("flavors", "all", Flavor, fetch)
+        [flavor] = self.inventory.resources("flavors", "all", Flavor, fetch)
+
+        fetch.assert_called_once()
+        assert isinstance(flavor, Flavor)
+        assert (flavor.id, flavor.name, flavor.is_public) == ("f1", "gpu", False)
+
+    def test_close(self):
+        self.inventory.get("projects", "d1", lambda: [{"id": "p1"}])
+        self.inventory.close()
+
+        # the stored resources are used by the next run
+        inventory = Inventory(self.path)
+        self.addCleanup(inventory.db.close)
+        assert inventory.load("projects", "d1") == [{"id": "p1"}]
+
+    def test_readonly(self):
+        self.inventory.store("projects", "d1", [{"id": "p1"}])
+        self.inventory.commit()
+
+        inventory = Inventory(self.path, readonly=True)
+        self.addCleanup(inventory.db.close)
+        assert [x["id"] for x in inventory.items("projects")] == ["p1"]
+        with self.assertRaises(sqlite3.OperationalError):
+            inventory.store("projects", "d2", [])
+
+        # a snapshot of another version is not dropped
+        self.inventory.db.execute("PRAGMA user_version = 0")
+        self.inventory.commit()
+        with self.assertRaises(ValueError):
+            Inventory(self.path, readonly=True)
+        assert self.inventory.db.execute("SELECT COUNT(*) FROM resources").fetchone()[0]
+
+    def test_version(self):
+        self.inventory.get("projects", "d1", lambda: [{"id": "p1"}])
+        self.inventory.close()
+
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA user_version = 0")
+        db.commit()
+        db.close()
+
+        inventory = Inventory(self.path)
+        self.addCleanup(inventory.db.close)
+        assert inventory.load("projects", "d1") is None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,8 @@ import unittest
 from unittest.mock import MagicMock, patch, ANY, call
 
 import copy
+import json
+import tempfile
 import yaml
 from pathlib import Path
 
@@ -36,10 +38,14 @@ from openstack_project_manager.manage import (
     check_endpoints,
     share_image_with_project,
     share_images,
+    plan_image_cache,
     cache_images,
     process_project,
+    get_project_fingerprint,
     handle_unmanaged_project,
+    parse_project_refs,
     run,
+    QUOTAS,
 )
 
 app = typer.Typer()
@@ -93,13 +99,13 @@ class CloudTest(unittest.TestCase):
         self.mock_os_keystone = MagicMock()
         self.mock_os_neutron = MagicMock()
 
-        def mock_make_client(name: str, cloud: str):
+        def mock_make_client(os_cloud, name: str):
             if name == "identity":
                 return self.mock_os_keystone
             elif name == "network":
                 return self.mock_os_neutron
 
-        self.patcher2 = patch("os_client_config.make_client")
+        self.patcher2 = patch("openstack_project_manager.clients.make_client")
         self.mock_make_client = self.patcher2.start()
         self.mock_make_client.side_effect = mock_make_client
         self.addCleanup(self.patcher2.stop)
@@ -218,6 +224,19 @@ class TestUtils(TestUtilsBase):
         expected.update(dict(default_volume_type="override"))
         assert result == expected
 
+    def test_get_quotaclass_4(self):
+        # the parsed classes are cached, results must not share state
+        result = get_quotaclass(self.default_quotaclasses_path_list, "unlimited")
+        result["compute"]["cores"] = 100
+        result["network"]["router"] = 100
+
+        result = get_quotaclass(self.default_quotaclasses_path_list, "unlimited")
+        assert result["compute"]["cores"] == -1
+        assert result["network"]["router"] == 1
+
+        result = get_quotaclass(self.default_quotaclasses_path_list, "default")
+        assert result == yaml.safe_load(MOCK_QUOTA_CLASSES)["default"]
+
     def test_check_bool_0(self):
         project = MagicMock()
         project.__contains__.return_value = True
@@ -240,6 +259,10 @@ class TestUtils(TestUtilsBase):
         project.get.return_value = "Nothing"
         assert not check_bool(project, "param")
 
+    def test_parse_project_refs(self):
+        text = "# billing export\n\nabc123\ndomain1/project1  # moved\n  def456 \n"
+        assert parse_project_refs(text) == ["abc123", "domain1/project1", "def456"]
+
 
 class TestBase(TestUtilsBase, CloudTest):
 
@@ -1560,9 +1583,15 @@ class TestImages(TestBase):
     def test_cache_images(self):
         mock_volume1 = MagicMock()
         mock_volume1.name = "cache-5678"
+        mock_volume1.size = 5
         mock_volume2 = MagicMock()
         mock_volume2.name = "cache-7777"
+        mock_volume2.size = 5
         self.config.os_cloud.volume.volumes.return_value = [mock_volume1, mock_volume2]
+        self.config.os_cloud.get_volume_quotas.return_value = {
+            "gigabytes": 1000,
+            "volumes": 100,
+        }
 
         def mock_find_volume(name_or_id=None):
             if name_or_id == "cache-5678":
@@ -1580,6 +1609,100 @@ class TestImages(TestBase):
             name="cache-9999", size=20, imageRef=9999
         )
 
+    def test_cache_images_evict(self):
+        self.mock_image.updated_at = "2024-01-01T00:00:00Z"
+        self.mock_image2.updated_at = "2025-01-01T00:00:00Z"
+
+        mock_volume1 = MagicMock()
+        mock_volume1.name = "cache-5678"
+        mock_volume1.size = 5
+        self.config.os_cloud.volume.volumes.return_value = [mock_volume1]
+        self.config.os_cloud.get_volume_quotas.return_value = {
+            "gigabytes": 20,
+            "volumes": 100,
+        }
+
+        cache_images(self.config, self.mock_domain)
+
+        self.config.os_cloud.volume.delete_volume.assert_called_once_with(mock_volume1)
+        self.config.os_cloud.volume.create_volume.assert_called_once_with(
+            name="cache-9999", size=20, imageRef=9999
+        )
+
+    def test_cache_images_dry_run(self):
+        self.config.dry_run = True
+        self.config.os_cloud.volume.volumes.return_value = []
+        self.config.os_cloud.get_volume_quotas.return_value = {
+            "gigabytes": -1,
+            "volumes": -1,
+        }
+
+        cache_images(self.config, self.mock_domain)
+
+        self.config.os_cloud.volume.delete_volume.assert_not_called()
+        self.config.os_cloud.volume.create_volume.assert_not_called()
+
+    def test_plan_image_cache_0(self):
+        # recent policy, newest image first, only one volume left
+        self.mock_image.updated_at = "2025-01-01T00:00:00Z"
+        self.mock_image2.updated_at = "2024-01-01T00:00:00Z"
+        mock_volume = MagicMock()
+        mock_volume.name = "other"
+        mock_volume.size = 10
+
+        to_create, to_evict = plan_image_cache(
+            [self.mock_image, self.mock_image2],
+            [mock_volume],
+            {"gigabytes": 100, "volumes": 2},
+            "recent",
+        )
+
+        assert to_create == [self.mock_image]
+        assert to_evict == []
+
+    def test_plan_image_cache_1(self):
+        # size policy, the smaller image is kept warm
+        mock_volume = MagicMock()
+        mock_volume.name = "cache-9999"
+        mock_volume.size = 20
+
+        to_create, to_evict = plan_image_cache(
+            [self.mock_image2, self.mock_image],
+            [mock_volume],
+            {"gigabytes": 10, "volumes": -1},
+            "size",
+        )
+
+        assert to_create == [self.mock_image]
+        assert to_evict == [mock_volume]
+
+    def test_plan_image_cache_2(self):
+        # a cache volume of an image that is not shared anymore fits into the quota
+        mock_volume = MagicMock()
+        mock_volume.name = "cache-9999"
+        mock_volume.size = 20
+
+        to_create, to_evict = plan_image_cache(
+            [self.mock_image],
+            [mock_volume],
+            {"gigabytes": 100, "volumes": 10},
+            "recent",
+        )
+
+        assert to_create == [self.mock_image]
+        assert to_evict == []
+
+        # the volume is evicted when the quota has no room left for it
+        to_create, to_evict = plan_image_cache(
+            [self.mock_image],
+            [mock_volume],
+            {"gigabytes": 100, "volumes": 1},
+            "recent",
+        )
+
+        assert to_create == [self.mock_image]
+        assert to_evict == [mock_volume]
+
 
 class TestProcessProject(TestBase):
 
@@ -1628,7 +1751,7 @@ class TestProcessProject(TestBase):
         )
 
         mock_check_quota.assert_called_once_with(
-            self.config, self.mock_project, "classes.yaml"
+            self.config, self.mock_project, "classes.yaml", None
         )
         mock_check_endpoints.assert_called_once_with(self.config, self.mock_project)
         mock_check_homeproject_permissions.assert_called_once_with(
@@ -1701,7 +1824,7 @@ class TestProcessProject(TestBase):
         )
 
         mock_check_quota.assert_called_once_with(
-            self.config, self.mock_project, "classes.yaml"
+            self.config, self.mock_project, "classes.yaml", None
         )
         mock_check_endpoints.assert_not_called()
         mock_check_homeproject_permissions.assert_not_called()
@@ -1770,10 +1893,32 @@ class TestProcessProject(TestBase):
         mock_manage_default_volume_type.assert_not_called()
         mock_manage_private_flavors.assert_not_called()
 
+    @patch("openstack_project_manager.manage.get_quotaclass")
+    def test_get_project_fingerprint(self, mock_get_quotaclass):
+        mock_get_quotaclass.side_effect = lambda classes, name: {"name": name}
+        self.mock_project.to_dict.return_value = {"name": "admin"}
+        self.mock_project.name = "admin"
+        self.mock_project.quotaclass = "basic"
+        quotas = {x: dict.fromkeys(QUOTAS[x], 1) for x in QUOTAS}
+        self.config.os_cloud.get_network_quotas.return_value = quotas["network"]
+        self.config.os_cloud.get_compute_quotas.return_value = quotas["compute"]
+        self.config.os_cloud.get_volume_quotas.return_value = quotas["volume"]
+
+        args = (self.config, self.mock_project, MagicMock(), "classes.yaml", True, True)
+
+        fingerprint = get_project_fingerprint(*args)
+        mock_get_quotaclass.assert_any_call("classes.yaml", "admin")
+        assert fingerprint == get_project_fingerprint(*args)
+
+        # a quota changed outside the tool changes the fingerprint
+        quotas["compute"]["cores"] = 2
+        assert fingerprint != get_project_fingerprint(*args)
+
+    @patch("openstack_project_manager.manage.check_bandwidth")
     @patch("openstack_project_manager.manage.check_quota")
     @patch("openstack_project_manager.manage.add_external_network")
     def test_handle_unmanaged_project_0(
-        self, mock_add_external_network, mock_check_quota
+        self, mock_add_external_network, mock_check_quota, mock_check_bandwidth
     ):
         self.mock_project.name = "service"
 
@@ -1785,6 +1930,9 @@ class TestProcessProject(TestBase):
         mock_check_quota.assert_called_once_with(
             self.config, self.mock_project, "classes.yaml"
         )
+        mock_check_bandwidth.assert_called_once_with(
+            self.config, self.mock_project, "classes.yaml"
+        )
 
     @patch("openstack_project_manager.manage.check_quota")
     @patch("openstack_project_manager.manage.add_external_network")
@@ -1891,6 +2039,12 @@ class TestCLI(CloudTest):
         self.assertEqual(result.exit_code, 0, (result, result.stdout))
         self.mock_connect.assert_not_called()
 
+    def test_cli_image_cache_policy(self):
+        result = self.runner.invoke(app, ["--image-cache-policy=bogus"])
+        assert result.exit_code == 2
+        assert "[recent|size]" in self.runner.invoke(app, ["--help"]).stdout
+        self.mock_connect.assert_not_called()
+
     def test_cli_1(self):
         self.mock_os_cloud.list_domains.return_value = [
             self.mock_domain1,
@@ -2011,6 +2165,79 @@ class TestCLI(CloudTest):
         self.mock_os_cloud.add_router_interface.assert_not_called()
         self.mock_os_keystone.endpoint_filter.add_endpoint_group_to_project.assert_not_called()
 
+    def test_cli_10(self):
+        self.mock_os_cloud.get_domain.return_value = self.mock_domain2
+
+        result = self.runner.invoke(app, ["--domain=domain_2", "--api-report"])
+        self.assertEqual(result.exit_code, 0, (result, result.stdout))
+
+        self.assertIn("p95 ms", result.stdout)
+
+    def test_cli_11(self):
+        self.mock_os_cloud.get_domain.return_value = self.mock_domain2
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            textfile = Path(tmpdir) / "opm.prom"
+
+            result = self.runner.invoke(
+                app, ["--domain=domain_2", f"--textfile={textfile}"]
+            )
+            self.assertEqual(result.exit_code, 0, (result, result.stdout))
+
+            content = textfile.read_text()
+            self.assertIn("openstack_project_manager_run_success 1", content)
+            self.assertIn('{domain="domain_2"}', content)
+
+    def test_cli_12(self):
+        self.patcher_cli_2.stop()
+        self.mock_os_cloud.get_domain.return_value = self.mock_domain2
+
+        result = self.runner.invoke(
+            app, ["--domain=domain_2", "--dry-run", "--profile"]
+        )
+        self.assertEqual(result.exit_code, 0, (result, result.stdout))
+
+        self.assertIn("slowest phase", result.stdout)
+        self.assertIn("project_1", result.stdout)
+
+    def test_cli_13(self):
+        self.patcher_cli_2.stop()
+        self.mock_os_cloud.get_domain.return_value = self.mock_domain2
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trace_file = Path(tmpdir) / "trace.jsonl"
+
+            result = self.runner.invoke(
+                app, ["--domain=domain_2", "--dry-run", f"--trace-file={trace_file}"]
+            )
+            self.assertEqual(result.exit_code, 0, (result, result.stdout))
+
+            spans = {}
+            for line in trace_file.read_text().splitlines():
+                span = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+                spans[span["name"]] = span
+
+        self.assertEqual(spans["run"]["parentSpanId"], "")
+        self.assertEqual(spans["domain"]["parentSpanId"], spans["run"]["spanId"])
+        self.assertEqual(spans["project"]["parentSpanId"], spans["domain"]["spanId"])
+        self.assertEqual(spans["quota"]["parentSpanId"], spans["project"]["spanId"])
+        self.assertEqual(spans["bandwidth"]["parentSpanId"], spans["project"]["spanId"])
+
+    def test_cli_14(self):
+        self.mock_connect.side_effect = Exception("authentication failed")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            textfile = Path(tmpdir) / "opm.prom"
+
+            result = self.runner.invoke(
+                app, ["--domain=domain_2", f"--textfile={textfile}"]
+            )
+            self.assertNotEqual(result.exit_code, 0)
+
+            # a run that fails to connect is written as a failed run
+            content = textfile.read_text()
+            self.assertIn("openstack_project_manager_run_success 0", content)
+
 
 if __name__ == "__main__":
     unittest.main()
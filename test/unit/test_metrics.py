@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from openstack_project_manager.apistats import ApiStats
+from openstack_project_manager.metrics import RunMetrics, format_labels
+from openstack_project_manager.workqueue import WorkQueue
+
+
+class TestRunMetrics(unittest.TestCase):
+
+    def test_format_labels(self):
+        assert format_labels({}) == ""
+        assert (
+            format_labels({"domain": 'a"b\\c', "state": "ok"})
+            == '{domain="a\\"b\\\\c",state="ok"}'
+        )
+
+    def test_project(self):
+        metrics = RunMetrics()
+
+        with metrics.project():
+            pass
+
+        with self.assertRaises(ValueError):
+            with metrics.project():
+                raise ValueError()
+
+        assert metrics.projects_processed == 1
+        assert metrics.projects_failed == 1
+
+    def test_reconcile(self):
+        metrics = RunMetrics()
+
+        with metrics.reconcile():
+            pass
+
+        with self.assertRaises(ValueError):
+            with metrics.reconcile():
+                raise ValueError()
+
+        assert metrics.reconciles == {"succeeded": 1, "failed": 1}
+        assert metrics.last_reconcile > 0
+
+    def test_get_textfile(self):
+        metrics = RunMetrics()
+        metrics.projects_skipped = 2
+        with metrics.domain("domain_1"):
+            pass
+
+        api_stats = ApiStats()
+        api_stats.record("compute", "GET", "/os-quota-sets/1", "quota", 0.1)
+        api_stats.record("compute", "PUT", "/os-quota-sets/1", "quota", 0.3)
+
+        textfile = metrics.get_textfile(api_stats)
+
+        assert "openstack_project_manager_run_success 1\n" in textfile
+        assert 'openstack_project_manager_projects{state="skipped"} 2\n' in textfile
+        assert (
+            'openstack_project_manager_domain_duration_seconds{domain="domain_1"}'
+            in textfile
+        )
+        assert 'openstack_project_manager_mutations{phase="quota"} 1\n' in textfile
+        assert (
+            'openstack_project_manager_api_latency_seconds{service="compute",quantile="0.5"} 0.100000\n'
+            in textfile
+        )
+        assert (
+            'openstack_project_manager_api_latency_seconds_count{service="compute"} 2\n'
+            in textfile
+        )
+
+    def test_get_textfile_work_queue(self):
+        work_queue = WorkQueue(debounce=0)
+        textfile = RunMetrics().get_textfile(work_queue=work_queue)
+        assert "openstack_project_manager_queue_depth 0\n" in textfile
+        assert 'queue_latency_seconds{quantile="0.5"}' not in textfile
+
+        # the daemon writes its reconciles instead of the series of a run
+        assert "openstack_project_manager_run_" not in textfile
+        assert (
+            'openstack_project_manager_reconciles_total{result="failed"} 0\n'
+            in textfile
+        )
+
+        work_queue.put("p1")
+        work_queue.put("p1")
+        work_queue.put("p2")
+        work_queue.get()
+
+        textfile = RunMetrics().get_textfile(work_queue=work_queue)
+        assert "openstack_project_manager_queue_depth 1\n" in textfile
+        assert (
+            'openstack_project_manager_queue_events_total{state="coalesced"} 1\n'
+            in textfile
+        )
+        assert 'queue_latency_seconds{quantile="0.99"}' in textfile
+        assert "openstack_project_manager_queue_latency_seconds_count 1\n" in textfile
+
+    def test_write_textfile(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "opm.prom"
+
+            RunMetrics().write_textfile(path)
+
+            assert [x.name for x in Path(tmpdir).iterdir()] == ["opm.prom"]
+            assert "# TYPE openstack_project_manager_run_duration_seconds gauge" in (
+                path.read_text()
+            )
+            assert "api_latency" not in path.read_text()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import MagicMock, patch, ANY
+
+from typer.testing import CliRunner
+
+from openstack_project_manager import clients
+from openstack_project_manager.opm import app, run_chain, split_chain
+
+
+class TestCLI(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = CliRunner()
+        self.addCleanup(setattr, clients, "RUNTIME", None)
+
+        self.patcher = patch("openstack.connect")
+        self.mock_connect = self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        self.mock_os_cloud = MagicMock()
+        self.mock_connect.return_value = self.mock_os_cloud
+
+        self.patcher2 = patch("openstack_project_manager.clients.make_client")
+        self.mock_make_client = self.patcher2.start()
+        self.addCleanup(self.patcher2.stop)
+
+        self.patcher3 = patch("openstack_project_manager.manage.process_project")
+        self.mock_process_project = self.patcher3.start()
+        self.addCleanup(self.patcher3.stop)
+
+        self.mock_project = MagicMock()
+        self.mock_project.id = 1234
+        self.mock_project.domain_id = "domain-id"
+        self.mock_os_cloud.get_project.return_value = self.mock_project
+
+        self.os_roles = []
+        for rolename in ["member", "load-balancer_member"]:
+            role = MagicMock()
+            role.name = rolename
+            self.os_roles.append(role)
+        self.mock_os_cloud.identity.roles.return_value = self.os_roles
+
+    def test_cli_0(self):
+        result = self.runner.invoke(app, ["--help"])
+        self.assertEqual(result.exit_code, 0, (result, result.stdout))
+        for command in ["create", "create-ldap", "create-user", "manage"]:
+            assert command in result.stdout
+        self.mock_connect.assert_not_called()
+
+    def test_cli_1(self):
+        run_chain(["create", "--name=x", "+", "manage", "--name=default-x"])
+
+        # both commands share one connection and the role cache
+        self.mock_connect.assert_called_once_with(cloud="admin")
+        self.mock_os_cloud.identity.roles.assert_called_once()
+        self.mock_os_cloud.get_project.assert_called_once_with(name_or_id="default-x")
+        self.mock_process_project.assert_called_once_with(
+            ANY, self.mock_project, ANY, False, False, True, True, True
+        )
+
+    def test_cli_2(self):
+        run_chain(["create", "--name=x", "+", "create", "--cloud=other", "--name=y"])
+
+        assert self.mock_connect.call_count == 2
+        self.mock_connect.assert_any_call(cloud="admin")
+        self.mock_connect.assert_any_call(cloud="other")
+
+    def test_cli_3(self):
+        # an error stops the chain
+        self.mock_os_cloud.get_project.return_value = None
+
+        with self.assertRaises(SystemExit) as e:
+            run_chain(["manage", "--name=x", "+", "create", "--name=y"])
+
+        assert e.exception.code == 1
+        self.mock_os_cloud.identity.find_project.assert_not_called()
+
+    def test_split_chain(self):
+        assert split_chain(["create", "--name=x", "+", "manage", "+"]) == [
+            ["create", "--name=x"],
+            ["manage"],
+        ]
+        assert split_chain([]) == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import pstats
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from openstack_project_manager.profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def run_projects(self, profiler):
+        for name, duration in [("project_1", 0.01), ("project_2", 0.03)]:
+            with profiler.project(name):
+                with profiler.phase("quota"):
+                    time.sleep(duration)
+                with profiler.phase("flavors"):
+                    time.sleep(0.001)
+
+    def test_report(self):
+        profiler = Profiler()
+        self.run_projects(profiler)
+        profiler.stop()
+
+        assert profiler.phases["quota"].calls == 2
+        assert profiler.phases["quota"].wall >= 0.04
+        assert profiler.projects["project_2"].wall > profiler.projects["project_1"].wall
+
+        report = profiler.report()
+        lines = report.splitlines()
+
+        # the slowest project and phase come first
+        assert "project_2" in lines[3]
+        assert "quota" in lines[3]
+        assert "slowest project" in report
+        assert lines.index(next(x for x in lines if "| quota" in x)) < lines.index(
+            next(x for x in lines if "| flavors" in x)
+        )
+
+    def test_cprofile_output(self):
+        output = Path(self.tmpdir.name) / "manage.prof"
+        profiler = Profiler(output)
+        self.run_projects(profiler)
+        profiler.stop()
+
+        stats = pstats.Stats(str(output))
+        assert any(x[2] == "run_projects" for x in stats.stats)
+
+    def test_collapsed_stacks_output(self):
+        output = Path(self.tmpdir.name) / "manage.folded"
+        profiler = Profiler(output)
+        self.run_projects(profiler)
+        profiler.stop()
+
+        lines = output.read_text().splitlines()
+        assert lines
+        assert any("test_profiler:run_projects" in x for x in lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from openstack_project_manager.shard import get_shard, jump_hash, parse_shard
+
+
+class TestShard(unittest.TestCase):
+
+    def test_parse_shard(self):
+        assert parse_shard("0/24") == (0, 24)
+        assert parse_shard("23/24") == (23, 24)
+        for value in ["24/24", "-1/24", "0/0", "1", "a/b"]:
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_jump_hash(self):
+        for key in range(1000):
+            assert jump_hash(key, 1) == 0
+            assert 0 <= jump_hash(key, 24) < 24
+
+    def test_get_shard(self):
+        ids = [f"{i:032x}" for i in range(24000)]
+
+        # the projects are spread evenly over the shards
+        counts = [0] * 24
+        for x in ids:
+            counts[get_shard(x, 24)] += 1
+        assert min(counts) > 800 and max(counts) < 1200
+
+        # more shards only move projects to the new shards
+        moved = [x for x in ids if get_shard(x, 24) != get_shard(x, 25)]
+        assert all(get_shard(x, 25) == 24 for x in moved)
+        assert 700 < len(moved) < 1200
+
+        # the shard of a project is stable
+        assert get_shard("abc", 24) == get_shard("abc", 24) == 21
+
+
+if __name__ == "__main__":
+    unittest.main()
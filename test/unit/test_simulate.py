@@ -0,0 +1,193 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import typer
+from typer.testing import CliRunner
+
+from openstack_project_manager.classwatch import resolve_classes
+from openstack_project_manager.inventory import Inventory
+from openstack_project_manager.manage import compute_desired_quotas
+from openstack_project_manager.simulate import (
+    ProjectItem,
+    get_changes,
+    get_quota_key,
+    run,
+    simulate,
+)
+
+app = typer.Typer()
+app.command()(run)
+
+CLASSES = """
+---
+default:
+  compute:
+    cores: 0
+    instances: 0
+    metadata_items: 128
+  network:
+    network: 0
+    router: 0
+  volume:
+    gigabytes: 0
+    per_volume_gigabytes: -1
+
+basic:
+  parent: default
+  compute:
+    cores: 4
+    instances: 2
+  network:
+    network: 1
+    router: 1
+  volume:
+    gigabytes: 10
+"""
+
+
+class TestSimulate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name)
+        (self.path / "old.yml").write_text(CLASSES)
+        (self.path / "new.yml").write_text(CLASSES.replace("cores: 4", "cores: 8"))
+        self.old = resolve_classes([self.path / "old.yml"])
+        self.new = resolve_classes([self.path / "new.yml"])
+
+    def test_compute_desired_quotas(self):
+        project = ProjectItem(
+            {
+                "quotamultiplier": "2",
+                "quotamultiplier_storage": "3",
+                "quota_instances": "5",
+                "has_public_network": "True",
+            }
+        )
+        assert compute_desired_quotas(project, self.old["basic"]) == {
+            "compute": {"cores": 8, "instances": 5, "metadata_items": 128},
+            "network": {"network": 2, "router": 2},
+            "volume": {"gigabytes": 30, "per_volume_gigabytes": -1},
+        }
+
+        # the class itself is not modified
+        assert self.old["basic"]["compute"]["instances"] == 2
+
+    def test_get_quota_key(self):
+        assert get_quota_key(
+            {"id": "1", "name": "a", "quotamultiplier": 2, "quota_cores": 4}, "basic"
+        ) == get_quota_key(
+            {"id": "2", "name": "b", "quota_cores": "4", "quotamultiplier": "2"},
+            "basic",
+        )
+        assert get_quota_key({"quotamultiplier": 2}, "basic") != get_quota_key(
+            {"quotamultiplier": 3}, "basic"
+        )
+
+    def test_get_changes(self):
+        assert get_changes({"compute": {"cores": 1}}, {"compute": {"cores": 1}}) == []
+        assert get_changes(
+            {"compute": {"cores": 1, "ram": 1}}, {"compute": {"cores": 2}}
+        ) == [("compute", "cores", 1, 2)]
+        assert get_changes(None, {"compute": {"cores": 2}}) == [
+            ("compute", "cores", None, 2)
+        ]
+        assert get_changes({"compute": {"cores": 2}}, None) == []
+
+    def test_simulate(self):
+        projects = [
+            {"id": "p1", "name": "project1", "quotaclass": "basic"},
+            {"id": "p2", "name": "project2", "quotaclass": "basic", "quota_cores": 2},
+            {"id": "p3", "name": "project3", "quotaclass": "default"},
+            {"id": "p4", "name": "project4", "quotaclass": "missing"},
+            {"id": "p5", "name": "project5"},
+            {"id": "p1", "name": "project1", "quotaclass": "basic"},
+        ] + [
+            {
+                "id": f"x{i}",
+                "name": f"x{i}",
+                "quotaclass": "basic",
+                "quotamultiplier": 2,
+            }
+            for i in range(100)
+        ]
+
+        report = simulate(projects, self.old, self.new)
+
+        assert report["projects"] == 104
+        assert report["changed_projects"] == 101
+        assert report["writes"] == 101
+        assert report["quotas"] == {"compute.cores": 101}
+        assert report["missing"] == 1
+        assert report["changes"][0] == {
+            "id": "p1",
+            "name": "project1",
+            "domain_id": None,
+            "quotaclass": "basic",
+            "changes": [{"service": "compute", "quota": "cores", "old": 4, "new": 8}],
+        }
+        assert report["changes"][1]["changes"][0]["new"] == 16
+
+        # without the details only the totals are reported
+        totals = simulate(projects, self.old, self.new, details=False)
+        assert totals["changes"] == []
+        assert dict(totals, changes=report["changes"]) == report
+
+    def test_simulate_errors(self):
+        projects = [
+            {"id": "p1", "name": "project1", "quotaclass": "basic"},
+            {
+                "id": "p2",
+                "name": "project2",
+                "quotaclass": "basic",
+                "quotamultiplier": "x",
+            },
+        ]
+
+        report = simulate(projects, self.old, self.new)
+        assert report["errors"] == 1
+        assert report["changed_projects"] == 1
+
+    def test_run(self):
+        inventory_file = self.path / "inventory.sqlite"
+        inventory = Inventory(inventory_file)
+        inventory.store(
+            "projects",
+            "d1",
+            [{"id": "p1", "name": "project1", "quotaclass": "basic"}],
+        )
+        inventory.close()
+        output = self.path / "report.json"
+
+        result = CliRunner().invoke(
+            app,
+            [
+                f"--inventory={inventory_file}",
+                f"--classes={self.path / 'old.yml'}",
+                f"--new-classes={self.path / 'new.yml'}",
+                f"--output={output}",
+            ],
+        )
+        self.assertEqual(result.exit_code, 0, (result, result.stdout))
+        assert "compute" in result.stdout
+        assert json.loads(output.read_text())["writes"] == 1
+
+        # the snapshot is not modified
+        assert Inventory(inventory_file, readonly=True).load("projects", "d1")
+
+    def test_run_missing_inventory(self):
+        result = CliRunner().invoke(
+            app,
+            [
+                f"--inventory={self.path / 'missing.sqlite'}",
+                f"--new-classes={self.path / 'new.yml'}",
+            ],
+        )
+        assert result.exit_code == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from openstack_project_manager.tracing import (
+    SPAN_KIND_CLIENT,
+    STATUS_CODE_ERROR,
+    Tracer,
+)
+
+
+def read_spans(path: Path) -> dict:
+    spans = {}
+    for line in path.read_text().splitlines():
+        request = json.loads(line)
+        for span in request["resourceSpans"][0]["scopeSpans"][0]["spans"]:
+            spans[span["name"]] = span
+    return spans
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "trace.jsonl"
+
+    def test_span(self):
+        tracer = Tracer(self.path)
+        with tracer.span("run", {"opm.dry_run": True}):
+            with tracer.span("project", {"opm.project.name": "project_1"}):
+                pass
+        tracer.close()
+
+        spans = read_spans(self.path)
+        assert spans["project"]["parentSpanId"] == spans["run"]["spanId"]
+        assert spans["project"]["traceId"] == spans["run"]["traceId"]
+        assert spans["run"]["parentSpanId"] == ""
+        assert spans["run"]["attributes"] == [
+            {"key": "opm.dry_run", "value": {"boolValue": True}}
+        ]
+        assert int(spans["run"]["endTimeUnixNano"]) >= int(
+            spans["project"]["endTimeUnixNano"]
+        )
+
+    def test_span_error(self):
+        tracer = Tracer(self.path)
+        with self.assertRaises(ValueError):
+            with tracer.span("quota"):
+                raise ValueError("invalid quota")
+        tracer.close()
+
+        spans = read_spans(self.path)
+        assert spans["quota"]["status"]["code"] == STATUS_CODE_ERROR
+
+    def test_instrument(self):
+        session = MagicMock()
+        session.request.return_value.status_code = 200
+        request = session.request
+
+        tracer = Tracer(self.path)
+        tracer.instrument(session)
+        tracer.instrument(session)
+
+        with tracer.span("quota"):
+            session.request(
+                "/os-quota-sets/1", "GET", endpoint_filter={"service_type": "compute"}
+            )
+        tracer.close()
+
+        # a closed tracer passes the requests through
+        session.request("/flavors", "GET")
+        assert request.call_count == 2
+
+        spans = read_spans(self.path)
+        assert len(spans) == 2
+        assert spans["GET compute"]["kind"] == SPAN_KIND_CLIENT
+        assert spans["GET compute"]["parentSpanId"] == spans["quota"]["spanId"]
+        assert {
+            "key": "http.response.status_code",
+            "value": {"intValue": "200"},
+        } in spans["GET compute"]["attributes"]
+
+
+if __name__ == "__main__":
+    unittest.main()
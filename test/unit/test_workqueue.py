@@ -0,0 +1,129 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from openstack_project_manager.workqueue import WorkQueue
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch(
+            "openstack_project_manager.workqueue.time.monotonic", self.clock
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_coalesce(self):
+        queue = WorkQueue(debounce=5, max_delay=60)
+        queue.put("p1")
+        queue.put("p2")
+        self.clock.now += 1
+        queue.put("p1")
+
+        assert len(queue.pending) == 2
+        assert queue.received == 3
+        assert queue.coalesced == 1
+
+        self.clock.now += 4
+        assert queue.get(timeout=0) == "p2"
+        assert queue.get(timeout=0) is None
+        self.clock.now += 1
+        assert queue.get(timeout=0) == "p1"
+        assert queue.processed == 2
+        assert queue.latency_sum == 11
+
+    def test_debounce(self):
+        queue = WorkQueue(debounce=5, max_delay=60)
+        queue.put("p1")
+
+        # every notification moves the due time
+        self.clock.now += 4
+        queue.put("p1")
+        self.clock.now += 4
+        assert queue.get(timeout=0) is None
+
+        self.clock.now += 1
+        assert queue.get(timeout=0) == "p1"
+        assert list(queue.latencies) == [9]
+
+    def test_max_delay(self):
+        queue = WorkQueue(debounce=5, max_delay=10)
+        queue.put("p1")
+
+        # a steady stream of notifications does not delay the project forever
+        for _ in range(2):
+            self.clock.now += 4
+            queue.put("p1")
+        assert queue.pending["p1"] == (1000, 1010)
+
+        assert queue.get(timeout=0) is None
+        self.clock.now = 1010
+        assert queue.get(timeout=0) == "p1"
+
+    def test_close(self):
+        queue = WorkQueue(debounce=5, max_delay=60)
+        queue.put("p1")
+        assert not queue.done
+
+        # a closed queue is drained without waiting for the due time
+        queue.close()
+        assert not queue.done
+        assert queue.get() == "p1"
+        assert queue.get() is None
+        assert queue.done
+
+    def test_max_size(self):
+        queue = WorkQueue(debounce=0, max_delay=0, max_size=1)
+        queue.put("p1")
+
+        # a project that is already pending does not block
+        queue.put("p1")
+
+        producer = threading.Thread(target=queue.put, args=("p2",))
+        producer.start()
+        producer.join(0.05)
+        assert producer.is_alive()
+        assert list(queue.pending) == ["p1"]
+
+        assert queue.get() == "p1"
+        producer.join(1)
+        assert not producer.is_alive()
+        assert list(queue.pending) == ["p2"]
+
+        # the worker enqueues without waiting for itself
+        queue.put("p3", block=False)
+        assert list(queue.pending) == ["p2", "p3"]
+
+
+class TestWorkQueueTimeout(unittest.TestCase):
+
+    def test_timeout(self):
+        queue = WorkQueue(debounce=10)
+        queue.put("p1")
+
+        start = time.monotonic()
+        assert queue.get(timeout=0.05) is None
+        assert time.monotonic() - start >= 0.05
+
+    def test_wakeup(self):
+        queue = WorkQueue(debounce=0.01)
+
+        # a waiting worker is woken up by a new project
+        threading.Timer(0.02, queue.put, args=("p1",)).start()
+        assert queue.get(timeout=5) == "p1"
+
+
+if __name__ == "__main__":
+    unittest.main()